@@ -1,3 +1,4 @@
 from . import models
 from . import wizard
-#from . import reports
\ No newline at end of file
+#from . import reports
+from .hooks import post_init_hook
@@ -1,7 +1,7 @@
 <<<<<<< HEAD
 {
     'name': 'Modificaciones de Project',
-    'version': '17.1.3',
+    'version': '17.1.5',
     'author': 'Mauricio, Antonio J.',
     'depends': ['base', 'sale', 'hr', 'project', 'sale_project', 'purchase', 'hr_expense', 'sale_purchase', 'hr_timesheet', 'employee_purchase_requisition', 'stock', 'web'],
     'license': 'AGPL-3',
@@ -28,6 +28,7 @@
         "views/wizard_rechazado_task_views.xml",
         "views/asignar_avances_project_wizard_views.xml",
         "wizard/pending_service_wizard.xml",
+        "wizard/project_sub_update_import_wizard_views.xml",
 
         # 4. Views (Main Models & Actions)
         # These define actions that might be used in menus later
@@ -61,6 +62,8 @@
             'project_modificaciones/static/src/scss/project_profitability.scss',
             'project_modificaciones/static/src/fields/one2manysearch/one2manysearch.js',
             'project_modificaciones/static/src/fields/one2manysearch/one2manysearch_template.xml',
+            'project_modificaciones/static/src/widgets/profitability_detail_tables/profitability_detail_tables.js',
+            'project_modificaciones/static/src/widgets/profitability_detail_tables/profitability_detail_tables.xml',
 
         ],
     },
@@ -71,11 +74,12 @@
     'installable': True,
     'auto_install': False,
     'application': True,
+    'post_init_hook': 'post_init_hook',
 }
 =======
 {
     'name': 'Modificaciones de Project',
-    'version': '17.1.4',
+    'version': '17.1.5',
     'author': 'Mauricio, Antonio J.',
     'depends': ['base', 'sale', 'hr', 'project', 'sale_project', 'purchase', 'hr_expense', 'sale_purchase', 'hr_timesheet', 'employee_purchase_requisition', 'stock','web'],
     'license': 'AGPL-3',
@@ -91,6 +95,7 @@
         # 2. Data (Reference data used in views)
         "data/project_task_type_data.xml",
         "data/actions_server.xml",
+        "data/ir_cron_data.xml",
 
         # 3. Views (Independent / Configuration)
         'views/project_tags_views.xml',
@@ -107,10 +112,12 @@
         "views/asignar_avances_project_wizard_views.xml",
         "wizard/pending_service_wizard.xml",
         "wizard/fusion_servicios_pendientes_views.xml",
+        "wizard/project_sub_update_import_wizard_views.xml",
 
         # 4. Views (Main Models & Actions)
         # These define actions that might be used in menus later
         'views/project_control_board_views.xml',
+        "wizard/project_control_board_stage_wizard_views.xml",
         'views/project_sub_update_views.xml',
         'views/supervisor_area_views.xml',
         'views/pending_services.xml',
@@ -127,6 +134,7 @@
         "views/dashboard_sale_order_views.xml",
         "views/dashboard_task_views.xml",
         "views/hr_employee_views.xml",
+        "views/project_metric_recompute_views.xml",
 
         # 6. Reports
         'report/report_license_templates.xml',
@@ -141,6 +149,9 @@
             'project_modificaciones/static/src/scss/project_profitability.scss',
             'project_modificaciones/static/src/fields/one2manysearch/one2manysearch.js',
             'project_modificaciones/static/src/fields/one2manysearch/one2manysearch_template.xml',
+            'project_modificaciones/static/src/widgets/profitability_detail_tables/profitability_detail_tables.js',
+            'project_modificaciones/static/src/widgets/profitability_detail_tables/profitability_detail_tables.xml',
+            'project_modificaciones/static/src/views/project_control_board_kanban/project_control_board_kanban.js',
         ],
     },
 
@@ -150,5 +161,6 @@
     'installable': True,
     'auto_install': False,
     'application': True,
+    'post_init_hook': 'post_init_hook',
 }
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from odoo import fields
+
+# Días de historia de avances que se reconstruyen al instalar o actualizar
+SNAPSHOT_BACKFILL_DAYS = 90
+
+
+def _load_cost_ledger(env):
+    """Carga inicial del libro de costos, sin commits intermedios."""
+    env['project.cost.ledger']._rebuild_ledger(commit=False)
+
+
+def _backfill_progress_snapshots(env):
+    """Historia de los últimos SNAPSHOT_BACKFILL_DAYS días, sin commits intermedios."""
+    Snapshot = env['project.progress.snapshot']
+    date_from = fields.Date.context_today(Snapshot) - timedelta(days=SNAPSHOT_BACKFILL_DAYS)
+    Snapshot._backfill_snapshots(date_from, chunk_days=31, commit=False)
+
+
+def post_init_hook(env):
+    _load_cost_ledger(env)
+    _backfill_progress_snapshots(env)
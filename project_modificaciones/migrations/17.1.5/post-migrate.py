@@ -0,0 +1,11 @@
+from odoo import SUPERUSER_ID, api
+
+from odoo.addons.project_modificaciones.hooks import _backfill_progress_snapshots, _load_cost_ledger
+
+
+def migrate(cr, version):
+    # Los datos noupdate no se vuelven a cargar al actualizar: el libro y la
+    # historia de avances se llenan aquí
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    _load_cost_ledger(env)
+    _backfill_progress_snapshots(env)
@@ -48,3 +48,11 @@ from . import stock
 from . import project_profitability_report
 from . import project_control_board
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
+from . import project_metric_recompute
+from . import project_profitability_snapshot
+from . import res_currency
+from . import project_cost_ledger
+from . import account_move
+from . import account_analytic_line
+from . import project_progress_snapshot
+from . import qweb_fragment_cache
@@ -0,0 +1,21 @@
+from odoo import api, models
+
+
+class AccountAnalyticLine(models.Model):
+    _inherit = 'account.analytic.line'
+
+    # Las hojas de horas de proyecto son costo de mano de obra en el libro
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, records.ids)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return res
+
+    def unlink(self):
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return super().unlink()
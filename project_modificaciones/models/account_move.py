@@ -0,0 +1,42 @@
+from odoo import api, models
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    # Publicar o cancelar cambia el estado contable de compras, gastos y almacén
+    def write(self, vals):
+        res = super().write(vals)
+        if 'state' in vals:
+            self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return res
+
+    def unlink(self):
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids, resolve_now=True)
+        return super().unlink()
+
+
+class AccountMoveLine(models.Model):
+    _inherit = 'account.move.line'
+
+    # qty_invoiced de la línea de compra se calcula desde las líneas de factura
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['project.cost.ledger']._mark_ledger_dirty(
+            'purchase.order.line', records.purchase_line_id.ids)
+        return records
+
+    def write(self, vals):
+        if not {'purchase_line_id', 'quantity', 'product_uom_id'} & set(vals):
+            return super().write(vals)
+        purchase_line_ids = self.purchase_line_id.ids
+        res = super().write(vals)
+        self.env['project.cost.ledger']._mark_ledger_dirty(
+            'purchase.order.line', purchase_line_ids + self.purchase_line_id.ids)
+        return res
+
+    def unlink(self):
+        self.env['project.cost.ledger']._mark_ledger_dirty(
+            'purchase.order.line', self.purchase_line_id.ids)
+        return super().unlink()
@@ -223,6 +223,9 @@ class AsignarAvancesProjectWizard(models.TransientModel):
             t._units()             # Recalcula piezas entregadas (suma total)
             t._progress()          # Recalcula porcentaje de avance
             t._is_complete()       # Verifica si se completó la tarea
+        # El asistente acaba de recalcular si la tarea está completa: su estado
+        # y etapa se aplican ya, no hasta el commit
+        self.env['project.task']._flush_completion_state_queue()
 
         if self.avances_a_confirmar_ids:
             # Usamos with_context para pasar la señal y desactivar la lógica del 'write' de project.update
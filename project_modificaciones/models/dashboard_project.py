@@ -145,8 +145,13 @@
 #             'context': {'create': False},
 #         }
 =======
+from collections import defaultdict
+
 from odoo import models, _
 
+from .project_cost_ledger import PROFITABILITY_CACHE_KEY
+
+
 class ProjectProject(models.Model):
     """
     Extiende la rentabilidad del proyecto en Odoo 17 para centralizar
@@ -186,58 +191,17 @@ class ProjectProject(models.Model):
             costs['data'] = new_data
 
         # --- 2. CÁLCULO PERSONALIZADO BASADO EN TAREAS ---
-        for project in self:
-            tasks = project.task_ids
-            if not tasks:
-                continue
-
-            Expense = self.env['hr.expense']
-            POLine = self.env['purchase.order.line']
-            AccountMoveLine = self.env['account.move.line']
-
-            # Gastos (Expenses) vinculados a tareas
-            expenses = Expense.search([
-                ('task_id', 'in', tasks.ids),
-                ('sheet_id.state', 'in', ['approve', 'post', 'done'])
-            ])
+        # Odoo lo llama proyecto por proyecto: el lote cubre todo el prefetch
+        prefetch = self.browse([pid for pid in self._prefetch_ids if isinstance(pid, int)])
+        project_costs = (prefetch | self)._get_profitability_costs_batch()
 
-            exp_total = 0.0
-            exp_billed = 0.0
-            for exp in expenses:
-                amount = exp.company_currency_id._convert(
-                    exp.total_amount, project.currency_id, project.company_id
-                )
-                exp_total += amount
-                if exp.sheet_id.state in ('post', 'done'):
-                    exp_billed += amount
-
-            # Compras (Purchases) vinculadas a tareas
-            purchases = POLine.search([
-                ('task_id', 'in', tasks.ids),
-                ('order_id.state', 'in', ('purchase', 'done')),
-            ])
-
-            pur_total = 0.0
-            for pol in purchases:
-                pur_total += pol.currency_id._convert(
-                    pol.price_subtotal, project.currency_id, project.company_id
-                )
-
-            # Facturado de Compras (Account Moves)
-            vendor_lines = AccountMoveLine.search([
-                ('purchase_line_id.task_id', 'in', tasks.ids),
-                ('move_id.state', '=', 'posted'),
-                ('move_id.move_type', 'in', ('in_invoice', 'in_refund')),
-            ])
-
-            pur_billed = 0.0
-            for line in vendor_lines:
-                currency = line.move_id.currency_id or project.currency_id
-                sign = -1 if line.move_id.move_type == 'in_refund' else 1
-                amt = currency._convert(
-                    line.price_subtotal, project.currency_id, project.company_id
-                )
-                pur_billed += (amt * sign)
+        for project in self:
+            costs_by_source = project_costs[project.id]
+            exp_billed = costs_by_source['hr.expense', 'billed']
+            exp_total = exp_billed + costs_by_source['hr.expense', 'to_bill']
+            pur_billed = costs_by_source['purchase.order.line', 'billed']
+            pur_total = pur_billed + sum(
+                costs_by_source['purchase.order.line', bucket] for bucket in ('to_bill', 'committed'))
 
             # --- 3. INYECCIÓN DE ITEMS AL DASHBOARD ---
             items = []
@@ -267,6 +231,35 @@ class ProjectProject(models.Model):
 
         return profitability
 
+    def _get_profitability_costs_batch(self):
+        """
+        Costos de gastos y compras de las tareas de todos los proyectos de self
+        con un solo GROUP BY sobre el libro, convertidos a la moneda de cada
+        proyecto. Los guarda en cr.cache para que las llamadas por proyecto de
+        _get_profitability_items no vuelvan a consultar.
+        Retorna {project_id: {(fuente, estado): monto}}.
+        """
+        cache = self.env.cr.cache.setdefault(PROFITABILITY_CACHE_KEY, {})
+        loaded = cache.setdefault(self.env.uid, {})
+        projects = self.filtered(lambda project: project.id not in loaded)
+        if projects:
+            project_by_task = {}
+            for project in projects:
+                project_by_task.update(dict.fromkeys(project.task_ids.ids, project))
+            totals = self.env['project.cost.ledger']._read_totals(
+                [('task_id', 'in', list(project_by_task)),
+                 ('source_model', 'in', ('hr.expense', 'purchase.order.line'))],
+                ['task_id', 'company_currency_id'])
+            project_costs = {project.id: defaultdict(float) for project in projects}
+            Currency = self.env['res.currency']
+            for (source_model, bucket, task_id, currency_id), amount in totals.items():
+                project = project_by_task[task_id]
+                rates = Currency._get_rate_matrix(project.company_id)
+                project_costs[project.id][source_model, bucket] += rates.convert(
+                    amount, Currency.browse(currency_id), project.currency_id)
+            loaded.update(project_costs)
+        return {project.id: loaded[project.id] for project in self}
+
     # --- ACCIONES DE NAVEGACIÓN ---
 
     def action_view_project_expenses(self):
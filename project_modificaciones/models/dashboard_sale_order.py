@@ -1,37 +1,49 @@
 <<<<<<< HEAD
 from odoo import fields, models, api, _
 from odoo.tools import format_amount
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timedelta
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Campos que alimentan las cifras del dashboard de ventas. Escribir otros
+# campos no vence el dashboard: así no se bloquean sus filas en cada
+# transacción de ventas o avances.
+SALE_ORDER_DASHBOARD_FIELDS = {'pricelist_id', 'currency_id', 'project_sub_updates'}
+SALE_LINE_DASHBOARD_FIELDS = {
+    'order_id', 'product_id', 'product_uom', 'product_uom_qty',
+    'qty_delivered', 'price_unit', 'discount',
+}
+SUB_UPDATE_DASHBOARD_FIELDS = {'task_id', 'unit_progress'}
+REQUISITION_DASHBOARD_FIELDS = {'task_id'}
 
-class DashboardSaleOrder(models.TransientModel):
+
+class DashboardSaleOrder(models.Model):
     _name = 'dashboard.sale.order'
     _description = 'Dashboard Para La Orden De Venta'
 
     sale_order_id = fields.Many2one(
-        'sale.order', string='Orden de Venta', required=True)
+        'sale.order', string='Orden de Venta', required=True, index=True)
     name = fields.Char(string='Nombre', compute='_compute_name')
     currency_id = fields.Many2one(
         'res.currency', default=lambda self: self.env.company.currency_id)
 
     # Métricas financieras
     total_revenue = fields.Monetary(
-        string='Ingresos Totales', compute='_compute_financials')
+        string='Ingresos Totales', compute='_compute_dashboard_figures', store=True)
     total_costs = fields.Monetary(
-        string='Costos Totales', compute='_compute_financials')
+        string='Costos Totales', compute='_compute_dashboard_figures', store=True)
     profit_margin = fields.Monetary(
-        string='Margen de Ganancia', compute='_compute_financials')
+        string='Margen de Ganancia', compute='_compute_dashboard_figures', store=True)
     profitability_percentage = fields.Float(
-        string='% Rentabilidad', compute='_compute_financials')
+        string='% Rentabilidad', compute='_compute_dashboard_figures', store=True)
     total_invoiced = fields.Monetary(
-        string='Facturado', compute='_compute_financials')
+        string='Facturado', compute='_compute_dashboard_figures', store=True)
     total_x_invoiced = fields.Monetary(
-        string='Por Facturar', compute='_compute_financials')
+        string='Por Facturar', compute='_compute_dashboard_figures', store=True)
     total_entregado = fields.Monetary(
-        string='Total Entregado', compute='_compute_financials')
+        string='Total Entregado', compute='_compute_dashboard_figures', store=True)
     project_health = fields.Selection([
         ('good', 'Buen Estado'),
         ('warning', 'Riesgo / Advertencia'),
@@ -44,53 +56,58 @@ class DashboardSaleOrder(models.TransientModel):
 
     ########## COMPRAS ##########
     purchase_count = fields.Integer(
-        string='Órdenes de Compra', compute='_compute_purchase_data')
+        string='Órdenes de Compra', compute='_compute_dashboard_figures', store=True)
     purchase_total = fields.Monetary(
-        string='Total Compras', compute='_compute_purchase_data')
+        string='Total Compras', compute='_compute_dashboard_figures', store=True)
 
     ########## GASTOS ##########
     expenses_count = fields.Integer(
-        string='Gastos', compute='_compute_expenses_data')
+        string='Gastos', compute='_compute_dashboard_figures', store=True)
     expenses_total = fields.Monetary(
-        string='Total Gastos', compute='_compute_expenses_data')
+        string='Total Gastos', compute='_compute_dashboard_figures', store=True)
 
     ########## LINEAS DE VENTA ##########
     sale_order_line_ids = fields.One2many('sale.order.line', related='sale_order_id.order_line',
                                           string='Líneas de Orden de Venta', readonly=True)
     lines_count = fields.Integer(
-        string='Número de Líneas', compute='_compute_lines_data')
+        string='Número de Líneas', compute='_compute_dashboard_figures', store=True)
     lines_total = fields.Monetary(
-        string='Total Líneas', compute='_compute_lines_data')
+        string='Total Líneas', compute='_compute_dashboard_figures', store=True)
 
     ########## REQUISICIONES ##########
     requisition_count = fields.Integer(
-        string='Requisiciones', compute='_compute_requisition_count')
+        string='Requisiciones', compute='_compute_dashboard_figures', store=True)
 
     ########## MOVIMIENTOS ALMACEN ##########
     stock_move_count = fields.Integer(
-        string='Movimientos Almacén', compute='_compute_stock_move_data')
+        string='Movimientos Almacén', compute='_compute_dashboard_figures', store=True)
     stock_move_cost = fields.Monetary(
-        string='Costo Mov. Almacén', compute='_compute_stock_move_data')
+        string='Costo Mov. Almacén', compute='_compute_dashboard_figures', store=True)
 
     ########## AVANCES ##########
     avances_count = fields.Integer(
-        string='Número de Avances', compute='_compute_avances_data')
+        string='Número de Avances', compute='_compute_dashboard_figures', store=True)
     avances_progress = fields.Float(
-        string='Progreso Total', compute='_compute_avances_data')
+        string='Progreso Total', compute='_compute_dashboard_figures', store=True)
     avances_units_delivered = fields.Float(
-        string='Unidades Entregadas', compute='_compute_avances_data')
+        string='Unidades Entregadas', compute='_compute_dashboard_figures', store=True)
     avances_units_missing = fields.Float(
-        string='Unidades Faltantes', compute='_compute_avances_data')
+        string='Unidades Faltantes', compute='_compute_dashboard_figures', store=True)
     avances_value_delivered = fields.Monetary(
-        string='Valor Entregado', compute='_compute_avances_data')
+        string='Valor Entregado', compute='_compute_dashboard_figures', store=True)
     avances_value_expected = fields.Monetary(
-        string='Valor Esperado', compute='_compute_avances_data')
+        string='Valor Esperado', compute='_compute_dashboard_figures', store=True)
 
     ######### HOJAS DE HORAS ##########
     time_sheet_count = fields.Integer(
-        string='Número de Hojas de Horas', compute='_compute_time_sheet_data')
+        string='Número de Hojas de Horas', compute='_compute_dashboard_figures', store=True)
     time_sheet_total = fields.Monetary(
-        string='Total Hojas de Horas', compute='_compute_time_sheet_data')
+        string='Total Hojas de Horas', compute='_compute_dashboard_figures', store=True)
+
+    computed_at = fields.Datetime(
+        string='Calculado el', compute='_compute_dashboard_figures', store=True,
+        help="Momento del último cálculo de las cifras. Se recalculan al abrir si "
+             "vencieron (TTL) o si cambió una orden, línea, avance o costo relacionado.")
 
     def _get_task_ids(self):
         self.ensure_one()
@@ -203,34 +220,160 @@ class DashboardSaleOrder(models.TransientModel):
                 'timesheets_list': timesheets_data,
             }
 
+            # La plantilla recorre la orden y sus relaciones: se renderiza sin caché
             wizard.contenido = self.env['ir.qweb']._render(
                 'project_modificaciones.sale_order_dashboard_template', values)
 
-    @api.depends('sale_order_line_ids.qty_delivered', 'sale_order_line_ids.price_unit',
-                 'sale_order_line_ids.qty_invoiced', 'purchase_total', 'expenses_total', 'time_sheet_total',
-                 'sale_order_id.amount_untaxed')
-    def _compute_financials(self):
-        for wizard in self:
-            total_entregado = sum(
-                line.qty_delivered * line.price_unit for line in wizard.sale_order_line_ids)
-            total_revenue = wizard.sale_order_id.amount_untaxed if wizard.sale_order_id else 0.0
-            total_costs = (wizard.purchase_total or 0) + \
-                (wizard.expenses_total or 0) + (wizard.time_sheet_total or 0)
-            total_invoiced = sum(
-                line.qty_invoiced * line.price_unit for line in wizard.sale_order_line_ids)
-            total_x_invoiced = sum((line.qty_delivered - line.qty_invoiced)
-                                   * line.price_unit for line in wizard.sale_order_line_ids)
+    @api.depends('sale_order_id')
+    def _compute_dashboard_figures(self):
+        """Todas las cifras almacenadas del dashboard, en lote para todas las órdenes."""
+        figures = self._get_dashboard_figures()
+        now = fields.Datetime.now()
+        for record in self:
+            values = figures.get(record.sale_order_id.id) or defaultdict(float)
+            record.purchase_count = values['purchase_count']
+            record.purchase_total = values['purchase.order.line']
+            record.expenses_count = values['expenses_count']
+            record.expenses_total = values['hr.expense']
+            record.lines_count = values['lines_count']
+            record.lines_total = values['amount_untaxed']
+            record.requisition_count = values['requisition_count']
+            record.stock_move_count = values['stock_move_count']
+            record.stock_move_cost = values['stock.move']
+            record.time_sheet_count = values['timesheet_count']
+            record.time_sheet_total = values['account.analytic.line']
+
+            total_entregado = values['delivered']
+            total_costs = record.purchase_total + record.expenses_total + record.time_sheet_total
             profit_margin = total_entregado - total_costs
-            profitability_percentage = (
+            record.total_entregado = total_entregado
+            record.total_revenue = values['amount_untaxed']
+            record.total_costs = total_costs
+            record.total_invoiced = values['invoiced']
+            record.total_x_invoiced = total_entregado - values['invoiced']
+            record.profit_margin = profit_margin
+            record.profitability_percentage = (
                 profit_margin / total_entregado * 100) if total_entregado > 0 else 0.0
 
-            wizard.total_entregado = total_entregado
-            wizard.total_revenue = total_revenue
-            wizard.total_costs = total_costs
-            wizard.total_invoiced = total_invoiced
-            wizard.total_x_invoiced = total_x_invoiced
-            wizard.profit_margin = profit_margin
-            wizard.profitability_percentage = profitability_percentage
+            record.avances_count = values['avances_count']
+            if values['avances_count']:
+                qty_expected = values['qty_expected']
+                record.avances_progress = (
+                    values['qty_delivered'] / qty_expected * 100) if qty_expected > 0 else 0.0
+                record.avances_units_delivered = values['qty_delivered']
+                record.avances_units_missing = qty_expected - values['qty_delivered']
+                record.avances_value_delivered = total_entregado
+                record.avances_value_expected = values['amount_untaxed']
+            else:
+                record.avances_progress = 0.0
+                record.avances_units_delivered = 0.0
+                record.avances_units_missing = 0.0
+                record.avances_value_delivered = 0.0
+                record.avances_value_expected = 0.0
+            record.computed_at = now
+
+    def _get_dashboard_figures(self):
+        """
+        Cifras de todas las órdenes de self en una sola pasada: tareas, libro de
+        costos, compras, gastos, requisiciones, almacén, horas, líneas y avances
+        agrupados por orden. Retorna {sale_order_id: {cifra: valor}}.
+        """
+        orders = self.sale_order_id
+        figures = {order.id: defaultdict(float) for order in orders}
+        if not orders:
+            return figures
+
+        Task = self.env['project.task']
+        order_by_task = {}
+        for order, task_ids in Task._read_group(
+                [('sale_order_id', 'in', orders.ids)], ['sale_order_id'], ['id:array_agg']):
+            figures[order.id]['task_count'] = len(task_ids)
+            order_by_task.update(dict.fromkeys(task_ids, order.id))
+        tasks = Task.browse(list(order_by_task))
+
+        # Costos por fuente desde el libro (un solo GROUP BY para todas las órdenes)
+        totals = self.env['project.cost.ledger']._read_totals(
+            [('task_id', 'in', tasks.ids)], ['task_id'])
+        for (source_model, _bucket, task_id), amount in totals.items():
+            figures[order_by_task[task_id]][source_model] += amount
+
+        purchase_ids = defaultdict(set)
+        for task, purchase_order_ids in self.env['purchase.order.line']._read_group(
+                [('task_id', 'in', tasks.ids)], ['task_id'], ['order_id:array_agg']):
+            purchase_ids[order_by_task[task.id]].update(purchase_order_ids)
+        for order_id, purchase_order_ids in purchase_ids.items():
+            figures[order_id]['purchase_count'] = len(purchase_order_ids)
+
+        for model_name, key in (('hr.expense', 'expenses_count'),
+                                ('employee.purchase.requisition', 'requisition_count')):
+            for task, count in self.env[model_name]._read_group(
+                    [('task_id', 'in', tasks.ids)], ['task_id'], ['__count']):
+                figures[order_by_task[task.id]][key] += count
+
+        for task, count, hours in self.env['account.analytic.line'].sudo()._read_group(
+                [('task_id', 'in', tasks.ids)], ['task_id'], ['__count', 'unit_amount:sum']):
+            figures[order_by_task[task.id]]['timesheet_count'] += count
+            figures[order_by_task[task.id]]['timesheet_hours'] += hours
+
+        for task in tasks:
+            figures[order_by_task[task.id]]['stock_move_count'] += task.stock_move_count
+
+        for order in orders:
+            values = figures[order.id]
+            lines = order.order_line
+            values['lines_count'] = len(lines)
+            values['amount_untaxed'] = order.amount_untaxed
+            values['qty_expected'] = sum(lines.mapped('product_uom_qty'))
+            values['qty_delivered'] = sum(lines.mapped('qty_delivered'))
+            values['delivered'] = sum(line.qty_delivered * line.price_unit for line in lines)
+            values['invoiced'] = sum(line.qty_invoiced * line.price_unit for line in lines)
+            if 'project_sub_updates' in order._fields:
+                values['avances_count'] = len(order.project_sub_updates)
+        return figures
+
+    # ---------------------------------------------------------------------
+    # Caché persistente: cifras almacenadas, vigencia por TTL e invalidación
+    # ---------------------------------------------------------------------
+    def _get_figure_fields(self):
+        return [field for field in self._fields.values()
+                if field.compute == '_compute_dashboard_figures']
+
+    def _refresh_dashboards(self):
+        """Recalcula las cifras de todos los dashboards de self en una sola pasada."""
+        for field in self._get_figure_fields():
+            self.env.add_to_compute(field, self)
+        self.flush_recordset()
+
+    def _get_stale_dashboards(self):
+        """Dashboards invalidados o calculados hace más del TTL configurado (minutos)."""
+        ttl = int(self.env['ir.config_parameter'].sudo().get_param(
+            'project_modificaciones.sale_dashboard_ttl', 30))
+        limit = fields.Datetime.now() - timedelta(minutes=ttl)
+        return self.filtered(
+            lambda dashboard: not dashboard.computed_at or dashboard.computed_at < limit)
+
+    @api.model
+    def _invalidate_dashboards(self, order_ids=(), task_ids=()):
+        """Marca como vencidos los dashboards de las órdenes o de las tareas dadas."""
+        order_ids = [order_id for order_id in order_ids if isinstance(order_id, int)]
+        task_ids = [task_id for task_id in task_ids if isinstance(task_id, int)]
+        if not (order_ids or task_ids):
+            return
+        if task_ids:
+            self.env['project.task'].flush_model(['sale_order_id'])
+        self.env.cr.execute("""
+            UPDATE dashboard_sale_order
+               SET computed_at = NULL
+             WHERE computed_at IS NOT NULL
+               AND (sale_order_id = ANY(%(order_ids)s)
+                    OR sale_order_id IN (SELECT sale_order_id FROM project_task
+                                          WHERE id = ANY(%(task_ids)s)))
+        """, {'order_ids': order_ids, 'task_ids': task_ids})
+        self.invalidate_model(['computed_at'])
+
+    def action_refresh_dashboard(self):
+        self._refresh_dashboards()
+        return True
 
     @api.depends('profit_margin', 'avances_progress', 'total_invoiced', 'total_revenue')
     def _compute_project_health(self):
@@ -246,122 +389,6 @@ class DashboardSaleOrder(models.TransientModel):
                 health = 'warning'
             record.project_health = health
 
-    @api.depends('sale_order_id')
-    def _compute_purchase_data(self):
-        for record in self:
-            count = 0
-            total = 0.0
-            if record.sale_order_id:
-                task_ids = record._get_task_ids()
-                domain = [('task_id', 'in', task_ids.ids)]
-                lines = self.env['purchase.order.line'].search(domain)
-                count = len(lines.mapped('order_id'))
-                valid_lines = lines.filtered(
-                    lambda l: l.order_id.state in ('purchase', 'done'))
-                total = sum(valid_lines.mapped('price_subtotal'))
-            record.purchase_count = count
-            record.purchase_total = total
-
-    @api.depends('sale_order_id')
-    def _compute_expenses_data(self):
-        for record in self:
-            count = 0
-            total = 0.0
-            if record.sale_order_id:
-                task_ids = record._get_task_ids()
-                expenses = self.env['hr.expense'].search(
-                    [('task_id', 'in', task_ids.ids)])
-                count = len(expenses)
-                valid_expenses = expenses.filtered(
-                    lambda e: e.state in ('approved', 'done'))
-                total = sum(valid_expenses.mapped('total_amount'))
-            record.expenses_count = count
-            record.expenses_total = total
-
-    @api.depends('sale_order_id', 'sale_order_id.order_line', 'sale_order_id.amount_untaxed')
-    def _compute_lines_data(self):
-        for record in self:
-            record.lines_count = len(
-                record.sale_order_id.order_line) if record.sale_order_id else 0
-            record.lines_total = record.sale_order_id.amount_untaxed if record.sale_order_id else 0.0
-
-    @api.depends('sale_order_id')
-    def _compute_requisition_count(self):
-        for record in self:
-            count = 0
-            if record.sale_order_id:
-                task_ids = record._get_task_ids()
-                if task_ids:
-                    count = self.env['employee.purchase.requisition'].search_count(
-                        [('task_id', 'in', task_ids.ids)])
-            record.requisition_count = count
-
-    @api.depends('sale_order_id')
-    def _compute_stock_move_data(self):
-        for record in self:
-            count = 0
-            cost = 0.0
-            if record.sale_order_id:
-                tasks = record._get_task_ids()
-                if tasks:
-                    count = sum(tasks.mapped('stock_move_count'))
-                    cost = sum(tasks.mapped('stock_move_cost'))
-            record.stock_move_count = count
-            record.stock_move_cost = cost
-
-    @api.depends('sale_order_id', 'sale_order_id.project_sub_updates')
-    def _compute_avances_data(self):
-        for record in self:
-            avances_progress = 0.0
-            avances_units_delivered = 0.0
-            avances_units_missing = 0.0
-            avances_value_delivered = 0.0
-            avances_value_expected = 0.0
-            avances_count = 0
-
-            if record.sale_order_id and hasattr(record.sale_order_id, 'project_sub_updates') and record.sale_order_id.project_sub_updates:
-                avances = record.sale_order_id.project_sub_updates
-                for avance in avances:
-                    avances_count += 1
-
-                total_qty_expected = sum(
-                    record.sale_order_id.order_line.mapped('product_uom_qty'))
-                total_units_delivered = sum(
-                    record.sale_order_id.order_line.mapped('qty_delivered'))
-
-                total_valor_entregado = sum(
-                    line.qty_delivered * line.price_unit for line in record.sale_order_line_ids)
-
-                if total_qty_expected > 0:
-                    avances_progress = (
-                        total_units_delivered / total_qty_expected) * 100
-
-                avances_units_delivered = total_units_delivered
-                avances_units_missing = total_qty_expected - total_units_delivered
-                avances_value_delivered = total_valor_entregado
-                avances_value_expected = record.sale_order_id.amount_untaxed or 0.0
-
-            record.avances_progress = avances_progress
-            record.avances_units_delivered = avances_units_delivered
-            record.avances_units_missing = avances_units_missing
-            record.avances_value_delivered = avances_value_delivered
-            record.avances_value_expected = avances_value_expected
-            record.avances_count = avances_count
-
-    @api.depends('sale_order_id')
-    def _compute_time_sheet_data(self):
-        for record in self:
-            count = 0
-            total = 0.0
-            if record.sale_order_id:
-                task_ids = record._get_task_ids()
-                timesheets = self.env['account.analytic.line'].search(
-                    [('task_id', 'in', task_ids.ids)])
-                count = len(timesheets)
-                total = abs(sum(timesheets.mapped('amount')))
-            record.time_sheet_count = count
-            record.time_sheet_total = total
-
     def action_view_purchase_orders(self):
         self.ensure_one()
         if self.sale_order_id:
@@ -487,55 +514,160 @@ class DashboardSaleOrder(models.TransientModel):
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
 
+    def write(self, vals):
+        res = super().write(vals)
+        if SALE_ORDER_DASHBOARD_FIELDS.intersection(vals):
+            self.env['dashboard.sale.order']._invalidate_dashboards(order_ids=self.ids)
+        return res
+
     def action_open_sale_dashboard(self):
-        self.ensure_one()
-        wizard = self.env['dashboard.sale.order'].search(
-            [('sale_order_id', '=', self.id)], limit=1)
-        if not wizard:
-            wizard = self.env['dashboard.sale.order'].create(
-                {'sale_order_id': self.id})
+        """
+        Abre los dashboards de las órdenes (uno o varios desde la lista). Se
+        reutilizan los guardados; los vencidos se recalculan juntos y los nuevos
+        se calculan en lote al crearse.
+        """
+        Dashboard = self.env['dashboard.sale.order']
+        by_order = {}
+        for dashboard in Dashboard.search([('sale_order_id', 'in', self.ids)]):
+            by_order.setdefault(dashboard.sale_order_id.id, dashboard.id)
+        dashboards = Dashboard.browse(list(by_order.values()))
+        dashboards._get_stale_dashboards()._refresh_dashboards()
+        missing = self.filtered(lambda order: order.id not in by_order)
+        if missing:
+            dashboards |= Dashboard.create([{'sale_order_id': order.id} for order in missing])
+        if len(self) == 1:
+            return {
+                'type': 'ir.actions.act_window',
+                'name': f"Dashboard - {self.display_name}",
+                'res_model': 'dashboard.sale.order',
+                'view_mode': 'form',
+                'res_id': dashboards.id,
+                'target': 'current',
+            }
         return {
             'type': 'ir.actions.act_window',
-            'name': f"Dashboard - {self.display_name}",
+            'name': _('Dashboards de Órdenes de Venta'),
             'res_model': 'dashboard.sale.order',
-            'view_mode': 'form',
-            'res_id': wizard.id,
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', dashboards.ids)],
             'target': 'current',
         }
+
+
+class SaleOrderLine(models.Model):
+    _inherit = 'sale.order.line'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        self.env['dashboard.sale.order']._invalidate_dashboards(order_ids=lines.order_id.ids)
+        return lines
+
+    def write(self, vals):
+        if not SALE_LINE_DASHBOARD_FIELDS.intersection(vals):
+            return super().write(vals)
+        # Al mover la línea de orden se vencen la orden anterior y la nueva
+        order_ids = self.order_id.ids
+        res = super().write(vals)
+        self.env['dashboard.sale.order']._invalidate_dashboards(
+            order_ids=order_ids + self.order_id.ids)
+        return res
+
+    def unlink(self):
+        self.env['dashboard.sale.order']._invalidate_dashboards(order_ids=self.order_id.ids)
+        return super().unlink()
+
+
+class ProjectSubUpdate(models.Model):
+    _inherit = 'project.sub.update'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        updates = super().create(vals_list)
+        self.env['dashboard.sale.order']._invalidate_dashboards(task_ids=updates.task_id.ids)
+        return updates
+
+    def write(self, vals):
+        if not SUB_UPDATE_DASHBOARD_FIELDS.intersection(vals):
+            return super().write(vals)
+        task_ids = self.task_id.ids
+        res = super().write(vals)
+        self.env['dashboard.sale.order']._invalidate_dashboards(
+            task_ids=task_ids + self.task_id.ids)
+        return res
+
+    def unlink(self):
+        self.env['dashboard.sale.order']._invalidate_dashboards(task_ids=self.task_id.ids)
+        return super().unlink()
+
+
+class EmployeePurchaseRequisition(models.Model):
+    _inherit = 'employee.purchase.requisition'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        requisitions = super().create(vals_list)
+        self.env['dashboard.sale.order']._invalidate_dashboards(task_ids=requisitions.task_id.ids)
+        return requisitions
+
+    def write(self, vals):
+        if not REQUISITION_DASHBOARD_FIELDS.intersection(vals):
+            return super().write(vals)
+        task_ids = self.task_id.ids
+        res = super().write(vals)
+        self.env['dashboard.sale.order']._invalidate_dashboards(
+            task_ids=task_ids + self.task_id.ids)
+        return res
+
+    def unlink(self):
+        self.env['dashboard.sale.order']._invalidate_dashboards(task_ids=self.task_id.ids)
+        return super().unlink()
 =======
 from odoo import fields, models, api, _
 from odoo.tools import format_amount
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timedelta
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Campos que alimentan las cifras del dashboard de ventas. Escribir otros
+# campos no vence el dashboard: así no se bloquean sus filas en cada
+# transacción de ventas o avances.
+SALE_ORDER_DASHBOARD_FIELDS = {'pricelist_id', 'currency_id', 'project_sub_updates'}
+SALE_LINE_DASHBOARD_FIELDS = {
+    'order_id', 'product_id', 'product_uom', 'product_uom_qty',
+    'qty_delivered', 'price_unit', 'discount',
+}
+SUB_UPDATE_DASHBOARD_FIELDS = {'task_id', 'unit_progress'}
+REQUISITION_DASHBOARD_FIELDS = {'task_id'}
+
 
 class DashboardSaleOrder(models.Model):
     _name = 'dashboard.sale.order'
     _description = 'Dashboard Para La Orden De Venta'
 
     sale_order_id = fields.Many2one(
-        'sale.order', string='Orden de Venta', required=True)
+        'sale.order', string='Orden de Venta', required=True, index=True)
     name = fields.Char(string='Nombre', compute='_compute_name')
     currency_id = fields.Many2one(
         'res.currency', default=lambda self: self.env.company.currency_id)
 
     # Métricas financieras
     total_revenue = fields.Monetary(
-        string='Ingresos Totales', compute='_compute_financials')
+        string='Ingresos Totales', compute='_compute_dashboard_figures', store=True)
     total_costs = fields.Monetary(
-        string='Costos Totales', compute='_compute_financials')
+        string='Costos Totales', compute='_compute_dashboard_figures', store=True)
     profit_margin = fields.Monetary(
-        string='Margen de Ganancia', compute='_compute_financials')
+        string='Margen de Ganancia', compute='_compute_dashboard_figures', store=True)
     profitability_percentage = fields.Float(
-        string='% Rentabilidad', compute='_compute_financials')
+        string='% Rentabilidad', compute='_compute_dashboard_figures', store=True)
     total_invoiced = fields.Monetary(
-        string='Facturado', compute='_compute_financials')
+        string='Facturado', compute='_compute_dashboard_figures', store=True)
     total_x_invoiced = fields.Monetary(
-        string='Por Facturar', compute='_compute_financials')
+        string='Por Facturar', compute='_compute_dashboard_figures', store=True)
     total_entregado = fields.Monetary(
-        string='Total Entregado', compute='_compute_financials')
+        string='Total Entregado', compute='_compute_dashboard_figures', store=True)
 
     # Contenido del dashboard
     contenido = fields.Html(
@@ -543,52 +675,65 @@ class DashboardSaleOrder(models.Model):
 
     ########## COMPRAS ##########
     purchase_count = fields.Integer(
-        string='Órdenes de Compra', compute='_compute_purchase_count')
+        string='Órdenes de Compra', compute='_compute_dashboard_figures', store=True)
     purchase_total = fields.Monetary(
-        string='Total Compras', compute='_compute_purchase_data')
+        string='Total Compras', compute='_compute_dashboard_figures', store=True)
 
     ########## TAREAS ##########
     task_count = fields.Integer(
-        string='Tareas', compute='_compute_task_count')
+        string='Tareas', compute='_compute_dashboard_figures', store=True)
 
     ########## GASTOS ##########
     expenses_count = fields.Integer(
-        string='Gastos', compute='_compute_expenses_count')
+        string='Gastos', compute='_compute_dashboard_figures', store=True)
     expenses_total = fields.Monetary(
-        string='Total Gastos', compute='_compute_expenses_data')
+        string='Total Gastos', compute='_compute_dashboard_figures', store=True)
 
     ########## LINEAS DE VENTA ##########
     sale_order_line_ids = fields.One2many('sale.order.line', related='sale_order_id.order_line',
                                           string='Líneas de Orden de Venta', readonly=True)
     lines_count = fields.Integer(
-        string='Número de Líneas', compute='_compute_lines_count')
+        string='Número de Líneas', compute='_compute_dashboard_figures', store=True)
     lines_total = fields.Monetary(
-        string='Total Líneas', compute='_compute_lines_data')
+        string='Total Líneas', compute='_compute_dashboard_figures', store=True)
 
     ########## REQUISICIONES ##########
     requisition_count = fields.Integer(
-        string='Requisiciones', compute='_compute_requisition_count')
+        string='Requisiciones', compute='_compute_dashboard_figures', store=True)
 
     ########## MOVIMIENTOS ALMACEN ##########
     stock_move_count = fields.Integer(
-        string='Movimientos Almacén', compute='_compute_stock_move_data')
+        string='Movimientos Almacén', compute='_compute_dashboard_figures', store=True)
     stock_move_cost = fields.Monetary(
-        string='Costo Mov. Almacén', compute='_compute_stock_move_data')
+        string='Costo Mov. Almacén', compute='_compute_dashboard_figures', store=True)
 
     ########## HOJAS DE HORAS ##########
     timesheet_count = fields.Integer(
-        string='Hojas de Horas', compute='_compute_timesheet_data')
+        string='Hojas de Horas', compute='_compute_dashboard_figures', store=True)
     timesheet_total = fields.Monetary(
-        string='Costo Hojas de Horas', compute='_compute_timesheet_data')
+        string='Costo Hojas de Horas', compute='_compute_dashboard_figures', store=True)
     timesheet_total_hr = fields.Float(
-        string='Total Horas', compute='_compute_timesheet_data'
+        string='Total Horas', compute='_compute_dashboard_figures', store=True
     )
 
     ########## AVANCES ##########
     avances_count = fields.Integer(
-        string='Número de Avances', compute='_compute_avances_count')
+        string='Número de Avances', compute='_compute_dashboard_figures', store=True)
     avances_progress = fields.Float(
-        string='Progreso Total', compute='_compute_avances_data')
+        string='Progreso Total', compute='_compute_dashboard_figures', store=True)
+    avances_units_delivered = fields.Float(
+        string='Unidades Entregadas', compute='_compute_dashboard_figures', store=True)
+    avances_units_missing = fields.Float(
+        string='Unidades Faltantes', compute='_compute_dashboard_figures', store=True)
+    avances_value_delivered = fields.Monetary(
+        string='Valor Entregado', compute='_compute_dashboard_figures', store=True)
+    avances_value_expected = fields.Monetary(
+        string='Valor Esperado', compute='_compute_dashboard_figures', store=True)
+
+    computed_at = fields.Datetime(
+        string='Calculado el', compute='_compute_dashboard_figures', store=True,
+        help="Momento del último cálculo de las cifras. Se recalculan al abrir si "
+             "vencieron (TTL) o si cambió una orden, línea, avance o costo relacionado.")
 
     def _get_related_tasks(self):
         self.ensure_one()
@@ -614,18 +759,6 @@ class DashboardSaleOrder(models.Model):
 
     def _compute_contenido(self):
         for wizard in self:
-            # Asegurarnos de que todos los campos computados se calculen primero
-
-            wizard._compute_financials()
-            wizard._compute_purchase_data()
-            wizard._compute_task_count()
-            wizard._compute_expenses_data()
-            wizard._compute_lines_data()
-            wizard._compute_requisition_count()
-            wizard._compute_stock_move_data()
-            wizard._compute_timesheet_data()
-            wizard._compute_avances_data()
-
             # Preparar datos de avances para la plantilla
             avances_data = []
             if (wizard.sale_order_id and
@@ -734,227 +867,164 @@ class DashboardSaleOrder(models.Model):
 
             }
 
+            # La plantilla recorre la orden y sus relaciones: se renderiza sin caché
             wizard.contenido = self.env['ir.qweb']._render(
                 'project_modificaciones.sale_order_dashboard_template', values)
 
-    def _compute_financials(self):
-        for wizard in self:
-            wizard._compute_purchase_data()
-            wizard._compute_expenses_data()
-            wizard._compute_stock_move_data()
-            wizard._compute_timesheet_data()
-
-            # Total Entregado
-            wizard.total_entregado = sum(
-                line.qty_delivered * line.price_unit for line in wizard.sale_order_line_ids)
-
-            # Ingresos totales de la orden de venta
-            wizard.total_revenue = wizard.sale_order_id.amount_untaxed if wizard.sale_order_id else 0.0
-
-            # Costos totales (compras + gastos + almacén + hojas)
-            wizard.total_costs = (
-                (wizard.purchase_total or 0)
-                + (wizard.expenses_total or 0)
-                + (wizard.stock_move_cost or 0)
-                + (wizard.timesheet_total or 0)
-            )
-
-            # Facturado: Suma de la cantidad facturada multiplicada por el precio unitario de cada línea.
-            wizard.total_invoiced = sum(
-                line.qty_invoiced * line.price_unit for line in wizard.sale_order_line_ids)
-
-            # Por facturar: Suma de las unidades por entregar multiplicada por el precio unitario de cada línea.
-            wizard.total_x_invoiced = sum(
-                (line.qty_delivered - line.qty_invoiced) * line.price_unit for line in wizard.sale_order_line_ids)
-
-            # Margen de ganancia
-            wizard.profit_margin = wizard.total_entregado - wizard.total_costs
-
-            # Porcentaje de rentabilidad
-            if wizard.total_entregado > 0:
-                wizard.profitability_percentage = (
-                    wizard.profit_margin / wizard.total_entregado) * 100
-            else:
-                wizard.profitability_percentage = 0.0
-
-    def _compute_task_count(self):
-        for record in self:
-            record.task_count = len(record._get_related_tasks()) if record.sale_order_id else 0
-
-    def _compute_purchase_count(self):
-        for record in self:
-            if record.sale_order_id:
-                task_ids = record._get_related_tasks()
-                purchase_order_lines = self.env['purchase.order.line'].search(
-                    [('task_id', 'in', task_ids.ids)])
-                purchase_order_ids = purchase_order_lines.mapped('order_id')
-                record.purchase_count = len(purchase_order_ids)
-            else:
-                record.purchase_count = 0
-
-    def _compute_purchase_data(self):
+    @api.depends('sale_order_id')
+    def _compute_dashboard_figures(self):
+        """Todas las cifras almacenadas del dashboard, en lote para todas las órdenes."""
+        figures = self._get_dashboard_figures()
+        now = fields.Datetime.now()
         for record in self:
-            if record.sale_order_id:
-                task_ids = record._get_related_tasks()
-                purchase_order_lines = self.env['purchase.order.line'].search([
-                    ('task_id', 'in', task_ids.ids),
-                    ('order_id.state', 'in', ('purchase', 'done'))
-                ])
-                record.purchase_total = sum(
-                    purchase_order_lines.mapped('price_subtotal'))
-            else:
-                record.purchase_total = 0.0
-
-    def _compute_expenses_count(self):
-        for record in self:
-            if record.sale_order_id:
-                task_ids = record._get_related_tasks()
-                expenses = self.env['hr.expense'].search(
-                    [('task_id', 'in', task_ids.ids)])
-                record.expenses_count = len(expenses)
-            else:
-                record.expenses_count = 0
-
-    def _compute_expenses_data(self):
-        for record in self:
-            if record.sale_order_id:
-                task_ids = record._get_related_tasks()
-                expenses = self.env['hr.expense'].search([
-                    ('task_id', 'in', task_ids.ids),
-                    ('sheet_id.state', 'in', ('approve', 'post', 'done'))
-                ])
-                record.expenses_total = sum(expenses.mapped('total_amount'))
-            else:
-                record.expenses_total = 0.0
-
-    def _compute_lines_count(self):
-        for record in self:
-            record.lines_count = len(
-                record.sale_order_id.order_line) if record.sale_order_id else 0
-
-    def _compute_lines_data(self):
-        for record in self:
-            record.lines_total = record.sale_order_id.amount_untaxed if record.sale_order_id else 0.0
-
-    def _compute_requisition_count(self):
-        for record in self:
-            count = 0
-            if record.sale_order_id:
-                # Buscar tareas relacionadas con la orden de venta
-                task_ids = record._get_related_tasks()
-                if task_ids:
-                    count = self.env['employee.purchase.requisition'].search_count(
-                        [('task_id', 'in', task_ids.ids)])
-            record.requisition_count = count
-
-    def _compute_stock_move_data(self):
-        for record in self:
-            count = 0
-            cost = 0.0
-            if record.sale_order_id:
-                # Buscar tareas relacionadas con la orden de venta
-                tasks = record._get_related_tasks()
-                if tasks:
-                    count = sum(tasks.mapped('stock_move_count'))
-                    cost = sum(tasks.mapped('stock_move_cost'))
-            record.stock_move_count = count
-            record.stock_move_cost = cost
-
-    def _compute_timesheet_data(self):
-        for record in self:
-            if record.sale_order_id:
-                tasks = record._get_related_tasks()
-                timesheets = record._get_related_timesheets(tasks)
-                record.timesheet_count = len(timesheets)
-                record.timesheet_total = sum(abs(line.amount) for line in timesheets)
-                record.timesheet_total_hr = sum(timesheets.mapped('unit_amount'))
-            else:
-                record.timesheet_count = 0
-                record.timesheet_total = 0.0
-
-    def _compute_avances_count(self):
-        for record in self:
-            if (record.sale_order_id and
-                    hasattr(record.sale_order_id, 'project_sub_updates')):
-                record.avances_count = len(
-                    record.sale_order_id.project_sub_updates)
-            else:
-                record.avances_count = 0
-
-    def _compute_avances_data(self):
-        for record in self:
-            # Inicializar variables
-            total_units_delivered = 0.0
-            total_value_delivered = 0.0
-            total_valor_entregado = 0.0
-            avances_count = 0
-
-            # Verificar si la orden de venta existe y tiene avances
-            if record.sale_order_id and hasattr(record.sale_order_id,
-                                                'project_sub_updates') and record.sale_order_id.project_sub_updates:
-
-                avances = record.sale_order_id.project_sub_updates
-
-                for avance in avances:
-                    # UNIDADES ENTREGADAS: Suma de los progresos de cada avance.
-                    # total_units_delivered += avance.unit_progress or 0.0
-
-                    # VALOR ENTREGADO: unit_progress * precio_unitario de la tarea
-                    if avance.task_id and hasattr(avance.task_id, 'price_unit'):
-                        total_value_delivered += (avance.unit_progress or 0.0) * \
-                            (avance.task_id.price_unit or 0.0)
-
-                    avances_count += 1
-
-                # --- SECCIÓN DEL CÁLCULO DEL PORCENTAJE ---
-
-                # Calcular el total de unidades esperadas de la orden de venta
-                total_qty_expected = sum(
-                    record.sale_order_id.order_line.mapped('product_uom_qty'))
-
-                # Calcular el total de unidades entregadas de la orden de venta
-                total_units_delivered = sum(
-                    record.sale_order_id.order_line.mapped('qty_delivered'))
-
-                # Obtener valor total de lo entregado
-                for wizard in self:
-                    total_valor_entregado = sum(
-                        line.qty_delivered * line.price_unit for line in wizard.sale_order_line_ids
-                    )
-
-                # Calcular el progreso total basado en las unidades
-                if total_qty_expected > 0:
-                    record.avances_progress = (
-                        total_units_delivered / total_qty_expected) * 100
-                else:
-                    record.avances_progress = 0.0
-
-                # Almacenar métricas
-                record.avances_units_delivered = total_units_delivered
-                record.avances_units_missing = total_qty_expected - total_units_delivered
-                record.avances_value_delivered = total_valor_entregado
-                # Aquí se mantiene el total_value_expected de la orden de venta
-                record.avances_value_expected = record.sale_order_id.amount_untaxed or 0.0
-                record.avances_count = avances_count
+            values = figures.get(record.sale_order_id.id) or defaultdict(float)
+            record.task_count = values['task_count']
+            record.purchase_count = values['purchase_count']
+            record.purchase_total = values['purchase.order.line']
+            record.expenses_count = values['expenses_count']
+            record.expenses_total = values['hr.expense']
+            record.lines_count = values['lines_count']
+            record.lines_total = values['amount_untaxed']
+            record.requisition_count = values['requisition_count']
+            record.stock_move_count = values['stock_move_count']
+            record.stock_move_cost = values['stock.move']
+            record.timesheet_count = values['timesheet_count']
+            record.timesheet_total = values['account.analytic.line']
+            record.timesheet_total_hr = values['timesheet_hours']
 
+            # Costos totales (compras + gastos + almacén + hojas)
+            total_entregado = values['delivered']
+            total_costs = (record.purchase_total + record.expenses_total
+                           + record.stock_move_cost + record.timesheet_total)
+            profit_margin = total_entregado - total_costs
+            record.total_entregado = total_entregado
+            record.total_revenue = values['amount_untaxed']
+            record.total_costs = total_costs
+            record.total_invoiced = values['invoiced']
+            record.total_x_invoiced = total_entregado - values['invoiced']
+            record.profit_margin = profit_margin
+            record.profitability_percentage = (
+                profit_margin / total_entregado * 100) if total_entregado > 0 else 0.0
+
+            record.avances_count = values['avances_count']
+            if values['avances_count']:
+                qty_expected = values['qty_expected']
+                record.avances_progress = (
+                    values['qty_delivered'] / qty_expected * 100) if qty_expected > 0 else 0.0
+                record.avances_units_delivered = values['qty_delivered']
+                record.avances_units_missing = qty_expected - values['qty_delivered']
+                record.avances_value_delivered = total_entregado
+                record.avances_value_expected = values['amount_untaxed']
             else:
-                # Si no hay avances, todos los valores son cero
                 record.avances_progress = 0.0
                 record.avances_units_delivered = 0.0
                 record.avances_units_missing = 0.0
                 record.avances_value_delivered = 0.0
                 record.avances_value_expected = 0.0
-                record.avances_count = 0
-
-    # Añadir estos campos al modelo
-    avances_units_delivered = fields.Float(
-        string='Unidades Entregadas', compute='_compute_avances_data')
-    avances_units_missing = fields.Float(
-        string='Unidades Faltantes', compute='_compute_avances_data')
-    avances_value_delivered = fields.Monetary(
-        string='Valor Entregado', compute='_compute_avances_data')
-    avances_value_expected = fields.Monetary(
-        string='Valor Esperado', compute='_compute_avances_data')
+            record.computed_at = now
+
+    def _get_dashboard_figures(self):
+        """
+        Cifras de todas las órdenes de self en una sola pasada: tareas, libro de
+        costos, compras, gastos, requisiciones, almacén, horas, líneas y avances
+        agrupados por orden. Retorna {sale_order_id: {cifra: valor}}.
+        """
+        orders = self.sale_order_id
+        figures = {order.id: defaultdict(float) for order in orders}
+        if not orders:
+            return figures
+
+        Task = self.env['project.task']
+        order_by_task = {}
+        for order, task_ids in Task._read_group(
+                [('sale_order_id', 'in', orders.ids)], ['sale_order_id'], ['id:array_agg']):
+            figures[order.id]['task_count'] = len(task_ids)
+            order_by_task.update(dict.fromkeys(task_ids, order.id))
+        tasks = Task.browse(list(order_by_task))
+
+        # Costos por fuente desde el libro (un solo GROUP BY para todas las órdenes)
+        totals = self.env['project.cost.ledger']._read_totals(
+            [('task_id', 'in', tasks.ids)], ['task_id'])
+        for (source_model, _bucket, task_id), amount in totals.items():
+            figures[order_by_task[task_id]][source_model] += amount
+
+        purchase_ids = defaultdict(set)
+        for task, purchase_order_ids in self.env['purchase.order.line']._read_group(
+                [('task_id', 'in', tasks.ids)], ['task_id'], ['order_id:array_agg']):
+            purchase_ids[order_by_task[task.id]].update(purchase_order_ids)
+        for order_id, purchase_order_ids in purchase_ids.items():
+            figures[order_id]['purchase_count'] = len(purchase_order_ids)
+
+        for model_name, key in (('hr.expense', 'expenses_count'),
+                                ('employee.purchase.requisition', 'requisition_count')):
+            for task, count in self.env[model_name]._read_group(
+                    [('task_id', 'in', tasks.ids)], ['task_id'], ['__count']):
+                figures[order_by_task[task.id]][key] += count
+
+        for task, count, hours in self.env['account.analytic.line'].sudo()._read_group(
+                [('task_id', 'in', tasks.ids)], ['task_id'], ['__count', 'unit_amount:sum']):
+            figures[order_by_task[task.id]]['timesheet_count'] += count
+            figures[order_by_task[task.id]]['timesheet_hours'] += hours
+
+        for task in tasks:
+            figures[order_by_task[task.id]]['stock_move_count'] += task.stock_move_count
+
+        for order in orders:
+            values = figures[order.id]
+            lines = order.order_line
+            values['lines_count'] = len(lines)
+            values['amount_untaxed'] = order.amount_untaxed
+            values['qty_expected'] = sum(lines.mapped('product_uom_qty'))
+            values['qty_delivered'] = sum(lines.mapped('qty_delivered'))
+            values['delivered'] = sum(line.qty_delivered * line.price_unit for line in lines)
+            values['invoiced'] = sum(line.qty_invoiced * line.price_unit for line in lines)
+            if 'project_sub_updates' in order._fields:
+                values['avances_count'] = len(order.project_sub_updates)
+        return figures
+
+    # ---------------------------------------------------------------------
+    # Caché persistente: cifras almacenadas, vigencia por TTL e invalidación
+    # ---------------------------------------------------------------------
+    def _get_figure_fields(self):
+        return [field for field in self._fields.values()
+                if field.compute == '_compute_dashboard_figures']
+
+    def _refresh_dashboards(self):
+        """Recalcula las cifras de todos los dashboards de self en una sola pasada."""
+        for field in self._get_figure_fields():
+            self.env.add_to_compute(field, self)
+        self.flush_recordset()
+
+    def _get_stale_dashboards(self):
+        """Dashboards invalidados o calculados hace más del TTL configurado (minutos)."""
+        ttl = int(self.env['ir.config_parameter'].sudo().get_param(
+            'project_modificaciones.sale_dashboard_ttl', 30))
+        limit = fields.Datetime.now() - timedelta(minutes=ttl)
+        return self.filtered(
+            lambda dashboard: not dashboard.computed_at or dashboard.computed_at < limit)
+
+    @api.model
+    def _invalidate_dashboards(self, order_ids=(), task_ids=()):
+        """Marca como vencidos los dashboards de las órdenes o de las tareas dadas."""
+        order_ids = [order_id for order_id in order_ids if isinstance(order_id, int)]
+        task_ids = [task_id for task_id in task_ids if isinstance(task_id, int)]
+        if not (order_ids or task_ids):
+            return
+        if task_ids:
+            self.env['project.task'].flush_model(['sale_order_id'])
+        self.env.cr.execute("""
+            UPDATE dashboard_sale_order
+               SET computed_at = NULL
+             WHERE computed_at IS NOT NULL
+               AND (sale_order_id = ANY(%(order_ids)s)
+                    OR sale_order_id IN (SELECT sale_order_id FROM project_task
+                                          WHERE id = ANY(%(task_ids)s)))
+        """, {'order_ids': order_ids, 'task_ids': task_ids})
+        self.invalidate_model(['computed_at'])
+
+    def action_refresh_dashboard(self):
+        self._refresh_dashboards()
+        return True
 
     # Acciones de navegación
     def action_view_purchase_orders(self):
@@ -1094,16 +1164,112 @@ class DashboardSaleOrder(models.Model):
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
 
+    def write(self, vals):
+        res = super().write(vals)
+        if SALE_ORDER_DASHBOARD_FIELDS.intersection(vals):
+            self.env['dashboard.sale.order']._invalidate_dashboards(order_ids=self.ids)
+        return res
+
     def action_open_sale_dashboard(self):
-        self.ensure_one()
-        wizard = self.env['dashboard.sale.order'].create(
-            {'sale_order_id': self.id})
+        """
+        Abre los dashboards de las órdenes (uno o varios desde la lista). Se
+        reutilizan los guardados; los vencidos se recalculan juntos y los nuevos
+        se calculan en lote al crearse.
+        """
+        Dashboard = self.env['dashboard.sale.order']
+        by_order = {}
+        for dashboard in Dashboard.search([('sale_order_id', 'in', self.ids)]):
+            by_order.setdefault(dashboard.sale_order_id.id, dashboard.id)
+        dashboards = Dashboard.browse(list(by_order.values()))
+        dashboards._get_stale_dashboards()._refresh_dashboards()
+        missing = self.filtered(lambda order: order.id not in by_order)
+        if missing:
+            dashboards |= Dashboard.create([{'sale_order_id': order.id} for order in missing])
+        if len(self) == 1:
+            return {
+                'type': 'ir.actions.act_window',
+                'name': f"Dashboard - {self.display_name}",
+                'res_model': 'dashboard.sale.order',
+                'view_mode': 'form',
+                'res_id': dashboards.id,
+                'target': 'current',
+            }
         return {
             'type': 'ir.actions.act_window',
-            'name': f"Dashboard - {self.display_name}",
+            'name': _('Dashboards de Órdenes de Venta'),
             'res_model': 'dashboard.sale.order',
-            'view_mode': 'form',
-            'res_id': wizard.id,
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', dashboards.ids)],
             'target': 'current',
         }
+
+
+class SaleOrderLine(models.Model):
+    _inherit = 'sale.order.line'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        self.env['dashboard.sale.order']._invalidate_dashboards(order_ids=lines.order_id.ids)
+        return lines
+
+    def write(self, vals):
+        if not SALE_LINE_DASHBOARD_FIELDS.intersection(vals):
+            return super().write(vals)
+        # Al mover la línea de orden se vencen la orden anterior y la nueva
+        order_ids = self.order_id.ids
+        res = super().write(vals)
+        self.env['dashboard.sale.order']._invalidate_dashboards(
+            order_ids=order_ids + self.order_id.ids)
+        return res
+
+    def unlink(self):
+        self.env['dashboard.sale.order']._invalidate_dashboards(order_ids=self.order_id.ids)
+        return super().unlink()
+
+
+class ProjectSubUpdate(models.Model):
+    _inherit = 'project.sub.update'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        updates = super().create(vals_list)
+        self.env['dashboard.sale.order']._invalidate_dashboards(task_ids=updates.task_id.ids)
+        return updates
+
+    def write(self, vals):
+        if not SUB_UPDATE_DASHBOARD_FIELDS.intersection(vals):
+            return super().write(vals)
+        task_ids = self.task_id.ids
+        res = super().write(vals)
+        self.env['dashboard.sale.order']._invalidate_dashboards(
+            task_ids=task_ids + self.task_id.ids)
+        return res
+
+    def unlink(self):
+        self.env['dashboard.sale.order']._invalidate_dashboards(task_ids=self.task_id.ids)
+        return super().unlink()
+
+
+class EmployeePurchaseRequisition(models.Model):
+    _inherit = 'employee.purchase.requisition'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        requisitions = super().create(vals_list)
+        self.env['dashboard.sale.order']._invalidate_dashboards(task_ids=requisitions.task_id.ids)
+        return requisitions
+
+    def write(self, vals):
+        if not REQUISITION_DASHBOARD_FIELDS.intersection(vals):
+            return super().write(vals)
+        task_ids = self.task_id.ids
+        res = super().write(vals)
+        self.env['dashboard.sale.order']._invalidate_dashboards(
+            task_ids=task_ids + self.task_id.ids)
+        return res
+
+    def unlink(self):
+        self.env['dashboard.sale.order']._invalidate_dashboards(task_ids=self.task_id.ids)
+        return super().unlink()
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
@@ -1,5 +1,8 @@
 <<<<<<< HEAD
+from collections import defaultdict
+
 from odoo import api, fields, models, _
+from odoo.exceptions import AccessError
 from odoo.tools import format_amount
 from odoo.tools.float_utils import float_round
 
@@ -19,6 +22,9 @@ class AnalyticsTaskDashboard(models.TransientModel):
 
     # Referencia a la tarea y metadatos del wizard
     task_id = fields.Many2one('project.task', string='Tarea', required=True)
+    include_subtasks = fields.Boolean(
+        string='Incluir subtareas',
+        help='Resume la tarea junto con todas sus subtareas descendientes.')
     name = fields.Char(string='Nombre', compute='_compute_name')
     content = fields.Html(string='Contenido',
                           compute='_compute_content', sanitize=False)
@@ -105,83 +111,44 @@ class AnalyticsTaskDashboard(models.TransientModel):
             task_name = wizard.task_id.display_name if wizard.task_id else ''
             wizard.name = f"Tablero de {task_name}" if task_name else 'Tablero'
 
-    @api.depends('task_id')
+    @api.depends('task_id', 'include_subtasks')
     def _compute_content(self):
-        # Reúne datos (gastos aprobados y compras confirmadas) y renderiza la plantilla QWeb
+        # Reúne los datos del cargador compartido y renderiza la plantilla QWeb
+        dashboard_data = self._get_dashboard_data()
         for wizard in self:
-            expenses = self.env['hr.expense'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('sheet_id.state', 'in', ['approve', 'post', 'done'])
-            ])
-            # Compras: considerar solo líneas de compra asociadas a la tarea
-            polines = self.env['purchase.order.line'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('order_id.state', 'in', ('purchase', 'done')),
-            ])
-
-            total_expenses = sum(expenses.mapped(
-                'total_amount')) if expenses else 0.0
-            total_purchases = sum(polines.mapped(
-                'price_subtotal')) if polines else 0.0
-
-            # Calcular facturación de compras (proveedores) para separar "Por facturar" vs "Facturado"
-            vendor_bill_lines = self.env['account.move.line'].search([
-                ('purchase_line_id.task_id', '=', wizard.task_id.id),
-                ('move_id.state', '=', 'posted'),
-                ('move_id.move_type', 'in', ('in_invoice', 'in_refund')),
-            ])
-            purchases_billed = sum(vendor_bill_lines.mapped(
-                'price_subtotal')) if vendor_bill_lines else 0.0
-            purchases_to_bill = max(total_purchases - purchases_billed, 0.0)
-
-            # Calcular facturación de gastos: considerar como "facturado" cuando la hoja está posteada/done
-            expenses_billed = 0.0
-            expenses_to_bill = 0.0
-            if expenses:
-                expenses_billed = sum(
-                    expenses.filtered(lambda e: e.sheet_id and e.sheet_id.state in ('post', 'done')).mapped(
-                        'total_amount'))
-                expenses_to_bill = max(total_expenses - expenses_billed, 0.0)
-
-            # --- Timesheets Logic ---
-            comp_lines = self.env['compensation.line'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('compensation_id.state', 'in', ['approved', 'applied'])
-            ])
-            timesheet_cost = sum(comp_lines.mapped('total_cost'))
-            timesheet_billed = sum(comp_lines.filtered(
-                lambda l: l.compensation_id.state == 'applied').mapped('total_cost'))
-            timesheet_to_bill = max(timesheet_cost - timesheet_billed, 0.0)
+            data = dashboard_data[wizard.task_id.id, wizard.include_subtasks]
+            costs = data['costs']
+
+            # Gastos: "facturado" cuando la hoja tiene asiento publicado
+            expenses_billed = costs[('hr.expense', 'billed')]
+            expenses_to_bill = costs[('hr.expense', 'to_bill')]
+            total_expenses = expenses_billed + expenses_to_bill
+
+            # Compras: facturado vs por facturar (recibido o comprometido)
+            purchases_billed = costs[('purchase.order.line', 'billed')]
+            purchases_to_bill = (costs[('purchase.order.line', 'to_bill')]
+                                 + costs[('purchase.order.line', 'committed')])
+            total_purchases = purchases_billed + purchases_to_bill
+
+            # --- Timesheets Logic (compensaciones) ---
+            timesheet_billed = costs[('compensation.line', 'billed')]
+            timesheet_to_bill = costs[('compensation.line', 'to_bill')]
+            timesheet_cost = timesheet_billed + timesheet_to_bill
 
             # --- Stock Moves Logic ---
-            stock_billed = wizard.task_id.stock_move_cost or 0.0
+            stock_billed = costs[('stock.move', 'billed')] + costs[('stock.move', 'to_bill')]
             # Calculated Pending Stock Cost
-            all_moves = self.env['stock.move'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('state', 'in', ['confirmed', 'assigned',
-                                 'partially_available', 'done']),
-                ('picking_type_id.code', '=', 'outgoing')
-            ])
-            scope_qty_per_product = {}
-            for move in all_moves:
-                scope_qty_per_product[move.product_id.id] = scope_qty_per_product.get(
-                    move.product_id.id, 0.0) + move.product_uom_qty
-
-            purchased_qty_per_product = {}
-            purchase_lines = self.env['purchase.order.line'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('order_id.state', 'in', ['purchase', 'done'])
-            ])
-            for line in purchase_lines:
-                purchased_qty_per_product[line.product_id.id] = purchased_qty_per_product.get(
-                    line.product_id.id, 0.0) + line.product_qty
+            moves = data['moves']
+            scope_qty_per_product = defaultdict(float)
+            for move in moves:
+                scope_qty_per_product[move.product_id] += move.product_uom_qty
 
+            purchased_qty_per_product = data['purchased_qty']
             stock_expected = 0.0
-            for product_id, scope_qty in scope_qty_per_product.items():
-                purchased_qty = purchased_qty_per_product.get(product_id, 0.0)
+            for product, scope_qty in scope_qty_per_product.items():
+                purchased_qty = purchased_qty_per_product.get(product.id, 0.0)
                 chargeable_qty = max(0.0, scope_qty - purchased_qty)
                 if chargeable_qty > 0:
-                    product = self.env['product.product'].browse(product_id)
                     stock_expected += chargeable_qty * product.standard_price
 
             stock_to_bill = max(stock_expected - stock_billed, 0.0)
@@ -194,22 +161,13 @@ class AnalyticsTaskDashboard(models.TransientModel):
             wizard.total_facturado = total_facturado
             wizard.total_a_facturar = total_a_facturar
 
-            esperado_sin_orden = 0.0
-            for avance in wizard.task_id.sub_update_ids:
-                if avance.precio_unidad and avance.unit_progress:
-                    esperado_sin_orden += avance.precio_unidad * avance.unit_progress
+            esperado_sin_orden = data['esperado_sin_orden']
 
             # Preparar lista de movimientos de almacén para el detalle
             stock_moves_list = []
             # CORRECCIÓN: Mostrar TODOS los movimientos relevantes (Done + Pending) para la tabla de detalle
             # Esto debe coincidir con la lógica de cálculo de costos
-            moves = self.env['stock.move'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('state', 'in', ['confirmed', 'assigned',
-                 'partially_available', 'done']),
-                ('picking_type_id.code', '=', 'outgoing')
-            ])
-
+            base_url = data['base_url']
             for move in moves:
                 # Calcular costo (fallback a costo estándar del producto si el movimiento no tiene precio)
                 price_unit = move.price_unit or move.product_id.standard_price
@@ -219,8 +177,6 @@ class AnalyticsTaskDashboard(models.TransientModel):
                 total_cost = qty_display * price_unit
 
                 # Generar URL directa al picking
-                base_url = wizard.env['ir.config_parameter'].sudo(
-                ).get_param('web.base.url')
                 picking_url = f"{base_url}/web#id={move.picking_id.id}&model=stock.picking&view_type=form"
 
                 # Obtener Lotes/Series (si existen)
@@ -263,7 +219,6 @@ class AnalyticsTaskDashboard(models.TransientModel):
 
             # Construir datos para plantilla de dashboard de tarea (similar a proyecto)
             values = {
-                'wizard_id': wizard.id,
                 'profitability': {
                     'expected_income': wizard.expected_income,
                     'timesheet_cost': timesheet_cost,
@@ -302,100 +257,226 @@ class AnalyticsTaskDashboard(models.TransientModel):
                 'format_percentage': lambda v: f"{v:.2f}%" if v is not False else '0.00%',
                 'format_signed_percentage': lambda v: f"{('+' if v >= 0 else '')}{v:.2f}%" if v is not False else '0.00%',
             }
-            wizard.content = self.env['ir.qweb']._render(
-                'project_modificaciones.task_dashboard_template', values)
+            wizard.content = self.env['ir.qweb']._render_fragment(
+                'project_modificaciones.task_dashboard_template', values, wizard.currency_id)
 
-    @api.depends('task_id', 'task_id.effective_hours', 'task_id.timesheet_ids')
+    @api.depends('task_id', 'include_subtasks', 'task_id.effective_hours', 'task_id.timesheet_ids')
     def _compute_stats(self):
         # KPIs rápidos: horas, subtareas, ventas, compras confirmadas y gastos aprobados
+        dashboard_data = self._get_dashboard_data()
         for wizard in self:
+            data = dashboard_data[wizard.task_id.id, wizard.include_subtasks]
+            scope_tasks = self.env['project.task'].browse(data['scope_ids'])
             # Timesheets
-            try:
-                wizard.timesheet_count = len(wizard.task_id.timesheet_ids)
-                wizard.timesheet_hours = wizard.task_id.effective_hours
-            except Exception:
-                wizard.timesheet_count = 0
-                wizard.timesheet_hours = 0.0
-            # Subtareas
-            wizard.subtask_count = len(wizard.task_id.child_ids)
+            wizard.timesheet_count = data['timesheet_count']
+            wizard.timesheet_hours = data['timesheet_hours']
+            # Subtareas: hijas directas o todo el subárbol
+            if wizard.include_subtasks:
+                wizard.subtask_count = len(scope_tasks) - 1
+            else:
+                wizard.subtask_count = len(wizard.task_id.child_ids)
             # Ventas
-            wizard.sale_order_count = 1 if wizard.task_id.sale_order_id else 0
-            wizard.sale_line_count = 1 if wizard.task_id.sale_line_id else 0
+            wizard.sale_order_count = len(scope_tasks.sale_order_id)
+            wizard.sale_line_count = len(scope_tasks.sale_line_id)
             # Compras (solo confirmadas o hechas)
-            wizard.purchase_count = self.env['purchase.order.line'].search_count([
-                ('task_id', '=', wizard.task_id.id),
-                ('order_id.state', 'in', ('purchase', 'done')),
-            ])
+            wizard.purchase_count = data['purchase_count']
             # Gastos (solo aprobados o posteriores)
-            wizard.expense_count = self.env['hr.expense'].search_count([
-                ('task_id', '=', wizard.task_id.id),
-                ('sheet_id.state', 'in', ['approve', 'post', 'done'])
-            ])
+            wizard.expense_count = data['expense_count']
             # Movimientos de almacén
-            wizard.stock_move_count = wizard.task_id.stock_move_count
+            wizard.stock_move_count = sum(scope_tasks.mapped('stock_move_count'))
             # Requisiciones
-            wizard.requisition_count = wizard.task_id.requisition_count
+            wizard.requisition_count = sum(scope_tasks.mapped('requisition_count'))
+
+    @api.model
+    def _get_task_ledger_costs(self, tasks):
+        """
+        Costos de tasks desde project.cost.ledger con un solo GROUP BY.
+        Retorna {task_id: {(fuente, estado): monto en moneda de la compañía}}.
+        """
+        totals = self.env['project.cost.ledger']._read_totals(
+            [('task_id', 'in', tasks.ids)], ['task_id'])
+        costs = defaultdict(lambda: defaultdict(float))
+        for (source_model, bucket, task_id), amount in totals.items():
+            costs[task_id][(source_model, bucket)] += amount
+        return costs
+
+    def _get_task_scopes(self, include_subtasks=False):
+        """
+        Tareas que resume cada tarea de self.task_id: ella misma o, con
+        include_subtasks, ella y todos sus descendientes (un solo CTE recursivo).
+        Retorna {task_id: [task_ids del alcance]}.
+        """
+        task_ids = self.task_id.ids
+        if not include_subtasks:
+            return {task_id: [task_id] for task_id in task_ids}
+        self.env['project.task'].flush_model(['parent_id'])
+        self.env.cr.execute("""
+            WITH RECURSIVE tree AS (
+                SELECT id AS root_id, id
+                  FROM project_task
+                 WHERE id = ANY(%s)
+                 UNION
+                SELECT tree.root_id, pt.id
+                  FROM project_task pt
+                  JOIN tree ON pt.parent_id = tree.id
+            )
+            SELECT root_id, id FROM tree
+        """, [task_ids])
+        scopes = defaultdict(list)
+        for root_id, task_id in self.env.cr.fetchall():
+            scopes[root_id].append(task_id)
+        return scopes
+
+    def _get_dashboard_data(self):
+        """
+        Cargador único del dashboard: consulta cada fuente una sola vez para todas
+        las tareas de self y lo comparte entre _compute_content, _compute_stats y
+        _compute_profitability durante la transacción. Con include_subtasks cada
+        tarea resume su subárbol con consultas task_id IN (...) agrupadas.
+        Retorna {(task_id, include_subtasks): {scope_ids, costs, moves, sale_lines,
+        purchased_qty, purchase_count, expense_count, timesheet_count,
+        timesheet_hours, esperado_sin_orden, base_url}}.
+        """
+        cache = self.env.cr.cache.setdefault('project_modificaciones_task_dashboard', {})
+        loaded = cache.setdefault(self.env.uid, {})
+        for include_subtasks in (False, True):
+            wizards = self.filtered(
+                lambda wizard: bool(wizard.include_subtasks) == include_subtasks
+                and (wizard.task_id.id, include_subtasks) not in loaded)
+            if wizards.task_id:
+                loaded.update(wizards._load_dashboard_data(include_subtasks))
+        return loaded
+
+    def _load_dashboard_data(self, include_subtasks):
+        scopes = self._get_task_scopes(include_subtasks)
+        # Una tarea puede pertenecer al alcance de varias raíces
+        roots_by_task = defaultdict(list)
+        for root_id, scope_ids in scopes.items():
+            for task_id in scope_ids:
+                roots_by_task[task_id].append(root_id)
+        all_tasks = self.env['project.task'].browse(list(roots_by_task))
+
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        data = {
+            root_id: {
+                'scope_ids': scope_ids,
+                'costs': defaultdict(float),
+                'moves': self.env['stock.move'],
+                'sale_lines': self.env['sale.order.line'],
+                'purchased_qty': defaultdict(float),
+                'purchase_count': 0,
+                'expense_count': 0,
+                'timesheet_count': 0,
+                'timesheet_hours': 0.0,
+                'esperado_sin_orden': 0.0,
+                'base_url': base_url,
+            }
+            for root_id, scope_ids in scopes.items()
+        }
+
+        ledger_costs = self._get_task_ledger_costs(all_tasks)
+        for task_id, task_costs in ledger_costs.items():
+            for root_id in roots_by_task[task_id]:
+                for key, amount in task_costs.items():
+                    data[root_id]['costs'][key] += amount
+
+        moves = self.env['stock.move'].search([
+            ('task_id', 'in', all_tasks.ids),
+            ('state', 'in', ['confirmed', 'assigned',
+                             'partially_available', 'done']),
+            ('picking_type_id.code', '=', 'outgoing')
+        ])
+        move_ids = defaultdict(list)
+        for move in moves:
+            for root_id in roots_by_task[move.task_id.id]:
+                move_ids[root_id].append(move.id)
+        for root_id, ids in move_ids.items():
+            # browse conserva el prefetch de la búsqueda completa
+            data[root_id]['moves'] = moves.browse(ids)
+
+        for task in all_tasks:
+            for root_id in roots_by_task[task.id]:
+                data[root_id]['sale_lines'] |= task.sale_line_id
+
+        purchase_groups = self.env['purchase.order.line']._read_group(
+            [('task_id', 'in', all_tasks.ids), ('order_id.state', 'in', ('purchase', 'done'))],
+            ['task_id', 'product_id'], ['product_qty:sum', '__count'])
+        for task, product, qty, count in purchase_groups:
+            for root_id in roots_by_task[task.id]:
+                data[root_id]['purchased_qty'][product.id] += qty
+                data[root_id]['purchase_count'] += count
+
+        expense_groups = self.env['hr.expense']._read_group(
+            [('task_id', 'in', all_tasks.ids), ('sheet_id.state', 'in', ['approve', 'post', 'done'])],
+            ['task_id'], ['__count'])
+        for task, count in expense_groups:
+            for root_id in roots_by_task[task.id]:
+                data[root_id]['expense_count'] += count
+
+        try:
+            timesheet_groups = self.env['account.analytic.line']._read_group(
+                [('task_id', 'in', all_tasks.ids), ('project_id', '!=', False)],
+                ['task_id'], ['unit_amount:sum', '__count'])
+        except AccessError:
+            timesheet_groups = []
+        for task, hours, count in timesheet_groups:
+            for root_id in roots_by_task[task.id]:
+                data[root_id]['timesheet_hours'] += hours
+                data[root_id]['timesheet_count'] += count
+
+        for avance in all_tasks.sub_update_ids:
+            if avance.precio_unidad and avance.unit_progress:
+                for root_id in roots_by_task[avance.task_id.id]:
+                    data[root_id]['esperado_sin_orden'] += avance.precio_unidad * avance.unit_progress
+
+        return {(root_id, include_subtasks): values for root_id, values in data.items()}
+
+    def _get_scope_task_ids(self):
+        self.ensure_one()
+        return self._get_dashboard_data()[self.task_id.id, self.include_subtasks]['scope_ids']
 
-    @api.depends('task_id')
+    @api.depends('task_id', 'include_subtasks')
     def _compute_profitability(self):
+        dashboard_data = self._get_dashboard_data()
         for wizard in self:
+            data = dashboard_data[wizard.task_id.id, wizard.include_subtasks]
             # --- 1. Inicialización ---
             expected = 0.0
             invoiced = 0.0
             total_delivered_amount = 0.0
             to_invoice = 0.0
 
-            # --- 2. Ingresos (Ventas) ---
-            sol = wizard.task_id.sale_line_id
-            if sol:
-                expected = sol.price_subtotal or 0.0
+            # --- 2. Ingresos (Ventas): línea de la tarea o de todo el subárbol ---
+            for sol in data['sale_lines']:
+                expected += sol.price_subtotal or 0.0
                 posted_lines = sol.invoice_lines.filtered(
                     lambda l: l.move_id.state == 'posted')
-                invoiced = sum(posted_lines.mapped('price_subtotal'))
-                total_delivered_amount = sol.qty_delivered * sol.price_unit
+                invoiced += sum(posted_lines.mapped('price_subtotal'))
+                total_delivered_amount += sol.qty_delivered * sol.price_unit
                 qty_to_invoice = sol.qty_delivered - sol.qty_invoiced
-                to_invoice = qty_to_invoice * sol.price_unit
+                to_invoice += qty_to_invoice * sol.price_unit
 
             wizard.expected_income = expected
             wizard.invoiced_income = invoiced
             wizard.to_invoice_income = to_invoice
             wizard.total_entregado = total_delivered_amount
 
-            # --- 3. Costos (Gastos, Compras, Stock, Horas) ---
+            # --- 3. Costos (Gastos, Compras, Stock, Horas) desde el libro de costos ---
+            costs = data['costs']
 
             # A. Gastos
-            expenses = self.env['hr.expense'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('sheet_id.state', 'in', ['approve', 'post', 'done'])
-            ])
-            expenses_total = sum(expenses.mapped('total_amount'))
-
-            # Facturación Gastos
-            expenses_billed = sum(expenses.filtered(
-                lambda e: e.sheet_id.state in ('post', 'done')
-            ).mapped('total_amount'))
-            expenses_to_bill = max(expenses_total - expenses_billed, 0.0)
-
-            # B. Compras
-            # Optimización: Buscar lineas directamente, no hace falta buscar PO y luego lineas
-            purchase_lines = self.env['purchase.order.line'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('order_id.state', 'in', ('purchase', 'done'))
-            ])
-            purchases_total = sum(purchase_lines.mapped('price_subtotal'))
-
-            # Facturación Compras
-            vendor_bill_lines = self.env['account.move.line'].search([
-                ('purchase_line_id.task_id', '=', wizard.task_id.id),
-                ('move_id.state', '=', 'posted'),
-                ('move_id.move_type', 'in', ('in_invoice', 'in_refund')),
-            ])
-            purchases_billed = sum(vendor_bill_lines.mapped('price_subtotal'))
-            purchases_to_bill = max(purchases_total - purchases_billed, 0.0)
+            expenses_billed = costs[('hr.expense', 'billed')]
+            expenses_to_bill = costs[('hr.expense', 'to_bill')]
+            expenses_total = expenses_billed + expenses_to_bill
+
+            # B. Compras: lo comprometido sin recibir también queda por facturar
+            purchases_billed = costs[('purchase.order.line', 'billed')]
+            purchases_to_bill = (costs[('purchase.order.line', 'to_bill')]
+                                 + costs[('purchase.order.line', 'committed')])
+            purchases_total = purchases_billed + purchases_to_bill
 
             # C. Stock
-            # Usamos el costo ya calculado en la tarea para el total global
-            stock_cost = wizard.task_id.stock_move_cost or 0.0
+            stock_cost = costs[('stock.move', 'billed')] + costs[('stock.move', 'to_bill')]
 
             # Nota: Para saber cuanto está "facturado" o "por facturar" de stock,
             # Odoo estándar no factura stock moves directamente al cliente de forma simple
@@ -406,15 +487,10 @@ class AnalyticsTaskDashboard(models.TransientModel):
             stock_billed = stock_cost
             stock_to_bill = 0.0
 
-            # D. Hojas de Horas
-            comp_lines = self.env['compensation.line'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('compensation_id.state', 'in', ['approve', 'applied'])
-            ])
-            timesheet_cost = sum(comp_lines.mapped('total_cost'))
-            timesheet_billed = sum(comp_lines.filtered(
-                lambda l: l.compensation_id.state == 'applied').mapped('total_cost'))
-            timesheet_to_bill = max(timesheet_cost - timesheet_billed, 0.0)
+            # D. Hojas de Horas (compensaciones)
+            timesheet_billed = costs[('compensation.line', 'billed')]
+            timesheet_to_bill = costs[('compensation.line', 'to_bill')]
+            timesheet_cost = timesheet_billed + timesheet_to_bill
 
             # --- 4. Asignación de Campos de Costos ---
             wizard.total_expenses = expenses_total
@@ -463,11 +539,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
                 wizard.billed_invoiced_percentage = 0.0
 
             # --- 8. Producción S/OV (Lógica específica tuya) ---
-            esperado_sin_ov = 0.0
-            for avance in wizard.task_id.sub_update_ids:
-                if avance.precio_unidad and avance.unit_progress:
-                    esperado_sin_ov += avance.precio_unidad * avance.unit_progress
-            wizard.esperado_sin_orden = esperado_sin_ov
+            wizard.esperado_sin_orden = data['esperado_sin_orden']
 
     # Acciones de navegación
     def action_view_subtasks(self):
@@ -478,7 +550,8 @@ class AnalyticsTaskDashboard(models.TransientModel):
             'name': 'Subtareas',
             'res_model': 'project.task',
             'view_mode': 'list,kanban,form',
-            'domain': [('parent_id', '=', self.task_id.id)],
+            'domain': [('parent_id', '=', self.task_id.id)] if not self.include_subtasks
+            else [('id', 'in', self._get_scope_task_ids()), ('id', '!=', self.task_id.id)],
             'context': {'default_parent_id': self.task_id.id, 'default_project_id': self.task_id.project_id.id},
         }
 
@@ -489,7 +562,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
         # Usamos sudo() para asegurar acceso si hay reglas de registro restrictivas
         # Ampliamos la búsqueda para incluir moves pendientes si es necesario
         moves = self.env['stock.move'].search(
-            [('task_id', '=', self.task_id.id)])
+            [('task_id', 'in', self._get_scope_task_ids())])
         picking_ids = moves.mapped('picking_id').ids
 
         return {
@@ -509,7 +582,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
             'name': 'Requisiciones',
             'res_model': 'employee.purchase.requisition',
             'view_mode': 'tree,form',
-            'domain': [('task_id', '=', self.task_id.id)],
+            'domain': [('task_id', 'in', self._get_scope_task_ids())],
             'context': {'default_task_id': self.task_id.id},
         }
 
@@ -522,7 +595,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
 
         # 1. Buscar líneas de compensación vinculadas a la tarea
         comp_lines = self.env['compensation.line'].search(
-            [('task_id', '=', self.task_id.id)]
+            [('task_id', 'in', self._get_scope_task_ids())]
         )
         # 2. Obtener los IDs únicos de las solicitudes de compensación asociadas
         request_ids = comp_lines.mapped('compensation_id')
@@ -540,6 +613,16 @@ class AnalyticsTaskDashboard(models.TransientModel):
     def action_view_sale_orders(self):
         # Abre la OV relacionada si existe
         self.ensure_one()
+        if self.include_subtasks:
+            orders = self.env['project.task'].browse(self._get_scope_task_ids()).sale_order_id
+            return {
+                'type': 'ir.actions.act_window',
+                'name': 'Órdenes de venta',
+                'res_model': 'sale.order',
+                'view_mode': 'list,form',
+                'domain': [('id', 'in', orders.ids)],
+                'context': {'create': False},
+            }
         domain = [('id', '=', self.task_id.sale_order_id.id)
                   ] if self.task_id.sale_order_id else [('id', '=', 0)]
         views = [[False, 'list'], [False, 'kanban'], [False, 'form']]
@@ -561,7 +644,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
         self.ensure_one()
         # 1. Buscar las líneas de compra relacionadas con la tarea.
         purchase_lines = self.env['purchase.order.line'].search(
-            [('task_id', '=', self.task_id.id)])
+            [('task_id', 'in', self._get_scope_task_ids())])
         # 2. Obtener los IDs de las órdenes de compra únicas de esas líneas.
         purchase_orders = purchase_lines.mapped('order_id')
         # 3. Devolver la acción con el dominio de los IDs de las órdenes de compra.
@@ -582,7 +665,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
             'name': 'Gastos',
             'res_model': 'hr.expense',
             'view_mode': 'list,kanban,form',
-            'domain': [('task_id', '=', self.task_id.id)],
+            'domain': [('task_id', 'in', self._get_scope_task_ids())],
             'context': {'default_task_id': self.task_id.id},
         }
 
@@ -602,7 +685,10 @@ class ProjectTask(models.Model):
             'res_id': wizard.id,
         }
 =======
+from collections import defaultdict
+
 from odoo import api, fields, models, _
+from odoo.exceptions import AccessError
 from odoo.tools import format_amount
 from odoo.tools.float_utils import float_round
 
@@ -622,6 +708,9 @@ class AnalyticsTaskDashboard(models.TransientModel):
 
     # Referencia a la tarea y metadatos del wizard
     task_id = fields.Many2one('project.task', string='Tarea', required=True)
+    include_subtasks = fields.Boolean(
+        string='Incluir subtareas',
+        help='Resume la tarea junto con todas sus subtareas descendientes.')
     name = fields.Char(string='Nombre', compute='_compute_name')
     content = fields.Html(string='Contenido',
                           compute='_compute_content', sanitize=False)
@@ -708,96 +797,44 @@ class AnalyticsTaskDashboard(models.TransientModel):
             task_name = wizard.task_id.display_name if wizard.task_id else ''
             wizard.name = f"Tablero de {task_name}" if task_name else 'Tablero'
 
-    def _get_task_timesheets(self):
-        self.ensure_one()
-        return self.env['account.analytic.line'].sudo().search([
-            ('task_id', '=', self.task_id.id),
-        ])
-
-    def _get_timesheet_cost_breakdown(self):
-        self.ensure_one()
-        timesheets = self._get_task_timesheets()
-        timesheet_cost = sum(abs(line.amount) for line in timesheets)
-        return {
-            'timesheets': timesheets,
-            'cost': timesheet_cost,
-            'billed': timesheet_cost,
-            'to_bill': 0.0,
-        }
-
-    @api.depends('task_id')
+    @api.depends('task_id', 'include_subtasks')
     def _compute_content(self):
-        # Reúne datos (gastos aprobados y compras confirmadas) y renderiza la plantilla QWeb
+        # Reúne los datos del cargador compartido y renderiza la plantilla QWeb
+        dashboard_data = self._get_dashboard_data()
         for wizard in self:
-            expenses = self.env['hr.expense'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('sheet_id.state', 'in', ['approve', 'post', 'done'])
-            ])
-            # Compras: considerar solo líneas de compra asociadas a la tarea
-            polines = self.env['purchase.order.line'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('order_id.state', 'in', ('purchase', 'done')),
-            ])
-
-            total_expenses = sum(expenses.mapped(
-                'total_amount')) if expenses else 0.0
-            total_purchases = sum(polines.mapped(
-                'price_subtotal')) if polines else 0.0
-
-            # Calcular facturación de compras (proveedores) para separar "Por facturar" vs "Facturado"
-            vendor_bill_lines = self.env['account.move.line'].search([
-                ('purchase_line_id.task_id', '=', wizard.task_id.id),
-                ('move_id.state', '=', 'posted'),
-                ('move_id.move_type', 'in', ('in_invoice', 'in_refund')),
-            ])
-            purchases_billed = sum(vendor_bill_lines.mapped(
-                'price_subtotal')) if vendor_bill_lines else 0.0
-            purchases_to_bill = max(total_purchases - purchases_billed, 0.0)
-
-            # Calcular facturación de gastos: considerar como "facturado" cuando la hoja está posteada/done
-            expenses_billed = 0.0
-            expenses_to_bill = 0.0
-            if expenses:
-                expenses_billed = sum(
-                    expenses.filtered(lambda e: e.sheet_id and e.sheet_id.state in ('post', 'done')).mapped(
-                        'total_amount'))
-                expenses_to_bill = max(total_expenses - expenses_billed, 0.0)
+            data = dashboard_data[wizard.task_id.id, wizard.include_subtasks]
+            costs = data['costs']
+
+            # Gastos: "facturado" cuando la hoja tiene asiento publicado
+            expenses_billed = costs[('hr.expense', 'billed')]
+            expenses_to_bill = costs[('hr.expense', 'to_bill')]
+            total_expenses = expenses_billed + expenses_to_bill
+
+            # Compras: facturado vs por facturar (recibido o comprometido)
+            purchases_billed = costs[('purchase.order.line', 'billed')]
+            purchases_to_bill = (costs[('purchase.order.line', 'to_bill')]
+                                 + costs[('purchase.order.line', 'committed')])
+            total_purchases = purchases_billed + purchases_to_bill
 
             # --- Timesheets Logic ---
-            ts_data = wizard._get_timesheet_cost_breakdown()
-            timesheet_cost = ts_data['cost']
-            timesheet_billed = ts_data['billed']
-            timesheet_to_bill = ts_data['to_bill']
+            timesheet_cost = costs[('account.analytic.line', 'billed')]
+            timesheet_billed = timesheet_cost
+            timesheet_to_bill = 0.0
 
             # --- Stock Moves Logic ---
-            stock_billed = wizard.task_id.stock_move_cost or 0.0
+            stock_billed = costs[('stock.move', 'billed')] + costs[('stock.move', 'to_bill')]
             # Calculated Pending Stock Cost
-            all_moves = self.env['stock.move'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('state', 'in', ['confirmed', 'assigned',
-                                 'partially_available', 'done']),
-                ('picking_type_id.code', '=', 'outgoing')
-            ])
-            scope_qty_per_product = {}
-            for move in all_moves:
-                scope_qty_per_product[move.product_id.id] = scope_qty_per_product.get(
-                    move.product_id.id, 0.0) + move.product_uom_qty
-
-            purchased_qty_per_product = {}
-            purchase_lines = self.env['purchase.order.line'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('order_id.state', 'in', ['purchase', 'done'])
-            ])
-            for line in purchase_lines:
-                purchased_qty_per_product[line.product_id.id] = purchased_qty_per_product.get(
-                    line.product_id.id, 0.0) + line.product_qty
+            moves = data['moves']
+            scope_qty_per_product = defaultdict(float)
+            for move in moves:
+                scope_qty_per_product[move.product_id] += move.product_uom_qty
 
+            purchased_qty_per_product = data['purchased_qty']
             stock_expected = 0.0
-            for product_id, scope_qty in scope_qty_per_product.items():
-                purchased_qty = purchased_qty_per_product.get(product_id, 0.0)
+            for product, scope_qty in scope_qty_per_product.items():
+                purchased_qty = purchased_qty_per_product.get(product.id, 0.0)
                 chargeable_qty = max(0.0, scope_qty - purchased_qty)
                 if chargeable_qty > 0:
-                    product = self.env['product.product'].browse(product_id)
                     stock_expected += chargeable_qty * product.standard_price
 
             stock_to_bill = max(stock_expected - stock_billed, 0.0)
@@ -810,22 +847,13 @@ class AnalyticsTaskDashboard(models.TransientModel):
             wizard.total_facturado = total_facturado
             wizard.total_a_facturar = total_a_facturar
 
-            esperado_sin_orden = 0.0
-            for avance in wizard.task_id.sub_update_ids:
-                if avance.precio_unidad and avance.unit_progress:
-                    esperado_sin_orden += avance.precio_unidad * avance.unit_progress
+            esperado_sin_orden = data['esperado_sin_orden']
 
             # Preparar lista de movimientos de almacén para el detalle
             stock_moves_list = []
             # CORRECCIÓN: Mostrar TODOS los movimientos relevantes (Done + Pending) para la tabla de detalle
             # Esto debe coincidir con la lógica de cálculo de costos
-            moves = self.env['stock.move'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('state', 'in', ['confirmed', 'assigned',
-                 'partially_available', 'done']),
-                ('picking_type_id.code', '=', 'outgoing')
-            ])
-
+            base_url = data['base_url']
             for move in moves:
                 # Calcular costo (fallback a costo estándar del producto si el movimiento no tiene precio)
                 price_unit = move.price_unit or move.product_id.standard_price
@@ -835,8 +863,6 @@ class AnalyticsTaskDashboard(models.TransientModel):
                 total_cost = qty_display * price_unit
 
                 # Generar URL directa al picking
-                base_url = wizard.env['ir.config_parameter'].sudo(
-                ).get_param('web.base.url')
                 picking_url = f"{base_url}/web#id={move.picking_id.id}&model=stock.picking&view_type=form"
 
                 # Obtener Lotes/Series (si existen)
@@ -879,7 +905,6 @@ class AnalyticsTaskDashboard(models.TransientModel):
 
             # Construir datos para plantilla de dashboard de tarea (similar a proyecto)
             values = {
-                'wizard_id': wizard.id,
                 'profitability': {
                     'expected_income': wizard.expected_income,
                     'timesheet_cost': timesheet_cost,
@@ -918,100 +943,226 @@ class AnalyticsTaskDashboard(models.TransientModel):
                 'format_percentage': lambda v: f"{v:.2f}%" if v is not False else '0.00%',
                 'format_signed_percentage': lambda v: f"{('+' if v >= 0 else '')}{v:.2f}%" if v is not False else '0.00%',
             }
-            wizard.content = self.env['ir.qweb']._render(
-                'project_modificaciones.task_dashboard_template', values)
+            wizard.content = self.env['ir.qweb']._render_fragment(
+                'project_modificaciones.task_dashboard_template', values, wizard.currency_id)
 
-    @api.depends('task_id', 'task_id.effective_hours', 'task_id.timesheet_ids')
+    @api.depends('task_id', 'include_subtasks', 'task_id.effective_hours', 'task_id.timesheet_ids')
     def _compute_stats(self):
         # KPIs rápidos: horas, subtareas, ventas, compras confirmadas y gastos aprobados
+        dashboard_data = self._get_dashboard_data()
         for wizard in self:
+            data = dashboard_data[wizard.task_id.id, wizard.include_subtasks]
+            scope_tasks = self.env['project.task'].browse(data['scope_ids'])
             # Timesheets
-            try:
-                wizard.timesheet_count = len(wizard.task_id.timesheet_ids)
-                wizard.timesheet_hours = wizard.task_id.effective_hours
-            except Exception:
-                wizard.timesheet_count = 0
-                wizard.timesheet_hours = 0.0
-            # Subtareas
-            wizard.subtask_count = len(wizard.task_id.child_ids)
+            wizard.timesheet_count = data['timesheet_count']
+            wizard.timesheet_hours = data['timesheet_hours']
+            # Subtareas: hijas directas o todo el subárbol
+            if wizard.include_subtasks:
+                wizard.subtask_count = len(scope_tasks) - 1
+            else:
+                wizard.subtask_count = len(wizard.task_id.child_ids)
             # Ventas
-            wizard.sale_order_count = 1 if wizard.task_id.sale_order_id else 0
-            wizard.sale_line_count = 1 if wizard.task_id.sale_line_id else 0
+            wizard.sale_order_count = len(scope_tasks.sale_order_id)
+            wizard.sale_line_count = len(scope_tasks.sale_line_id)
             # Compras (solo confirmadas o hechas)
-            wizard.purchase_count = self.env['purchase.order.line'].search_count([
-                ('task_id', '=', wizard.task_id.id),
-                ('order_id.state', 'in', ('purchase', 'done')),
-            ])
+            wizard.purchase_count = data['purchase_count']
             # Gastos (solo aprobados o posteriores)
-            wizard.expense_count = self.env['hr.expense'].search_count([
-                ('task_id', '=', wizard.task_id.id),
-                ('sheet_id.state', 'in', ['approve', 'post', 'done'])
-            ])
+            wizard.expense_count = data['expense_count']
             # Movimientos de almacén
-            wizard.stock_move_count = wizard.task_id.stock_move_count
+            wizard.stock_move_count = sum(scope_tasks.mapped('stock_move_count'))
             # Requisiciones
-            wizard.requisition_count = wizard.task_id.requisition_count
+            wizard.requisition_count = sum(scope_tasks.mapped('requisition_count'))
 
-    @api.depends('task_id')
+    @api.model
+    def _get_task_ledger_costs(self, tasks):
+        """
+        Costos de tasks desde project.cost.ledger con un solo GROUP BY.
+        Retorna {task_id: {(fuente, estado): monto en moneda de la compañía}}.
+        """
+        totals = self.env['project.cost.ledger']._read_totals(
+            [('task_id', 'in', tasks.ids)], ['task_id'])
+        costs = defaultdict(lambda: defaultdict(float))
+        for (source_model, bucket, task_id), amount in totals.items():
+            costs[task_id][(source_model, bucket)] += amount
+        return costs
+
+    def _get_task_scopes(self, include_subtasks=False):
+        """
+        Tareas que resume cada tarea de self.task_id: ella misma o, con
+        include_subtasks, ella y todos sus descendientes (un solo CTE recursivo).
+        Retorna {task_id: [task_ids del alcance]}.
+        """
+        task_ids = self.task_id.ids
+        if not include_subtasks:
+            return {task_id: [task_id] for task_id in task_ids}
+        self.env['project.task'].flush_model(['parent_id'])
+        self.env.cr.execute("""
+            WITH RECURSIVE tree AS (
+                SELECT id AS root_id, id
+                  FROM project_task
+                 WHERE id = ANY(%s)
+                 UNION
+                SELECT tree.root_id, pt.id
+                  FROM project_task pt
+                  JOIN tree ON pt.parent_id = tree.id
+            )
+            SELECT root_id, id FROM tree
+        """, [task_ids])
+        scopes = defaultdict(list)
+        for root_id, task_id in self.env.cr.fetchall():
+            scopes[root_id].append(task_id)
+        return scopes
+
+    def _get_dashboard_data(self):
+        """
+        Cargador único del dashboard: consulta cada fuente una sola vez para todas
+        las tareas de self y lo comparte entre _compute_content, _compute_stats y
+        _compute_profitability durante la transacción. Con include_subtasks cada
+        tarea resume su subárbol con consultas task_id IN (...) agrupadas.
+        Retorna {(task_id, include_subtasks): {scope_ids, costs, moves, sale_lines,
+        purchased_qty, purchase_count, expense_count, timesheet_count,
+        timesheet_hours, esperado_sin_orden, base_url}}.
+        """
+        cache = self.env.cr.cache.setdefault('project_modificaciones_task_dashboard', {})
+        loaded = cache.setdefault(self.env.uid, {})
+        for include_subtasks in (False, True):
+            wizards = self.filtered(
+                lambda wizard: bool(wizard.include_subtasks) == include_subtasks
+                and (wizard.task_id.id, include_subtasks) not in loaded)
+            if wizards.task_id:
+                loaded.update(wizards._load_dashboard_data(include_subtasks))
+        return loaded
+
+    def _load_dashboard_data(self, include_subtasks):
+        scopes = self._get_task_scopes(include_subtasks)
+        # Una tarea puede pertenecer al alcance de varias raíces
+        roots_by_task = defaultdict(list)
+        for root_id, scope_ids in scopes.items():
+            for task_id in scope_ids:
+                roots_by_task[task_id].append(root_id)
+        all_tasks = self.env['project.task'].browse(list(roots_by_task))
+
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        data = {
+            root_id: {
+                'scope_ids': scope_ids,
+                'costs': defaultdict(float),
+                'moves': self.env['stock.move'],
+                'sale_lines': self.env['sale.order.line'],
+                'purchased_qty': defaultdict(float),
+                'purchase_count': 0,
+                'expense_count': 0,
+                'timesheet_count': 0,
+                'timesheet_hours': 0.0,
+                'esperado_sin_orden': 0.0,
+                'base_url': base_url,
+            }
+            for root_id, scope_ids in scopes.items()
+        }
+
+        ledger_costs = self._get_task_ledger_costs(all_tasks)
+        for task_id, task_costs in ledger_costs.items():
+            for root_id in roots_by_task[task_id]:
+                for key, amount in task_costs.items():
+                    data[root_id]['costs'][key] += amount
+
+        moves = self.env['stock.move'].search([
+            ('task_id', 'in', all_tasks.ids),
+            ('state', 'in', ['confirmed', 'assigned',
+                             'partially_available', 'done']),
+            ('picking_type_id.code', '=', 'outgoing')
+        ])
+        move_ids = defaultdict(list)
+        for move in moves:
+            for root_id in roots_by_task[move.task_id.id]:
+                move_ids[root_id].append(move.id)
+        for root_id, ids in move_ids.items():
+            # browse conserva el prefetch de la búsqueda completa
+            data[root_id]['moves'] = moves.browse(ids)
+
+        for task in all_tasks:
+            for root_id in roots_by_task[task.id]:
+                data[root_id]['sale_lines'] |= task.sale_line_id
+
+        purchase_groups = self.env['purchase.order.line']._read_group(
+            [('task_id', 'in', all_tasks.ids), ('order_id.state', 'in', ('purchase', 'done'))],
+            ['task_id', 'product_id'], ['product_qty:sum', '__count'])
+        for task, product, qty, count in purchase_groups:
+            for root_id in roots_by_task[task.id]:
+                data[root_id]['purchased_qty'][product.id] += qty
+                data[root_id]['purchase_count'] += count
+
+        expense_groups = self.env['hr.expense']._read_group(
+            [('task_id', 'in', all_tasks.ids), ('sheet_id.state', 'in', ['approve', 'post', 'done'])],
+            ['task_id'], ['__count'])
+        for task, count in expense_groups:
+            for root_id in roots_by_task[task.id]:
+                data[root_id]['expense_count'] += count
+
+        try:
+            timesheet_groups = self.env['account.analytic.line']._read_group(
+                [('task_id', 'in', all_tasks.ids), ('project_id', '!=', False)],
+                ['task_id'], ['unit_amount:sum', '__count'])
+        except AccessError:
+            timesheet_groups = []
+        for task, hours, count in timesheet_groups:
+            for root_id in roots_by_task[task.id]:
+                data[root_id]['timesheet_hours'] += hours
+                data[root_id]['timesheet_count'] += count
+
+        for avance in all_tasks.sub_update_ids:
+            if avance.precio_unidad and avance.unit_progress:
+                for root_id in roots_by_task[avance.task_id.id]:
+                    data[root_id]['esperado_sin_orden'] += avance.precio_unidad * avance.unit_progress
+
+        return {(root_id, include_subtasks): values for root_id, values in data.items()}
+
+    def _get_scope_task_ids(self):
+        self.ensure_one()
+        return self._get_dashboard_data()[self.task_id.id, self.include_subtasks]['scope_ids']
+
+    @api.depends('task_id', 'include_subtasks')
     def _compute_profitability(self):
+        dashboard_data = self._get_dashboard_data()
         for wizard in self:
+            data = dashboard_data[wizard.task_id.id, wizard.include_subtasks]
             # --- 1. Inicialización ---
             expected = 0.0
             invoiced = 0.0
             total_delivered_amount = 0.0
             to_invoice = 0.0
 
-            # --- 2. Ingresos (Ventas) ---
-            sol = wizard.task_id.sale_line_id
-            if sol:
-                expected = sol.price_subtotal or 0.0
+            # --- 2. Ingresos (Ventas): línea de la tarea o de todo el subárbol ---
+            for sol in data['sale_lines']:
+                expected += sol.price_subtotal or 0.0
                 posted_lines = sol.invoice_lines.filtered(
                     lambda l: l.move_id.state == 'posted')
-                invoiced = sum(posted_lines.mapped('price_subtotal'))
-                total_delivered_amount = sol.qty_delivered * sol.price_unit
+                invoiced += sum(posted_lines.mapped('price_subtotal'))
+                total_delivered_amount += sol.qty_delivered * sol.price_unit
                 qty_to_invoice = sol.qty_delivered - sol.qty_invoiced
-                to_invoice = qty_to_invoice * sol.price_unit
+                to_invoice += qty_to_invoice * sol.price_unit
 
             wizard.expected_income = expected
             wizard.invoiced_income = invoiced
             wizard.to_invoice_income = to_invoice
             wizard.total_entregado = total_delivered_amount
 
-            # --- 3. Costos (Gastos, Compras, Stock, Horas) ---
+            # --- 3. Costos (Gastos, Compras, Stock, Horas) desde el libro de costos ---
+            costs = data['costs']
 
             # A. Gastos
-            expenses = self.env['hr.expense'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('sheet_id.state', 'in', ['approve', 'post', 'done'])
-            ])
-            expenses_total = sum(expenses.mapped('total_amount'))
-
-            # Facturación Gastos
-            expenses_billed = sum(expenses.filtered(
-                lambda e: e.sheet_id.state in ('post', 'done')
-            ).mapped('total_amount'))
-            expenses_to_bill = max(expenses_total - expenses_billed, 0.0)
-
-            # B. Compras
-            # Optimización: Buscar lineas directamente, no hace falta buscar PO y luego lineas
-            purchase_lines = self.env['purchase.order.line'].search([
-                ('task_id', '=', wizard.task_id.id),
-                ('order_id.state', 'in', ('purchase', 'done'))
-            ])
-            purchases_total = sum(purchase_lines.mapped('price_subtotal'))
-
-            # Facturación Compras
-            vendor_bill_lines = self.env['account.move.line'].search([
-                ('purchase_line_id.task_id', '=', wizard.task_id.id),
-                ('move_id.state', '=', 'posted'),
-                ('move_id.move_type', 'in', ('in_invoice', 'in_refund')),
-            ])
-            purchases_billed = sum(vendor_bill_lines.mapped('price_subtotal'))
-            purchases_to_bill = max(purchases_total - purchases_billed, 0.0)
+            expenses_billed = costs[('hr.expense', 'billed')]
+            expenses_to_bill = costs[('hr.expense', 'to_bill')]
+            expenses_total = expenses_billed + expenses_to_bill
+
+            # B. Compras: lo comprometido sin recibir también queda por facturar
+            purchases_billed = costs[('purchase.order.line', 'billed')]
+            purchases_to_bill = (costs[('purchase.order.line', 'to_bill')]
+                                 + costs[('purchase.order.line', 'committed')])
+            purchases_total = purchases_billed + purchases_to_bill
 
             # C. Stock
-            # Usamos el costo ya calculado en la tarea para el total global
-            stock_cost = wizard.task_id.stock_move_cost or 0.0
+            stock_cost = costs[('stock.move', 'billed')] + costs[('stock.move', 'to_bill')]
 
             # Nota: Para saber cuanto está "facturado" o "por facturar" de stock,
             # Odoo estándar no factura stock moves directamente al cliente de forma simple
@@ -1023,10 +1174,9 @@ class AnalyticsTaskDashboard(models.TransientModel):
             stock_to_bill = 0.0
 
             # D. Hojas de Horas
-            ts_data = wizard._get_timesheet_cost_breakdown()
-            timesheet_cost = ts_data['cost']
-            timesheet_billed = ts_data['billed']
-            timesheet_to_bill = ts_data['to_bill']
+            timesheet_cost = costs[('account.analytic.line', 'billed')]
+            timesheet_billed = timesheet_cost
+            timesheet_to_bill = 0.0
 
             # --- 4. Asignación de Campos de Costos ---
             wizard.total_expenses = expenses_total
@@ -1075,11 +1225,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
                 wizard.billed_invoiced_percentage = 0.0
 
             # --- 8. Producción S/OV (Lógica específica tuya) ---
-            esperado_sin_ov = 0.0
-            for avance in wizard.task_id.sub_update_ids:
-                if avance.precio_unidad and avance.unit_progress:
-                    esperado_sin_ov += avance.precio_unidad * avance.unit_progress
-            wizard.esperado_sin_orden = esperado_sin_ov
+            wizard.esperado_sin_orden = data['esperado_sin_orden']
 
     # Acciones de navegación
     def action_view_subtasks(self):
@@ -1090,7 +1236,8 @@ class AnalyticsTaskDashboard(models.TransientModel):
             'name': 'Subtareas',
             'res_model': 'project.task',
             'view_mode': 'list,kanban,form',
-            'domain': [('parent_id', '=', self.task_id.id)],
+            'domain': [('parent_id', '=', self.task_id.id)] if not self.include_subtasks
+            else [('id', 'in', self._get_scope_task_ids()), ('id', '!=', self.task_id.id)],
             'context': {'default_parent_id': self.task_id.id, 'default_project_id': self.task_id.project_id.id},
         }
 
@@ -1101,7 +1248,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
         # Usamos sudo() para asegurar acceso si hay reglas de registro restrictivas
         # Ampliamos la búsqueda para incluir moves pendientes si es necesario
         moves = self.env['stock.move'].search(
-            [('task_id', '=', self.task_id.id)])
+            [('task_id', 'in', self._get_scope_task_ids())])
         picking_ids = moves.mapped('picking_id').ids
 
         return {
@@ -1121,7 +1268,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
             'name': 'Requisiciones',
             'res_model': 'employee.purchase.requisition',
             'view_mode': 'tree,form',
-            'domain': [('task_id', '=', self.task_id.id)],
+            'domain': [('task_id', 'in', self._get_scope_task_ids())],
             'context': {'default_task_id': self.task_id.id},
         }
 
@@ -1136,7 +1283,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
             'name': 'Hojas de horas',
             'res_model': 'account.analytic.line',
             'view_mode': 'list,form',
-            'domain': [('task_id', '=', self.task_id.id)],
+            'domain': [('task_id', 'in', self._get_scope_task_ids())],
             'context': {
                 'default_task_id': self.task_id.id,
                 'default_project_id': self.task_id.project_id.id,
@@ -1146,6 +1293,16 @@ class AnalyticsTaskDashboard(models.TransientModel):
     def action_view_sale_orders(self):
         # Abre la OV relacionada si existe
         self.ensure_one()
+        if self.include_subtasks:
+            orders = self.env['project.task'].browse(self._get_scope_task_ids()).sale_order_id
+            return {
+                'type': 'ir.actions.act_window',
+                'name': 'Órdenes de venta',
+                'res_model': 'sale.order',
+                'view_mode': 'list,form',
+                'domain': [('id', 'in', orders.ids)],
+                'context': {'create': False},
+            }
         domain = [('id', '=', self.task_id.sale_order_id.id)
                   ] if self.task_id.sale_order_id else [('id', '=', 0)]
         views = [[False, 'list'], [False, 'kanban'], [False, 'form']]
@@ -1167,7 +1324,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
         self.ensure_one()
         # 1. Buscar las líneas de compra relacionadas con la tarea.
         purchase_lines = self.env['purchase.order.line'].search(
-            [('task_id', '=', self.task_id.id)])
+            [('task_id', 'in', self._get_scope_task_ids())])
         # 2. Obtener los IDs de las órdenes de compra únicas de esas líneas.
         purchase_orders = purchase_lines.mapped('order_id')
         # 3. Devolver la acción con el dominio de los IDs de las órdenes de compra.
@@ -1188,7 +1345,7 @@ class AnalyticsTaskDashboard(models.TransientModel):
             'name': 'Gastos',
             'res_model': 'hr.expense',
             'view_mode': 'list,kanban,form',
-            'domain': [('task_id', '=', self.task_id.id)],
+            'domain': [('task_id', 'in', self._get_scope_task_ids())],
             'context': {'default_task_id': self.task_id.id},
         }
 
@@ -101,4 +101,33 @@ class HrExpense(models.Model):
 
                 # Asignamos la distribución (Sobrescribe si estaba vacía o si cambiamos de tarea)
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
-                expense.analytic_distribution = {analytic_account_id: 100}
\ No newline at end of file
+                expense.analytic_distribution = {analytic_account_id: 100}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, records.ids)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return res
+
+    def unlink(self):
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return super().unlink()
+
+
+class HrExpenseSheet(models.Model):
+    _inherit = 'hr.expense.sheet'
+
+    # Aprobar o contabilizar la hoja cambia el estado de sus gastos en el libro
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return res
+
+    def unlink(self):
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids, resolve_now=True)
+        return super().unlink()
@@ -153,7 +153,13 @@ class PendingService(models.Model):
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
                 else:
                     vals['name'] = _('New')
+<<<<<<< HEAD
         return super(PendingService, self).create(vals_list)
+=======
+        records = super(PendingService, self).create(vals_list)
+        self.env['project.control.board']._mark_board_dirty(self._name, records.ids)
+        return records
+>>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
 
 <<<<<<< HEAD
 =======
@@ -221,13 +227,77 @@ class PendingService(models.Model):
                                                      Markup().join(line_changes_summary))
             self.message_post(body=msg)
 
+        self.env['project.control.board']._mark_board_dirty(self._name, self.ids)
         return res
 
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
     @api.depends('service_line_ids.total')
     def _compute_total(self):
+        totals = self._get_line_totals()
         for service in self:
-            service.total = sum(service.service_line_ids.mapped('total'))
+            service.total = totals[service.id]['total']
+
+    def _get_line_totals(self):
+        """
+        Sumas de las líneas por servicio: {id: {'quantity', 'total_avances', 'total'}}.
+        Los servicios guardados se agrupan en una sola consulta; los nuevos
+        (onchange) se suman desde la caché.
+        """
+        saved = self.filtered(lambda service: isinstance(service.id, int))
+        totals = {
+            service.id: {'quantity': 0.0, 'total_avances': 0.0, 'total': 0.0}
+            for service in self
+        }
+        if saved:
+            groups = self.env['pending.service.line']._read_group(
+                [('service_id', 'in', saved.ids)], ['service_id'],
+                ['quantity:sum', 'total_avances:sum', 'total:sum'])
+            for service, quantity, total_avances, total in groups:
+                totals[service.id] = {
+                    'quantity': quantity, 'total_avances': total_avances, 'total': total}
+        for service in self - saved:
+            lines = service.service_line_ids
+            totals[service.id] = {
+                'quantity': sum(lines.mapped('quantity')),
+                'total_avances': sum(lines.mapped('total_avances')),
+                'total': sum(lines.mapped('total')),
+            }
+        return totals
+
+    def _get_linked_tasks(self):
+        """
+        Tareas de cada servicio (directas y de sus líneas) con los datos que usan
+        los avances: {id: {task_id: (estado, piezas avanzadas, piezas facturadas)}}.
+        Una consulta para los servicios guardados; los nuevos se leen de la caché.
+        """
+        saved = self.filtered(lambda service: isinstance(service.id, int))
+        links = {service.id: {} for service in self}
+        if saved:
+            self.env['project.task'].flush_model(
+                ['servicio_pendiente', 'state', 'quant_progress', 'sale_line_id', 'active'])
+            self.env['pending.service.line'].flush_model(['service_id', 'task_id'])
+            self.env['sale.order.line'].flush_model(['qty_invoiced'])
+            self.env.cr.execute("""
+                SELECT l.service_id, pt.id, pt.state,
+                       COALESCE(pt.quant_progress, 0.0), COALESCE(sol.qty_invoiced, 0.0)
+                  FROM (
+                        SELECT servicio_pendiente AS service_id, id AS task_id
+                          FROM project_task
+                         WHERE servicio_pendiente = ANY(%(ids)s) AND active
+                         UNION
+                        SELECT service_id, task_id
+                          FROM pending_service_line
+                         WHERE service_id = ANY(%(ids)s) AND task_id IS NOT NULL
+                       ) l
+                  JOIN project_task pt ON pt.id = l.task_id
+             LEFT JOIN sale_order_line sol ON sol.id = pt.sale_line_id
+            """, {'ids': saved.ids})
+            for service_id, task_id, state, quant_progress, qty_invoiced in self.env.cr.fetchall():
+                links[service_id][task_id] = (state, quant_progress, qty_invoiced)
+        for service in self - saved:
+            for task in service.service_line_ids.mapped('task_id') | service.task_ids:
+                links[service.id][task.id] = (task.state, task.quant_progress, task.qty_invoiced)
+        return links
 
     def action_set_to_pending(self):
         for record in self:
@@ -250,8 +320,14 @@ class PendingService(models.Model):
         for record in self:
             record.active = not record.active
 
+<<<<<<< HEAD
     def unlink(self):
         # Eliminar las líneas de servicio asociadas antes de eliminar el servicio pendiente
+=======
+    def unlink(self):
+        self.env['project.control.board']._mark_board_dirty(self._name, self.ids)
+        # Eliminar las líneas de servicio asociadas antes de eliminar el servicio pendiente
+>>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
         self.service_line_ids.unlink()
         return super(PendingService, self).unlink()
 
@@ -311,15 +387,10 @@ class PendingService(models.Model):
 
     @api.depends('task_ids', 'service_line_ids.task_id')
     def _compute_task_count(self):
+        # Tareas de las líneas y directas, sin duplicados
+        links = self._get_linked_tasks()
         for record in self:
-            # Extraemos IDs de tareas vinculadas en las líneas
-            line_tasks = record.service_line_ids.mapped('task_id').ids
-            # Extraemos IDs de tareas vinculadas directamente
-            direct_tasks = record.task_ids.ids
-
-            # Unimos ambos sets de IDs para evitar duplicados
-            all_task_ids = list(set(line_tasks + direct_tasks))
-            record.task_count = len(all_task_ids)
+            record.task_count = len(links[record.id])
 
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
     @api.depends()
@@ -775,9 +846,10 @@ class PendingService(models.Model):
 
     @api.depends('service_line_ids.total_avances', 'service_line_ids.quantity')
     def _compute_avance_actual(self):
+        totals = self._get_line_totals()
         for rec in self:
-            total_qty = sum(rec.service_line_ids.mapped('quantity'))
-            total_avances = sum(rec.service_line_ids.mapped('total_avances'))
+            total_qty = totals[rec.id]['quantity']
+            total_avances = totals[rec.id]['total_avances']
             if total_qty > 0:
                 rec.avance_actual = min(
                     100.0, (total_avances / total_qty) * 100)
@@ -834,12 +906,11 @@ class PendingService(models.Model):
     @api.depends('task_ids', 'task_ids.state', 'service_line_ids.task_id', 'service_line_ids.task_id.state')
     def _compute_task_done_count(self):
         done_state = '1_done'
+        links = self._get_linked_tasks()
         for rec in self:
-            line_tasks = rec.service_line_ids.mapped('task_id')
-            direct_tasks = rec.task_ids
-            all_tasks = line_tasks | direct_tasks
-            rec.task_done_count = len(all_tasks.filtered(
-                lambda t: t.state == done_state))
+            rec.task_done_count = sum(
+                1 for state, _progress, _invoiced in links[rec.id].values()
+                if state == done_state)
 
     avance_facturado = fields.Float(
         string='Avance Facturado (%)',
@@ -857,22 +928,14 @@ class PendingService(models.Model):
     )
     def _compute_avance_facturado(self):
         """ Avance facturado basado estrictamente en piezas """
+        links = self._get_linked_tasks()
         for rec in self:
-            # 1. Obtenemos el total de piezas de las líneas de servicio
-            # total_qty = sum(rec.service_line_ids.mapped('quantity'))
-            # if total_qty <= 0:
-            # rec.avance_facturado = 0.0
-            # continue
-
-            # 2. Obtenemos todas las tareas vinculadas
-            all_tasks = rec.service_line_ids.mapped('task_id') | rec.task_ids
-
-            # 3. Sumamos las piezas facturadas desde las tareas (qty_invoiced)
-            total_invoiced = sum(
-                task.qty_invoiced for task in all_tasks if task.qty_invoiced)
+            # 1. Tareas vinculadas (líneas y directas) agrupadas en una consulta
+            tasks = links[rec.id].values()
 
-            total_entre = sum(
-                task.quant_progress for task in all_tasks if task.quant_progress)
+            # 2. Sumamos las piezas facturadas y entregadas de las tareas
+            total_invoiced = sum(invoiced for _state, _progress, invoiced in tasks)
+            total_entre = sum(progress for _state, progress, _invoiced in tasks)
             if total_entre <= 0:
                 rec.avance_facturado = 0.0
                 continue
@@ -988,11 +1051,21 @@ class PendingServiceLine(models.Model):
 
     @api.depends('sub_update_ids.unit_progress', 'sub_update_ids.avances_state')
     def _compute_total_avances(self):
+        # Se suman todos los avances (sin filtrar por estado), agrupados por línea
+        saved = self.filtered(lambda line: isinstance(line.id, int))
+        totals = {}
+        if saved:
+            totals = {
+                line.id: units
+                for line, units in self.env['project.sub.update']._read_group(
+                    [('pending_service_line_id', 'in', saved.ids)],
+                    ['pending_service_line_id'], ['unit_progress:sum'])
+            }
         for line in self:
-            # Sumamos solo los avances que no estén en borrador (opcional, según lógica de negocio)
-            # Si se desea sumar todo, quitar el filtro de state.
-            avances = line.sub_update_ids
-            line.total_avances = sum(avances.mapped('unit_progress'))
+            if line in saved:
+                line.total_avances = totals.get(line.id, 0.0)
+            else:
+                line.total_avances = sum(line.sub_update_ids.mapped('unit_progress'))
 
     @api.depends('product_id')
     def _compute_price_unit(self):
@@ -1,14 +1,29 @@
+import logging
+import time
+
 from markupsafe import Markup
 from odoo import api, fields, models, _
 from odoo.tools import drop_view_if_exists
+from odoo.tools.sql import TableKind, table_kind
 from odoo.exceptions import UserError
 
+_logger = logging.getLogger(__name__)
+
+# Clave de cr.precommit.data con los origenes tocados en la transacción
+BOARD_DIRTY_KEY = "project_modificaciones.control_board_dirty"
+
 
 class ProjectControlBoard(models.Model):
     _name = "project.control.board"
     _description = "Tablero Unificado de Proyectos"
     _auto = False
     _order = "priority desc, date_start desc, id desc"
+    # Modo materializado: _table es una tabla real alimentada desde esta vista
+    _live_view = "project_control_board_live"
+    _dirty_table = "project_control_board_dirty"
+    # Última modificación visible de cada origen; alimenta get_board_changes
+    _change_table = "project_control_board_changes"
+    _sale_id_offset = 1000000000
 
     name = fields.Char(string="Nombre", readonly=True)
     source = fields.Selection(
@@ -90,6 +105,17 @@ class ProjectControlBoard(models.Model):
     avance_planeado = fields.Float(string="Avance Planeado", readonly=True)
     avance = fields.Float(string="Avance Real", readonly=True)
     avance_facturado = fields.Float(string="Avance Facturado", readonly=True)
+    # Tendencias desde project.progress.snapshot (no forman parte de la vista)
+    avance_tendencia = fields.Float(
+        string="Tendencia Avance Real",
+        compute="_compute_avance_tendencias",
+        help="Puntos de avance real ganados en los últimos días (snapshots diarios).",
+    )
+    desviacion_tendencia = fields.Float(
+        string="Tendencia Desviación",
+        compute="_compute_avance_tendencias",
+        help="Cambio de la brecha planeado − real en los últimos días; positivo es que se atrasa.",
+    )
     priority = fields.Selection(
         selection=[
             ("0", "Normal"),
@@ -161,6 +187,20 @@ class ProjectControlBoard(models.Model):
         group_expand="_read_group_lifecycle_stage",
     )
 
+    def _compute_avance_tendencias(self):
+        days = int(self.env["ir.config_parameter"].sudo().get_param(
+            "project_modificaciones.progress_trend_days", 7))
+        snapshots = self.env["project.progress.snapshot"]
+        trends = {
+            "pending": snapshots._get_trends("pending.service", self.pending_id.ids, days),
+            "sale": snapshots._get_trends("sale.order", self.sale_id.ids, days),
+        }
+        for record in self:
+            origin = record.pending_id if record.source == "pending" else record.sale_id
+            trend = trends.get(record.source, {}).get(origin.id, {})
+            record.avance_tendencia = trend.get("avance_actual", 0.0)
+            record.desviacion_tendencia = trend.get("desviacion", 0.0)
+
     def _today_mx_sql(self):
         return "(CURRENT_TIMESTAMP AT TIME ZONE 'America/Mexico_City')::date"
 
@@ -427,27 +467,26 @@ class ProjectControlBoard(models.Model):
             lambda record: record.source == "sale" and record.sale_id
         ).mapped("sale_id")
 
-        pending_count = 0
-        sale_count = 0
-
-        for pending in pending_records:
-            if pending.service_line_ids:
-                pending.service_line_ids._compute_total_avances()
-            pending._compute_total()
-            pending._compute_task_count()
-            pending._compute_avance_planeado()
-            pending._compute_avance_actual()
-            pending._compute_task_done_count()
-            pending._compute_avance_facturado()
-            pending._compute_kanban_color()
-            pending_count += 1
-
-        for sale in sale_records:
-            sale._compute_progress_indicators()
-            sale._compute_sale_task_done_count()
-            sale_count += 1
-
-        return pending_count, sale_count
+        # Cada cómputo corre una vez sobre todo el lote (consultas agrupadas) y
+        # se escribe con un UPDATE por campo al hacer flush
+        targets = [
+            (pending_records.service_line_ids, ["total_avances"]),
+            (pending_records, [
+                "total", "avance_actual", "task_done_count",
+                "avance_facturado", "kanban_color",
+            ]),
+            (sale_records, [
+                "avance_actual", "avance_facturado", "kanban_color_sale",
+                "task_done_count",
+            ]),
+        ]
+        for records, fnames in targets:
+            for fname in fnames:
+                field = records._fields.get(fname)
+                if records and field and field.store and field.compute:
+                    self.env.add_to_compute(field, records)
+        self.env.flush_all()
+        return len(pending_records), len(sale_records)
 
     def _task_progress_case_sql(self, task_alias="pt"):
         today_sql = self._today_mx_sql()
@@ -707,7 +746,7 @@ class ProjectControlBoard(models.Model):
 
         return f"""
                 SELECT
-                    (so.id + 1000000000) AS id,
+                    (so.id + {self._sale_id_offset}) AS id,
                     so.name AS name,
                     'sale'::varchar AS source,
                     NULL::integer AS pending_id,
@@ -785,10 +824,10 @@ class ProjectControlBoard(models.Model):
                 {sale_where_sql}
         """
 
-    def _board_view_sql(self):
+    def _board_view_sql(self, view_name=None):
         sale_where_sql = self._sale_board_where_sql("so")
         return f"""
-            CREATE OR REPLACE VIEW {self._table} AS (
+            CREATE OR REPLACE VIEW {view_name or self._table} AS (
                 WITH pending_qty AS (
                     SELECT
                         service_id,
@@ -856,23 +895,23 @@ class ProjectControlBoard(models.Model):
             )
         """
 
-    def _selection_label(self, model_name, field_name, value):
+    def _selection_labels(self, model_name, field_name):
         """
-        Devuelve la etiqueta traducida de un valor en un campo selection.
+        Etiquetas traducidas de un campo selection: {valor: etiqueta}.
         Usa fields_get para obtener los labels ya procesados por el ORM
         (respeta _() y las traducciones activas de la sesión).
         """
-        selection = dict(
+        return dict(
             self.env[model_name].fields_get([field_name])[field_name]['selection']
         )
-        return selection.get(value, value)
 
     def write(self, vals):
         """
         Permite arrastrar tarjetas del Kanban actualizando el documento origen.
 
-        MEJORA 4: Valida transiciones antes de aplicarlas y registra
-        el cambio en el chatter del documento origen.
+        Soporta movimientos masivos: primero valida todas las transiciones (si
+        una falla no se escribe nada), luego escribe el estado con un write por
+        modelo y estado destino, y registra las notas en el chatter en lote.
         """
         if "lifecycle_stage" not in vals:
             raise UserError(_(
@@ -881,103 +920,364 @@ class ProjectControlBoard(models.Model):
 
         target_stage = vals["lifecycle_stage"]
         transition_map = self._stage_transition_map()
-        valid_pending = self._valid_pending_transitions()
-        valid_sale = self._valid_sale_transitions()
+        valid_transitions = {
+            "pending": self._valid_pending_transitions(),
+            "sale": self._valid_sale_transitions(),
+        }
+        origin_models = {"pending": "pending.service", "sale": "sale.order"}
 
+        # 1. Validación completa antes de escribir
+        # (source, estado destino) -> ids de documentos origen
+        moves = {}
         for record in self:
             if target_stage in ("in_progress", "execution_done"):
                 record._ensure_planning_ready_for_in_progress()
 
-            if record.source == "pending" and record.pending_id:
-                state = transition_map["pending"].get(target_stage)
-                if not state:
+            origin = record._get_origin_record()
+            if record.source not in origin_models or not origin:
+                raise UserError(_(
+                    "El tablero no tiene un documento origen válido para actualizar."
+                ))
+
+            state = transition_map[record.source].get(target_stage)
+            if not state:
+                if record.source == "pending":
                     raise UserError(_(
                         "No hay una transición válida para este servicio pendiente."
                     ))
+                raise UserError(_(
+                    "No hay una transición válida para esta orden de venta."
+                ))
 
-                current_state = record.pending_id.state
-                if current_state == state:
-                    continue  # Ya está en ese estado, sin cambios
+            current_state = origin.state
+            if current_state == state:
+                continue  # Ya está en ese estado, sin cambios
 
-                if (current_state, state) not in valid_pending:
-                    raise UserError(_(
+            if (current_state, state) not in valid_transitions[record.source]:
+                if record.source == "pending":
+                    message = _(
                         "No se puede cambiar el servicio '%(name)s' "
                         "de '%(from_state)s' a '%(to_state)s'."
-                    ) % {
-                        "name": record.pending_id.display_name,
-                        "from_state": current_state,
-                        "to_state": state,
-                    })
-
-                record.pending_id.write({"state": state})
-
-                # MEJORA 6: Log en chatter del documento origen
-                record.pending_id.message_post(
-                    body=Markup(_(
-                        "Etapa cambiada a <b>%(stage)s</b> (estado: <b>%(state)s</b>) "
-                        "desde el Tablero de Proyectos."
-                    )) % {
-                        "stage": Markup.escape(self._selection_label(
-                            'project.control.board', 'lifecycle_stage', target_stage
-                        )),
-                        "state": Markup.escape(self._selection_label(
-                            'pending.service', 'state', state
-                        )),
-                    },
-                    subtype_xmlid="mail.mt_note",
-                )
-                continue
-
-            if record.source == "sale" and record.sale_id:
-                state = transition_map["sale"].get(target_stage)
-                if not state:
-                    raise UserError(_(
-                        "No hay una transición válida para esta orden de venta."
-                    ))
-
-                current_state = record.sale_id.state
-                if current_state == state:
-                    continue  # Ya está en ese estado, sin cambios
-
-                if (current_state, state) not in valid_sale:
-                    raise UserError(_(
+                    )
+                else:
+                    message = _(
                         "No se puede cambiar la orden '%(name)s' "
                         "de '%(from_state)s' a '%(to_state)s'."
-                    ) % {
-                        "name": record.sale_id.display_name,
-                        "from_state": current_state,
-                        "to_state": state,
-                    })
-
-                record.sale_id.write({"state": state})
-
-                # MEJORA 6: Log en chatter del documento origen
-                record.sale_id.message_post(
-                    body=Markup(_(
-                        "Etapa cambiada a <b>%(stage)s</b> (estado: <b>%(state)s</b>) "
-                        "desde el Tablero de Proyectos."
-                    )) % {
-                        "stage": Markup.escape(self._selection_label(
-                            'project.control.board', 'lifecycle_stage', target_stage
-                        )),
-                        "state": Markup.escape(self._selection_label(
-                            'sale.order', 'state', state
-                        )),
-                    },
-                    subtype_xmlid="mail.mt_note",
-                )
-                continue
+                    )
+                raise UserError(message % {
+                    "name": origin.display_name,
+                    "from_state": current_state,
+                    "to_state": state,
+                })
 
-            raise UserError(_(
-                "El tablero no tiene un documento origen válido para actualizar."
-            ))
+            moves.setdefault((record.source, state), set()).add(origin.id)
+
+        # 2. Un write por modelo y estado destino; notas en lote
+        stage_label = self._selection_labels(
+            "project.control.board", "lifecycle_stage").get(target_stage, target_stage)
+        state_labels = {
+            source: self._selection_labels(model_name, "state")
+            for source, model_name in origin_models.items()
+            if any(move_source == source for move_source, _state in moves)
+        }
+        note_subtype_id = self.env["ir.model.data"]._xmlid_to_res_id("mail.mt_note")
+        for (source, state), origin_ids in moves.items():
+            origins = self.env[origin_models[source]].browse(sorted(origin_ids))
+            origins.write({"state": state})
+
+            # MEJORA 6: Log en chatter del documento origen
+            body = Markup(_(
+                "Etapa cambiada a <b>%(stage)s</b> (estado: <b>%(state)s</b>) "
+                "desde el Tablero de Proyectos."
+            )) % {
+                "stage": Markup.escape(stage_label),
+                "state": Markup.escape(state_labels[source].get(state, state)),
+            }
+            origins._message_log_batch(
+                bodies={origin_id: body for origin_id in origins.ids},
+                subtype_id=note_subtype_id,
+            )
 
+        # La tarjeta debe quedar en la nueva columna al recargar el kanban
+        self._refresh_board_rows(self.pending_id.ids, self.sale_id.ids)
         return True
 
+    def _is_board_materialized(self):
+        return table_kind(self.env.cr, self._table) == TableKind.Regular
+
     @api.model
     def init(self):
-        drop_view_if_exists(self.env.cr, self._table)
-        self.env.cr.execute(self._board_view_sql())
+        """
+        Crea el tablero como vista (modo en vivo) o como tabla materializada.
+
+        El modo se controla con el parámetro project_modificaciones.control_board_materialized
+        ("0" lo desactiva). En modo materializado la consulta vive en _live_view y
+        _table es una tabla con los índices del kanban que se rellena completa aquí,
+        por cron y por origen marcado como sucio.
+        """
+        cr = self.env.cr
+        materialized = self.env["ir.config_parameter"].sudo().get_param(
+            "project_modificaciones.control_board_materialized", "1") != "0"
+
+        if self._is_board_materialized():
+            cr.execute(f"DROP TABLE {self._table}")
+        drop_view_if_exists(cr, self._table)
+        drop_view_if_exists(cr, self._live_view)
+        cr.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self._dirty_table} (
+                source varchar NOT NULL,
+                origin_id integer NOT NULL,
+                PRIMARY KEY (source, origin_id)
+            )
+        """)
+        cr.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self._change_table} (
+                source varchar NOT NULL,
+                origin_id integer NOT NULL,
+                changed_at timestamp NOT NULL,
+                changed_txid bigint NOT NULL DEFAULT 0,
+                PRIMARY KEY (source, origin_id)
+            )
+        """)
+        cr.execute(f"""
+            ALTER TABLE {self._change_table}
+              ADD COLUMN IF NOT EXISTS changed_txid bigint NOT NULL DEFAULT 0
+        """)
+        cr.execute(f"""
+            CREATE INDEX IF NOT EXISTS {self._change_table}_changed_txid_index
+                ON {self._change_table} (changed_txid)
+        """)
+        if not materialized:
+            cr.execute(self._board_view_sql())
+            return
+
+        cr.execute(self._board_view_sql(self._live_view))
+        cr.execute(f"CREATE TABLE {self._table} AS SELECT * FROM {self._live_view} WITH NO DATA")
+        cr.execute(f"ALTER TABLE {self._table} ADD PRIMARY KEY (id)")
+        for column in ("lifecycle_stage", "source", "cliente_id", "disciplina_id",
+                       "pending_id", "sale_id"):
+            cr.execute(f"CREATE INDEX {self._table}_{column}_index ON {self._table} ({column})")
+        self._refresh_board_full()
+
+    # ---------------------------------------------------------------------
+    # Modo materializado: refresco completo, por origen y marcas de sucio
+    # ---------------------------------------------------------------------
+    def _lock_board_refresh(self):
+        # Serializa los refrescos; las lecturas siguen viendo la versión confirmada
+        self.env.cr.execute(
+            "SELECT pg_advisory_xact_lock(hashtext(%s))", [self._table])
+
+    def _refresh_board_full(self):
+        """Reconstruye todas las filas de la tabla materializada. Devuelve las filas."""
+        if not self._is_board_materialized():
+            return 0
+        self.env.flush_all()
+        self._lock_board_refresh()
+        cr = self.env.cr
+        cr.execute(f"DELETE FROM {self._table}")
+        cr.execute(f"INSERT INTO {self._table} SELECT * FROM {self._live_view}")
+        rows = cr.rowcount
+        cr.execute(f"DELETE FROM {self._dirty_table}")
+        self.invalidate_model()
+        self._notify_board_changes(full=True)
+        return rows
+
+    def _refresh_board_rows(self, pending_ids=(), sale_ids=()):
+        """Vuelve a agregar solo las filas de los origenes indicados."""
+        pending_ids, sale_ids = list(set(pending_ids)), list(set(sale_ids))
+        if not (pending_ids or sale_ids) or not self._is_board_materialized():
+            return 0
+        self.env.flush_all()
+        self._lock_board_refresh()
+        cr = self.env.cr
+        params = {"pending_ids": pending_ids, "sale_ids": sale_ids}
+        origin_where = """
+            (source = 'pending' AND pending_id = ANY(%(pending_ids)s))
+            OR (source = 'sale' AND sale_id = ANY(%(sale_ids)s))
+        """
+        cr.execute(f"DELETE FROM {self._table} WHERE {origin_where}", params)
+        cr.execute(f"""
+            INSERT INTO {self._table}
+            SELECT * FROM {self._live_view} WHERE {origin_where}
+        """, params)
+        rows = cr.rowcount
+        cr.execute(f"""
+            DELETE FROM {self._dirty_table}
+             WHERE (source = 'pending' AND origin_id = ANY(%(pending_ids)s))
+                OR (source = 'sale' AND origin_id = ANY(%(sale_ids)s))
+        """, params)
+        self.invalidate_model()
+        self._notify_board_changes(pending_ids, sale_ids)
+        return rows
+
+    def _refresh_dirty_rows(self):
+        """Refresca los origenes marcados como sucios. Devuelve las filas insertadas."""
+        if not self._is_board_materialized():
+            return 0
+        self.env.flush_all()
+        self.env.cr.execute(f"SELECT source, origin_id FROM {self._dirty_table}")
+        pending_ids, sale_ids = [], []
+        for source, origin_id in self.env.cr.fetchall():
+            (pending_ids if source == "pending" else sale_ids).append(origin_id)
+        return self._refresh_board_rows(pending_ids, sale_ids)
+
+    @api.model
+    def _mark_board_dirty(self, model_name, ids, resolve_now=False):
+        """
+        Anota registros de model_name cuyos origenes del tablero deben reagregarse.
+
+        Los origenes se resuelven y guardan en _dirty_table en precommit; con
+        resolve_now=True se resuelven de inmediato (antes de un unlink).
+        """
+        ids = [record_id for record_id in ids if isinstance(record_id, int)]
+        if not ids:
+            return
+        if resolve_now:
+            pending_ids, sale_ids = self._resolve_board_origins(model_name, ids)
+            self._mark_board_dirty("pending.service", pending_ids)
+            self._mark_board_dirty("sale.order", sale_ids)
+            return
+        data = self.env.cr.precommit.data
+        queue = data.get(BOARD_DIRTY_KEY)
+        if queue is None:
+            queue = data[BOARD_DIRTY_KEY] = {}
+            self.env.cr.precommit.add(self.browse()._flush_board_dirty_queue)
+        queue.setdefault(model_name, set()).update(ids)
+
+    def _flush_board_dirty_queue(self):
+        queue = self.env.cr.precommit.data.pop(BOARD_DIRTY_KEY, {})
+        pending_ids, sale_ids = set(), set()
+        for model_name, ids in queue.items():
+            model_pending_ids, model_sale_ids = self._resolve_board_origins(model_name, list(ids))
+            pending_ids.update(model_pending_ids)
+            sale_ids.update(model_sale_ids)
+        if not self._is_board_materialized():
+            # En modo en vivo la vista ya refleja el cambio al confirmar
+            self._notify_board_changes(pending_ids, sale_ids)
+            return
+        rows = [("pending", origin_id) for origin_id in pending_ids]
+        rows += [("sale", origin_id) for origin_id in sale_ids]
+        if rows:
+            self.env.cr.execute(f"""
+                INSERT INTO {self._dirty_table} (source, origin_id)
+                SELECT * FROM unnest(%s::varchar[], %s::integer[])
+                ON CONFLICT DO NOTHING
+            """, [[row[0] for row in rows], [row[1] for row in rows]])
+
+    # ---------------------------------------------------------------------
+    # Feed de cambios: el kanban parchea solo las tarjetas afectadas
+    # ---------------------------------------------------------------------
+    def _board_ids_for_origins(self, pending_ids=(), sale_ids=()):
+        return list(pending_ids) + [sale_id + self._sale_id_offset for sale_id in sale_ids]
+
+    def _notify_board_changes(self, pending_ids=(), sale_ids=(), full=False):
+        """Registra los origenes cambiados y avisa por bus a los kanban abiertos."""
+        pending_ids, sale_ids = list(set(pending_ids)), list(set(sale_ids))
+        rows = [("pending", origin_id) for origin_id in pending_ids]
+        rows += [("sale", origin_id) for origin_id in sale_ids]
+        if full:
+            rows.append(("full", 0))
+        if not rows:
+            return
+        # El feed se ordena por transacción, no por reloj: la marca de tiempo
+        # se toma antes del commit y un lector podría saltarse el cambio
+        self.env.cr.execute(f"""
+            INSERT INTO {self._change_table} (source, origin_id, changed_at, changed_txid)
+            SELECT source, origin_id, now() AT TIME ZONE 'UTC', txid_current()
+              FROM unnest(%s::varchar[], %s::integer[]) AS t(source, origin_id)
+            ON CONFLICT (source, origin_id)
+            DO UPDATE SET changed_at = EXCLUDED.changed_at,
+                          changed_txid = EXCLUDED.changed_txid
+        """, [[row[0] for row in rows], [row[1] for row in rows]])
+        self.env["bus.bus"]._sendone(
+            "project_control_board",
+            "project_control_board/changed",
+            {"ids": self._board_ids_for_origins(pending_ids, sale_ids), "full": full},
+        )
+
+    @api.model
+    def get_board_changes(self, since=None):
+        """
+        Tarjetas cuyo origen cambió desde since (cursor devuelto por la llamada
+        anterior). Sin since solo devuelve el cursor inicial; full indica que hubo
+        una reconstrucción completa y conviene recargar todo.
+
+        El cursor es el xmin del snapshot del lector: toda transacción anterior
+        ya terminó, y las que seguían abiertas tienen txid >= xmin, así que sus
+        cambios salen en la siguiente llamada aunque confirmen más tarde. Un
+        mismo id puede repetirse entre llamadas; el kanban solo lo vuelve a leer.
+        """
+        cr = self.env.cr
+        cr.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        result = {
+            "cursor": cr.fetchone()[0],
+            "full": False,
+            "ids": [],
+        }
+        if not since:
+            return result
+        cr.execute(f"""
+            SELECT source, origin_id FROM {self._change_table}
+             WHERE changed_txid >= %s
+        """, [int(since)])
+        pending_ids, sale_ids = [], []
+        for source, origin_id in cr.fetchall():
+            if source == "full":
+                result["full"] = True
+            else:
+                (pending_ids if source == "pending" else sale_ids).append(origin_id)
+        result["ids"] = self._board_ids_for_origins(pending_ids, sale_ids)
+        return result
+
+    def _resolve_board_origins(self, model_name, ids):
+        """Servicios pendientes y órdenes de venta cuyas filas dependen de ids."""
+        cr = self.env.cr
+        if model_name == "pending.service":
+            return ids, []
+        if model_name == "sale.order":
+            # La fila del pendiente de origen se oculta o aparece según sus ventas
+            cr.execute("""
+                SELECT pending_service_id
+                  FROM sale_order
+                 WHERE id = ANY(%s)
+                   AND pending_service_id IS NOT NULL
+            """, [ids])
+            return [row[0] for row in cr.fetchall()], ids
+        if model_name == "project.task":
+            cr.execute("""
+                SELECT servicio_pendiente FROM project_task
+                 WHERE id = ANY(%(ids)s) AND servicio_pendiente IS NOT NULL
+                 UNION
+                SELECT service_id FROM pending_service_line
+                 WHERE task_id = ANY(%(ids)s)
+            """, {"ids": ids})
+            pending_ids = [row[0] for row in cr.fetchall()]
+            cr.execute("""
+                SELECT sol.order_id FROM project_task pt
+                  JOIN sale_order_line sol ON sol.id = pt.sale_line_id
+                 WHERE pt.id = ANY(%(ids)s)
+                 UNION
+                SELECT order_id FROM sale_order_line
+                 WHERE task_id = ANY(%(ids)s)
+            """, {"ids": ids})
+            return pending_ids, [row[0] for row in cr.fetchall()]
+        if model_name == "account.move":
+            cr.execute("""
+                SELECT DISTINCT sol.order_id
+                  FROM account_move_line aml
+                  JOIN sale_order_line_invoice_rel rel ON rel.invoice_line_id = aml.id
+                  JOIN sale_order_line sol ON sol.id = rel.order_line_id
+                 WHERE aml.move_id = ANY(%s)
+            """, [ids])
+            return [], [row[0] for row in cr.fetchall()]
+        return [], []
+
+    @api.model
+    def _cron_refresh_board(self, full=False):
+        """Cron: refresca los origenes sucios; con full=True reconstruye todo (fechas del día)."""
+        if full:
+            return self._refresh_board_full()
+        return self._refresh_dirty_rows()
 
     @api.model
     def _name_search(self, name='', args=None, operator='ilike', limit=100, name_get_uid=None):
@@ -1082,12 +1382,21 @@ class ProjectControlBoard(models.Model):
         }
 
     def action_recompute_metrics(self):
+        started = time.monotonic()
         pending_count, sale_count = self._recompute_origin_metrics()
+        self._refresh_board_rows(self.pending_id.ids, self.sale_id.ids)
+        duration = time.monotonic() - started
+        _logger.info(
+            "Tablero: recálculo de %s pendientes y %s órdenes en %.2fs",
+            pending_count, sale_count, duration,
+        )
         message = _(
-            "Pendientes recalculados: %(pending)s. Órdenes recalculadas: %(sale)s."
+            "Pendientes recalculados: %(pending)s. Órdenes recalculadas: %(sale)s. "
+            "Tiempo: %(duration).2f s."
         ) % {
             "pending": pending_count,
             "sale": sale_count,
+            "duration": duration,
         }
         return {
             "type": "ir.actions.client",
@@ -1097,12 +1406,15 @@ class ProjectControlBoard(models.Model):
                 "message": message,
                 "type": "success",
                 "sticky": False,
-                "next": {"type": "ir.actions.client", "tag": "soft_reload"},
             },
         }
 
     def action_refresh_board(self):
-        return {"type": "ir.actions.client", "tag": "soft_reload"}
+        # Origenes marcados como sucios más las tarjetas seleccionadas
+        self._refresh_dirty_rows()
+        self._refresh_board_rows(self.pending_id.ids, self.sale_id.ids)
+        # Las tarjetas afectadas se actualizan por bus, sin recargar el kanban
+        return True
 
     def _toggle_origin_active(self, active_value):
         self.ensure_one()
@@ -1154,3 +1466,4 @@ class ProjectControlBoard(models.Model):
             "view_mode": "form",
             "target": "current",
         }
+
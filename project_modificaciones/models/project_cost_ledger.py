@@ -0,0 +1,462 @@
+import logging
+from collections import defaultdict
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
+
+# Clave de cr.precommit.data con las fuentes de costo tocadas en la transacción
+LEDGER_DIRTY_KEY = 'project_modificaciones.cost_ledger_dirty'
+# Clave de cr.cache con los costos de gastos y compras por proyecto (dashboard_project)
+PROFITABILITY_CACHE_KEY = 'project_modificaciones_profitability_costs'
+
+
+class ProjectCostLedger(models.Model):
+    """Libro desnormalizado de costos por tarea.
+
+    Una fila por (fuente, estado contable) con el monto en la moneda de origen
+    y en la de la compañía. Lo mantienen los create/write/unlink de las
+    fuentes (resueltos una vez por transacción en precommit) y se puede
+    reconstruir por lotes con _rebuild_ledger. Los tableros agregan desde aquí
+    con un solo GROUP BY en lugar de recorrer gastos, compras, almacén y horas.
+    """
+    _name = 'project.cost.ledger'
+    _description = 'Libro de Costos por Tarea'
+    _order = 'date desc, id desc'
+    _rec_name = 'source_model'
+
+    task_id = fields.Many2one(
+        'project.task', string='Tarea', index=True, ondelete='set null', readonly=True)
+    project_id = fields.Many2one(
+        'project.project', string='Proyecto', index=True, ondelete='set null', readonly=True)
+    company_id = fields.Many2one('res.company', string='Compañía', readonly=True)
+    date = fields.Date(string='Fecha', readonly=True)
+    source_model = fields.Selection([
+        ('hr.expense', 'Gasto'),
+        ('purchase.order.line', 'Compra'),
+        ('stock.move', 'Movimiento de Almacén'),
+        ('account.analytic.line', 'Hoja de Horas'),
+        ('compensation.line', 'Compensación'),
+    ], string='Fuente', required=True, readonly=True)
+    source_id = fields.Many2oneReference(
+        string='Registro Fuente', model_field='source_model', required=True, readonly=True)
+    state_bucket = fields.Selection([
+        ('billed', 'Contabilizado'),
+        ('to_bill', 'Por Contabilizar'),
+        ('committed', 'Comprometido'),
+    ], string='Estado', required=True, readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Moneda', readonly=True)
+    amount_currency = fields.Monetary(
+        string='Monto en Moneda', currency_field='currency_id', readonly=True)
+    company_currency_id = fields.Many2one(
+        related='company_id.currency_id', string='Moneda de la Compañía', store=True)
+    amount_company_currency = fields.Monetary(
+        string='Monto', currency_field='company_currency_id', readonly=True)
+
+    # Fuente -> (método que arma las filas de un lote de ids, dominio de la reconstrucción)
+    _LEDGER_SOURCES = {
+        'hr.expense': ('_get_expense_ledger_rows', []),
+        'purchase.order.line': ('_get_purchase_ledger_rows', [('order_id.state', 'in', ['purchase', 'done'])]),
+        'stock.move': ('_get_stock_ledger_rows', [('state', '=', 'done')]),
+        'account.analytic.line': ('_get_timesheet_ledger_rows', [('project_id', '!=', False)]),
+        'compensation.line': ('_get_compensation_ledger_rows', []),
+    }
+
+    def init(self):
+        create_index(self.env.cr, 'project_cost_ledger_source_index',
+                     self._table, ['source_model', 'source_id'])
+
+    # -------------------------------------------------------------------------
+    # LECTURA AGREGADA
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _read_totals(self, domain, groupby=()):
+        """
+        Montos en moneda de la compañía con un solo GROUP BY.
+        Retorna {(fuente, estado, *groupby): monto}; los many2one se devuelven como id.
+        """
+        groups = self.sudo()._read_group(
+            domain, ['source_model', 'state_bucket', *groupby], ['amount_company_currency:sum'])
+        return {
+            tuple(value.id if isinstance(value, models.BaseModel) else value for value in group[:-1]):
+                group[-1]
+            for group in groups
+        }
+
+    @api.model
+    def _source_condition(self, sources):
+        """Condición SQL sobre el alias l: filas cuyas fuentes están en {modelo: sub-select de ids}."""
+        if not sources:
+            return SQL("FALSE")
+        return SQL("(%s)", SQL(" OR ").join(
+            SQL("(l.source_model = %s AND l.source_id IN %s)", model_name, subquery)
+            for model_name, subquery in sources.items()
+        ))
+
+    @api.model
+    def _get_source_rows(self, sources, granularity=None):
+        """
+        Filas (fuente, estado, moneda de la compañía, fecha, monto) agrupadas en
+        una sola consulta. Con granularity (day/week/month) la fecha es el inicio
+        del periodo.
+        """
+        self.flush_model()
+        date_column = SQL("l.date")
+        if granularity:
+            date_column = SQL("date_trunc(%s, l.date)::date", granularity)
+        self.env.cr.execute(SQL("""
+            SELECT l.source_model, l.state_bucket, l.company_currency_id, %s,
+                   SUM(l.amount_company_currency)
+              FROM project_cost_ledger l
+             WHERE %s
+          GROUP BY 1, 2, 3, 4
+        """, date_column, self._source_condition(sources)))
+        return self.env.cr.fetchall()
+
+    # -------------------------------------------------------------------------
+    # MANTENIMIENTO INCREMENTAL
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _mark_ledger_dirty(self, model_name, ids, resolve_now=False):
+        """
+        Anota registros de model_name cuyas filas del libro deben recalcularse.
+
+        Se resuelven a fuentes y se sincronizan una sola vez en precommit; con
+        resolve_now=True se resuelven de inmediato (antes de un unlink).
+        """
+        ids = [record_id for record_id in ids if isinstance(record_id, int)]
+        if not ids:
+            return
+        if resolve_now:
+            for source_model, source_ids in self._resolve_ledger_sources(model_name, ids).items():
+                self._mark_ledger_dirty(source_model, source_ids)
+            return
+        data = self.env.cr.precommit.data
+        queue = data.get(LEDGER_DIRTY_KEY)
+        if queue is None:
+            queue = data[LEDGER_DIRTY_KEY] = {}
+            self.env.cr.precommit.add(self.browse()._flush_ledger_queue)
+        queue.setdefault(model_name, set()).update(ids)
+
+    def _flush_ledger_queue(self):
+        queue = self.env.cr.precommit.data.pop(LEDGER_DIRTY_KEY, {})
+        sources = defaultdict(set)
+        for model_name, ids in queue.items():
+            for source_model, source_ids in self._resolve_ledger_sources(model_name, list(ids)).items():
+                sources[source_model].update(source_ids)
+        for source_model, source_ids in sources.items():
+            self._sync_sources(source_model, list(source_ids))
+        self.env.flush_all()
+
+    def _resolve_ledger_sources(self, model_name, ids):
+        """Fuentes del libro {modelo: ids} cuyas filas dependen de ids de model_name."""
+        cr = self.env.cr
+        if model_name in self._LEDGER_SOURCES:
+            return {model_name: ids}
+        if model_name == 'purchase.order':
+            cr.execute("SELECT id FROM purchase_order_line WHERE order_id = ANY(%s)", [ids])
+            return {'purchase.order.line': [row[0] for row in cr.fetchall()]}
+        if model_name == 'hr.expense.sheet':
+            cr.execute("SELECT id FROM hr_expense WHERE sheet_id = ANY(%s)", [ids])
+            return {'hr.expense': [row[0] for row in cr.fetchall()]}
+        if model_name == 'stock.picking':
+            cr.execute("SELECT id FROM stock_move WHERE picking_id = ANY(%s)", [ids])
+            return {'stock.move': [row[0] for row in cr.fetchall()]}
+        if model_name == 'account.move':
+            # Facturas de proveedor, asientos de hojas de gasto y de valoración
+            cr.execute("""
+                SELECT DISTINCT purchase_line_id FROM account_move_line
+                 WHERE move_id = ANY(%s) AND purchase_line_id IS NOT NULL
+            """, [ids])
+            result = {'purchase.order.line': [row[0] for row in cr.fetchall()]}
+            Move = self.env['account.move']
+            if 'expense_sheet_id' in Move._fields and Move._fields['expense_sheet_id'].store:
+                cr.execute("""
+                    SELECT e.id FROM hr_expense e
+                      JOIN account_move am ON am.expense_sheet_id = e.sheet_id
+                     WHERE am.id = ANY(%s)
+                """, [ids])
+                result['hr.expense'] = [row[0] for row in cr.fetchall()]
+            if 'stock.valuation.layer' in self.env:
+                cr.execute("""
+                    SELECT DISTINCT stock_move_id FROM stock_valuation_layer
+                     WHERE account_move_id = ANY(%s) AND stock_move_id IS NOT NULL
+                """, [ids])
+                result['stock.move'] = [row[0] for row in cr.fetchall()]
+            return result
+        return {}
+
+    def _sync_sources(self, model_name, ids):
+        """Reemplaza las filas del libro de los ids de una fuente."""
+        if model_name not in self._LEDGER_SOURCES or not ids:
+            return 0
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            "DELETE FROM project_cost_ledger WHERE source_model = %s AND source_id = ANY(%s)"
+            " RETURNING task_id",
+            model_name, list(ids)))
+        task_ids = {row[0] for row in self.env.cr.fetchall() if row[0]}
+        self.invalidate_model()
+        if model_name in self.env:
+            method_name = self._LEDGER_SOURCES[model_name][0]
+            rows = getattr(self, method_name)(list(ids))
+            self._create_ledger_rows(model_name, rows)
+            task_ids.update(row[1] for row in rows if row[1])
+        else:
+            rows = []
+        # Los dashboards de venta guardan cifras agregadas desde el libro
+        self.env['dashboard.sale.order']._invalidate_dashboards(task_ids=list(task_ids))
+        # y la caché de la transacción de la rentabilidad por proyecto también
+        self.env.cr.cache.pop(PROFITABILITY_CACHE_KEY, None)
+        return len(rows)
+
+    def _create_ledger_rows(self, model_name, rows):
+        """
+        Crea las filas; rows son tuplas (source_id, task_id, project_id,
+        company_id, fecha, estado, currency_id, monto en moneda).
+        """
+        rows = [row for row in rows if row[7]]
+        if not rows:
+            return self.browse()
+        companies = self.env['res.company'].browse({row[3] for row in rows if row[3]})
+        currencies = self.env['res.currency'].browse({row[6] for row in rows if row[6]})
+        default_company = self.env.company
+        vals_list = []
+        for source_id, task_id, project_id, company_id, date, bucket, currency_id, amount in rows:
+            company = companies.browse(company_id) if company_id else default_company
+            currency = currencies.browse(currency_id) if currency_id else company.currency_id
+            rates = self.env['res.currency']._get_rate_matrix(company)
+            vals_list.append({
+                'source_model': model_name,
+                'source_id': source_id,
+                'task_id': task_id,
+                'project_id': project_id,
+                'company_id': company.id,
+                'date': date,
+                'state_bucket': bucket,
+                'currency_id': currency.id,
+                'amount_currency': amount,
+                'amount_company_currency': rates.convert(
+                    amount, currency, company.currency_id, date),
+            })
+        return self.sudo().create(vals_list)
+
+    # -------------------------------------------------------------------------
+    # FILAS POR FUENTE
+    # Mismos criterios que el motor SQL del reporte de rentabilidad.
+    # -------------------------------------------------------------------------
+
+    def _get_expense_ledger_rows(self, ids):
+        """Gastos de hojas aprobadas; contabilizados si la hoja tiene asiento publicado."""
+        Expense = self.env['hr.expense']
+        amount_field = next(
+            (fname for fname in ('untaxed_amount_currency', 'untaxed_amount')
+             if fname in Expense._fields and Expense._fields[fname].store),
+            'total_amount')
+        sheet_fields = self.env['hr.expense.sheet']._fields
+        if 'account_move_id' in sheet_fields:
+            billed = SQL("""EXISTS (SELECT 1 FROM account_move am
+                                     WHERE am.id = sheet.account_move_id AND am.state = 'posted')""")
+        elif 'account_move_ids' in sheet_fields:
+            inverse = SQL.identifier(sheet_fields['account_move_ids'].inverse_name)
+            billed = SQL("""EXISTS (SELECT 1 FROM account_move am
+                                     WHERE am.%s = sheet.id AND am.state = 'posted')""", inverse)
+        elif 'move_id' in sheet_fields:
+            billed = SQL("""EXISTS (SELECT 1 FROM account_move am
+                                     WHERE am.id = sheet.move_id AND am.state = 'posted')""")
+        else:
+            billed = SQL("COALESCE(sheet.state IN ('post', 'done'), FALSE)")
+
+        self.env.cr.execute(SQL("""
+            SELECT e.id, e.task_id, COALESCE(e.project_id, t.project_id), e.company_id, e.date,
+                   CASE WHEN %s THEN 'billed' ELSE 'to_bill' END,
+                   e.currency_id, COALESCE(%s, 0)
+              FROM hr_expense e
+              JOIN hr_expense_sheet sheet ON sheet.id = e.sheet_id
+         LEFT JOIN project_task t ON t.id = e.task_id
+             WHERE e.id = ANY(%s)
+               AND sheet.state IN ('approve', 'post', 'done')
+        """, billed, SQL.identifier('e', amount_field), ids))
+        return self.env.cr.fetchall()
+
+    def _get_purchase_ledger_rows(self, ids):
+        """Compras confirmadas: facturado, recibido por facturar y el resto comprometido."""
+        self.env.cr.execute("""
+            SELECT pol.id, pol.task_id, COALESCE(pol.project_id, po.project_id, t.project_id),
+                   pol.company_id, po.date_order::date, pol.currency_id,
+                   COALESCE(pol.qty_invoiced, 0) * COALESCE(pol.price_unit, 0),
+                   GREATEST(0, COALESCE(pol.qty_received, 0) - COALESCE(pol.qty_invoiced, 0))
+                       * COALESCE(pol.price_unit, 0),
+                   COALESCE(pol.price_subtotal, 0)
+              FROM purchase_order_line pol
+              JOIN purchase_order po ON po.id = pol.order_id
+         LEFT JOIN project_task t ON t.id = pol.task_id
+             WHERE pol.id = ANY(%s)
+               AND po.state IN ('purchase', 'done')
+        """, [ids])
+        rows = []
+        for line_id, task_id, project_id, company_id, date, currency_id, billed, to_bill, total \
+                in self.env.cr.fetchall():
+            head = (line_id, task_id, project_id, company_id, date)
+            rows.append(head + ('billed', currency_id, billed))
+            rows.append(head + ('to_bill', currency_id, to_bill))
+            rows.append(head + ('committed', currency_id, total - billed - to_bill))
+        return rows
+
+    def _get_stock_ledger_rows(self, ids):
+        """
+        Consumos de almacén (salidas − devoluciones) ligados a tarea o proyecto.
+        Excluye movimientos de compras; sin capas ni precio se valoran con el
+        costo estándar del producto. Contabilizados si alguna capa tiene asiento publicado.
+        """
+        picking_filter = SQL()
+        if 'purchase_id' in self.env['stock.picking']._fields:
+            # picking.purchase_id es related sobre el primer movimiento del albarán
+            picking_filter = SQL("""
+               AND (sm.picking_id IS NULL OR (
+                       SELECT pm.purchase_line_id FROM stock_move pm
+                        WHERE pm.picking_id = sm.picking_id
+                     ORDER BY pm.sequence, pm.id
+                        LIMIT 1) IS NULL)""")
+        layers = SQL("""
+            SELECT NULL::integer AS stock_move_id, 0.0 AS value, FALSE AS posted WHERE FALSE""")
+        if 'stock.valuation.layer' in self.env:
+            layers = SQL("""
+                SELECT svl.stock_move_id,
+                       SUM(ABS(svl.value)) AS value,
+                       BOOL_OR(am.state = 'posted') AS posted
+                  FROM stock_valuation_layer svl
+             LEFT JOIN account_move am ON am.id = svl.account_move_id
+                 WHERE svl.stock_move_id = ANY(%s)
+              GROUP BY svl.stock_move_id""", ids)
+        self.env.cr.execute(SQL("""
+            WITH moves AS (
+                SELECT sm.id, sm.task_id,
+                       COALESCE(sm.project_id, sp.project_id, t.project_id) AS project_id,
+                       sm.company_id, sm.date::date AS doc_date, sm.product_id,
+                       COALESCE(sm.price_unit, 0) AS price_unit,
+                       COALESCE(sm.quantity, 0) AS qty,
+                       CASE WHEN src.usage = 'internal' AND dst.usage != 'internal' THEN 1
+                            WHEN src.usage != 'internal' AND dst.usage = 'internal' THEN -1
+                            ELSE 0 END AS direction
+                  FROM stock_move sm
+                  JOIN stock_location src ON src.id = sm.location_id
+                  JOIN stock_location dst ON dst.id = sm.location_dest_id
+             LEFT JOIN stock_picking sp ON sp.id = sm.picking_id
+             LEFT JOIN project_task t ON t.id = sm.task_id
+                 WHERE sm.id = ANY(%s)
+                   AND sm.state = 'done'
+                   AND sm.purchase_line_id IS NULL
+                   AND (sm.task_id IS NOT NULL OR sm.project_id IS NOT NULL
+                        OR sp.project_id IS NOT NULL)
+                   %s
+            ), layers AS (%s)
+            SELECT m.id, m.task_id, m.project_id, m.company_id, m.doc_date,
+                   COALESCE(l.posted, FALSE), m.direction,
+                   CASE WHEN l.stock_move_id IS NULL AND m.price_unit = 0 THEN m.product_id END,
+                   CASE WHEN l.stock_move_id IS NOT NULL THEN l.value
+                        WHEN m.price_unit != 0 THEN m.price_unit * m.qty
+                        ELSE m.qty END
+              FROM moves m
+         LEFT JOIN layers l ON l.stock_move_id = m.id
+             WHERE m.direction != 0
+        """, ids, picking_filter, layers))
+        fetched = self.env.cr.fetchall()
+
+        # Filas sin capa ni precio traen cantidad: se valoran con standard_price
+        companies = self.env['res.company'].browse({row[3] for row in fetched if row[3]})
+        std_prices = {}
+        for company in companies | self.env.company:
+            products = self.env['product.product'].sudo().with_company(company).browse(
+                list({row[7] for row in fetched if row[7] and (row[3] or self.env.company.id) == company.id}))
+            std_prices.update({(company.id, product.id): product.standard_price for product in products})
+
+        rows = []
+        for move_id, task_id, project_id, company_id, date, posted, direction, product_id, value in fetched:
+            company = companies.browse(company_id) if company_id else self.env.company
+            if product_id:
+                value *= std_prices.get((company.id, product_id), 0.0)
+            rows.append((move_id, task_id, project_id, company.id, date,
+                         'billed' if posted else 'to_bill', company.currency_id.id, direction * value))
+        return rows
+
+    def _get_timesheet_ledger_rows(self, ids):
+        """Costo de mano de obra de las líneas analíticas de proyecto (valor absoluto)."""
+        self.env.cr.execute("""
+            SELECT aal.id, aal.task_id, aal.project_id, aal.company_id, aal.date,
+                   'billed', aal.currency_id, ABS(COALESCE(aal.amount, 0))
+              FROM account_analytic_line aal
+             WHERE aal.id = ANY(%s)
+               AND aal.project_id IS NOT NULL
+        """, [ids])
+        return self.env.cr.fetchall()
+
+    def _get_compensation_ledger_rows(self, ids):
+        """
+        Compensaciones aprobadas (por contabilizar) o aplicadas (contabilizadas).
+        El modelo viene de otro módulo: se lee por ORM según los campos disponibles.
+        """
+        Line = self.env['compensation.line'].sudo()
+        if 'total_cost' not in Line._fields or 'compensation_id' not in Line._fields:
+            return []
+        date_field = 'date' if 'date' in Line._fields else 'create_date'
+        rows = []
+        for line in Line.browse(ids).exists():
+            state = line.compensation_id.state
+            if state not in ('approve', 'approved', 'applied'):
+                continue
+            task = line.task_id if 'task_id' in Line._fields else self.env['project.task']
+            project = line.project_id if 'project_id' in Line._fields else task.project_id
+            company = (line.company_id if 'company_id' in Line._fields else task.company_id) \
+                or self.env.company
+            date = line[date_field]
+            rows.append((
+                line.id, task.id or None, (project or task.project_id).id or None, company.id,
+                fields.Date.to_date(date) if date else None,
+                'billed' if state == 'applied' else 'to_bill',
+                company.currency_id.id, line.total_cost or 0.0,
+            ))
+        return rows
+
+    # -------------------------------------------------------------------------
+    # RECONSTRUCCIÓN
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _rebuild_ledger(self, model_names=None, chunk_size=1000, commit=True):
+        """
+        Reconstruye el libro desde las fuentes en lotes de chunk_size, con
+        commit por lote si commit es True. Las filas de registros borrados se
+        eliminan al final. Devuelve {fuente: filas creadas}.
+        """
+        result = {}
+        for model_name in model_names or list(self._LEDGER_SOURCES):
+            if model_name not in self.env:
+                continue
+            domain = self._LEDGER_SOURCES[model_name][1]
+            source_ids = self.env[model_name].sudo().with_context(
+                active_test=False).search(domain, order='id').ids
+            created = 0
+            for start in range(0, len(source_ids), chunk_size):
+                created += self._sync_sources(model_name, source_ids[start:start + chunk_size])
+                if commit and not self.env.registry.in_test_mode():
+                    self.env.cr.commit()
+            # Filas cuyas fuentes ya no existen o dejaron de cumplir el dominio
+            self.env.cr.execute(SQL("""
+                DELETE FROM project_cost_ledger
+                 WHERE source_model = %s AND NOT (source_id = ANY(%s))
+            """, model_name, source_ids))
+            self.invalidate_model()
+            result[model_name] = created
+            _logger.info("Libro de costos: %s filas de %s", created, model_name)
+        return result
+
+    @api.model
+    def _cron_rebuild_ledger(self):
+        """Cron nocturno: corrige desvíos de cambios que no pasan por write (compensaciones, cómputos)."""
+        return self._rebuild_ledger()
+
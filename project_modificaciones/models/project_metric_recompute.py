@@ -0,0 +1,153 @@
+import logging
+import time
+from datetime import datetime, timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class ProjectMetricRecomputeLog(models.Model):
+    """Bitácora del recálculo diario de métricas que dependen de la fecha del día.
+
+    Campos como avance_planeado o los semáforos del kanban se almacenan pero
+    dependen de fields.Date.today(); el cron diario recalcula solo los registros
+    cuya ventana planeada cruza el día de hoy y deja aquí el resultado.
+    """
+    _name = 'project.metric.recompute.log'
+    _description = 'Bitácora de Recálculo Diario de Métricas'
+    _order = 'date_start desc, id desc'
+
+    name = fields.Char(string="Ejecución", required=True, readonly=True)
+    date_start = fields.Datetime(string="Inicio", readonly=True)
+    duration = fields.Float(
+        string="Duración (s)", digits=(16, 2), readonly=True)
+    chunk_size = fields.Integer(string="Tamaño de Lote", readonly=True)
+    task_count = fields.Integer(string="Tareas", readonly=True)
+    pending_count = fields.Integer(
+        string="Servicios Pendientes", readonly=True)
+    sale_count = fields.Integer(string="Órdenes de Venta", readonly=True)
+    state = fields.Selection([
+        ('done', 'Completado'),
+        ('failed', 'Con errores'),
+    ], string="Estado", default='done', readonly=True)
+    message = fields.Text(string="Detalle", readonly=True)
+
+    def _get_time_decay_targets(self, today):
+        """Modelos a revisar, campos dependientes de la fecha y dominio de selección.
+
+        Ventana: inicio <= hoy <= fin + 1 día, sin terminar ni cancelar. El día
+        siguiente al fin se incluye para que el semáforo pase a rojo y el avance
+        planeado llegue a 100 %. Los días de retraso de las tareas cambian cada
+        día después del fin, por eso las tareas vencidas abiertas se agregan aparte.
+        """
+        day_start = datetime.combine(today, datetime.min.time())
+        day_end = datetime.combine(today, datetime.max.time())
+        window_start = day_start - timedelta(days=1)
+        return [
+            {
+                'model': 'project.task',
+                'count_field': 'task_count',
+                'fields': ['avance_planeado', 'kanban_color_obra', 'kanban_stage', 'days_delayed'],
+                'domain': [
+                    ('planned_date_begin', '<=', day_end),
+                    ('date_deadline', '>=', window_start),
+                    ('state', 'not in', ['1_done', '1_canceled']),
+                ],
+            },
+            {
+                'model': 'project.task',
+                'count_field': 'task_count',
+                'fields': ['days_delayed'],
+                'domain': [
+                    ('date_deadline', '<', window_start),
+                    ('state', 'not in', ['1_done', '1_canceled']),
+                    ('avance_actual', '<', 100.0),
+                ],
+            },
+            {
+                'model': 'pending.service',
+                'count_field': 'pending_count',
+                'fields': ['avance_planeado', 'kanban_color', 'delay_days'],
+                'domain': [
+                    ('date_start', '<=', day_end),
+                    ('date_end_plan', '>=', window_start),
+                    ('state', 'not in', ['canceled']),
+                ],
+            },
+            {
+                'model': 'sale.order',
+                'count_field': 'sale_count',
+                'fields': ['avance_planeado', 'kanban_color_sale'],
+                'domain': [
+                    ('date_order', '<=', day_end),
+                    ('commitment_date', '>=', window_start),
+                    ('state', 'not in', ['done', 'cancel']),
+                ],
+            },
+        ]
+
+    def _recompute_time_decay_records(self, model_name, fnames, domain, chunk_size):
+        """Recalcula fnames en lotes de chunk_size, con commit por lote.
+
+        Solo se consideran los campos almacenados y computados que existen en el
+        modelo (los no almacenados ya se calculan en vivo). Devuelve el número de
+        registros recalculados.
+        """
+        model = self.env[model_name].sudo()
+        fnames = [
+            fname for fname in fnames
+            if fname in model._fields
+            and model._fields[fname].store
+            and model._fields[fname].compute
+        ]
+        if not fnames:
+            return 0
+
+        domain_fields = {leaf[0] for leaf in domain}
+        if not domain_fields.issubset(model._fields):
+            return 0
+
+        record_ids = model.search(domain, order='id').ids
+        for start in range(0, len(record_ids), chunk_size):
+            records = model.browse(record_ids[start:start + chunk_size])
+            for fname in fnames:
+                self.env.add_to_compute(model._fields[fname], records)
+            self.env.flush_all()
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            self.env.invalidate_all()
+        return len(record_ids)
+
+    @api.model
+    def _cron_recompute_time_decay_metrics(self, chunk_size=500):
+        """Cron diario: recalcula las métricas que dependen de la fecha del día."""
+        date_start = fields.Datetime.now()
+        started = time.monotonic()
+        counts = {'task_count': 0, 'pending_count': 0, 'sale_count': 0}
+        state, message = 'done', False
+
+        try:
+            for target in self._get_time_decay_targets(fields.Date.today()):
+                counts[target['count_field']] += self._recompute_time_decay_records(
+                    target['model'], target['fields'], target['domain'], chunk_size,
+                )
+        except Exception as exc:
+            self.env.cr.rollback()
+            _logger.exception("Error en el recálculo diario de métricas")
+            state, message = 'failed', str(exc)
+
+        duration = time.monotonic() - started
+        _logger.info(
+            "Recálculo diario de métricas: %s tareas, %s pendientes, %s ventas en %.2fs",
+            counts['task_count'], counts['pending_count'], counts['sale_count'], duration,
+        )
+        return self.sudo().create({
+            'name': fields.Datetime.to_string(date_start),
+            'date_start': date_start,
+            'duration': duration,
+            'chunk_size': chunk_size,
+            'state': state,
+            'message': message,
+            **counts,
+        })
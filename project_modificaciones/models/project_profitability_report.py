@@ -1,5 +1,7 @@
 from odoo import api, fields, models, _
-from odoo.tools import format_amount
+from odoo.exceptions import UserError
+from odoo.tools import SQL, format_amount, format_date
+from odoo.tools.misc import formatLang
 from odoo.tools.float_utils import float_round
 from odoo.osv import expression
 from datetime import date
@@ -9,6 +11,35 @@ from collections import defaultdict
 from odoo.tools import Markup
 
 
+def _lttb_indices(values, threshold):
+    """
+    Índices de la serie elegidos con Largest-Triangle-Three-Buckets (x = índice).
+    Conserva el primer y el último punto y la forma de la curva.
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    indices = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = (avg_start + avg_end - 1) / 2.0
+        avg_y = sum(values[avg_start:avg_end]) / (avg_end - avg_start)
+
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((a - avg_x) * (values[j] - values[a])
+                       - (a - j) * (avg_y - values[a]))
+            if area > best_area:
+                best, best_area = j, area
+        indices.append(best)
+        a = best
+    indices.append(n - 1)
+    return indices
+
+
 class ProjectProfitabilityReport(models.TransientModel):
     _name = 'project.profitability.report'
     _description = 'Reporte de Rentabilidad de Proyecto'
@@ -98,6 +129,13 @@ class ProjectProfitabilityReport(models.TransientModel):
         ('line', 'Evolución Temporal'),
     ], string='Tipo de Gráfico', default='pie', required=True)
 
+    line_chart_granularity = fields.Selection([
+        ('day', 'Día'),
+        ('week', 'Semana'),
+        ('month', 'Mes'),
+    ], string='Agrupar Evolución por', default='day', required=True,
+        help="Periodo en que se acumulan los montos del gráfico de evolución temporal.")
+
     date_filter_type = fields.Selection([
         ('none', 'Sin Filtro de Fecha'),
         ('today', 'Hoy'),
@@ -142,20 +180,6 @@ class ProjectProfitabilityReport(models.TransientModel):
         store=True,
     )
 
-    # ── Flags de lazy-load de tablas de detalle ───────────────────────────────
-    # FIX Problema 2: estos flags están en el @api.depends de _compute_content
-    # pero NO en el de _compute_financials, por lo que activarlos solo re-renderiza
-    # el HTML sin re-ejecutar las queries financieras pesadas.
-
-    show_detail_purchases = fields.Boolean(
-        string='Mostrar Compras',    default=False)
-    show_detail_expenses = fields.Boolean(
-        string='Mostrar Gastos',     default=False)
-    show_detail_stock = fields.Boolean(
-        string='Mostrar Stock',      default=False)
-    show_detail_timesheets = fields.Boolean(
-        string='Mostrar Horas',      default=False)
-
     # ── Métricas Agregadas (Compute → _compute_financials) ───────────────────
 
     timesheet_hours = fields.Float(
@@ -262,6 +286,13 @@ class ProjectProfitabilityReport(models.TransientModel):
         currency_field='currency_id',
         help="Compras facturadas o recibidas.")
 
+    # ── Snapshot en caché ────────────────────────────────────────────────────
+
+    snapshot_date = fields.Datetime(
+        string='Calculado el', compute='_compute_financials',
+        help="Fecha del snapshot persistente del que provienen los montos. Se "
+             "recalcula solo si cambian los registros en alcance o al forzar la actualización.")
+
     # ── Producción desde Avances Físicos ────────────────────────────────────
 
     production_avances = fields.Monetary(
@@ -365,12 +396,9 @@ class ProjectProfitabilityReport(models.TransientModel):
         'partner_filter_ids', 'ubicacion_ids', 'project_ids',
     )
     def _onchange_filters(self):
-        # Resetear lazy-load al cambiar filtros de datos
-        self.show_detail_purchases = False
-        self.show_detail_expenses = False
-        self.show_detail_stock = False
-        self.show_detail_timesheets = False
         # No llamar compute manualmente, Odoo lo hace por @api.depends
+        # (las tablas de detalle se piden por página desde el cliente)
+        return
 
     @api.onchange('project_ids')
     def _onchange_project_ids(self):
@@ -397,14 +425,18 @@ class ProjectProfitabilityReport(models.TransientModel):
             domain.append((date_field, '<=', self.date_to))
         return domain
 
+    def _get_rate_matrix(self):
+        """Matriz de tasas precargadas de la compañía (ver res.currency._get_rate_matrix)."""
+        return self.env['res.currency']._get_rate_matrix(self.env.company)
+
     def _convert_amount(self, amount, src_currency, target_currency, date=None):
         """Convierte un monto de una moneda origen a una destino en una fecha dada."""
         if not src_currency:
             src_currency = self.env.company.currency_id
         if src_currency == target_currency:
             return amount
-        return src_currency._convert(
-            amount, target_currency, self.env.company, date or fields.Date.context_today(self))
+        return self._get_rate_matrix().convert(
+            amount, src_currency, target_currency, date or fields.Date.context_today(self))
 
     def _check_date(self, date_value):
         """Verifica si una fecha cae dentro del rango de filtro activo."""
@@ -618,22 +650,12 @@ class ProjectProfitabilityReport(models.TransientModel):
     # SECCIÓN: LÓGICA DE VENTAS (INGRESOS)
     # =========================================================================
 
-    def _get_sale_order_lines(self, all_tasks=None, projects=None):
-        """
-        Obtiene las líneas de venta relacionadas al proyecto.
-        Acepta recordsets pre-calculados para evitar queries duplicadas.
-        """
-        self.ensure_one()
-        if all_tasks is None:
-            tasks = self._get_filtered_tasks()
-            all_tasks = tasks | tasks.mapped('child_ids')
-        if projects is None:
-            projects = self._get_filtered_projects()
-
+    def _get_sale_order_line_domain(self, all_tasks, projects):
+        """Dominio de las líneas de venta del análisis; None si no hay vínculo posible."""
         # FIX 4 — Guardia defensiva: si no hay tareas ni proyectos, retornar vacío
         # para evitar que link_domain quede vacío y devuelva registros globales.
         if not all_tasks and not projects:
-            return self.env['sale.order.line']
+            return None
 
         final_domain = [('state', 'in', ['sale', 'done']),
                         ('display_type', '=', False)]
@@ -667,12 +689,29 @@ class ProjectProfitabilityReport(models.TransientModel):
 
         # FIX 4 — Si no hay partes de vinculación, retornar vacío (nunca buscar global)
         if not link_parts:
-            return self.env['sale.order.line']
+            return None
 
         link_domain = expression.OR(link_parts)
         full_domain = expression.AND([final_domain, link_domain])
 
-        return self.env['sale.order.line'].sudo().search(full_domain)
+        return full_domain
+
+    def _get_sale_order_lines(self, all_tasks=None, projects=None):
+        """
+        Obtiene las líneas de venta relacionadas al proyecto.
+        Acepta recordsets pre-calculados para evitar queries duplicadas.
+        """
+        self.ensure_one()
+        if all_tasks is None:
+            tasks = self._get_filtered_tasks()
+            all_tasks = tasks | tasks.mapped('child_ids')
+        if projects is None:
+            projects = self._get_filtered_projects()
+
+        domain = self._get_sale_order_line_domain(all_tasks, projects)
+        if domain is None:
+            return self.env['sale.order.line']
+        return self.env['sale.order.line'].sudo().search(domain)
 
     def _get_sale_orders(self):
         """Retorna las órdenes de venta distintas derivadas de las líneas."""
@@ -696,21 +735,11 @@ class ProjectProfitabilityReport(models.TransientModel):
     # SECCIÓN: LÓGICA DE COMPRAS
     # =========================================================================
 
-    def _get_purchase_order_lines(self, all_tasks=None, projects=None):
-        """
-        Obtiene líneas de compra comprometidas o realizadas.
-        Acepta recordsets pre-calculados para evitar queries duplicadas.
-        """
-        self.ensure_one()
-        if all_tasks is None:
-            tasks = self._get_filtered_tasks()
-            all_tasks = tasks | tasks.mapped('child_ids')
-        if projects is None:
-            projects = self._get_filtered_projects()
-
+    def _get_purchase_order_line_domain(self, all_tasks, projects):
+        """Dominio de las líneas de compra del análisis; None si no hay vínculo posible."""
         # FIX 4 — Guardia defensiva
         if not all_tasks and not projects:
-            return self.env['purchase.order.line']
+            return None
 
         final_domain = [('order_id.state', 'in', ['purchase', 'done'])]
 
@@ -742,22 +771,18 @@ class ProjectProfitabilityReport(models.TransientModel):
 
         # FIX 4 — Guardia: sin partes de vínculo → vacío
         if not link_parts:
-            return self.env['purchase.order.line']
+            return None
 
         link_domain = expression.OR(link_parts)
         full_domain = expression.AND([final_domain, link_domain])
 
-        return self.env['purchase.order.line'].sudo().search(full_domain)
-
-    def _get_purchase_orders(self):
-        return self._get_purchase_order_lines().mapped('order_id')
-
-    # =========================================================================
-    # SECCIÓN: LÓGICA DE STOCK Y MOVIMIENTOS
-    # =========================================================================
+        return full_domain
 
-    def _get_stock_moves(self, all_tasks=None, projects=None):
-        """Retorna los Movimientos de Almacén específicos vinculados al proyecto."""
+    def _get_purchase_order_lines(self, all_tasks=None, projects=None):
+        """
+        Obtiene líneas de compra comprometidas o realizadas.
+        Acepta recordsets pre-calculados para evitar queries duplicadas.
+        """
         self.ensure_one()
         if all_tasks is None:
             tasks = self._get_filtered_tasks()
@@ -765,9 +790,23 @@ class ProjectProfitabilityReport(models.TransientModel):
         if projects is None:
             projects = self._get_filtered_projects()
 
+        domain = self._get_purchase_order_line_domain(all_tasks, projects)
+        if domain is None:
+            return self.env['purchase.order.line']
+        return self.env['purchase.order.line'].sudo().search(domain)
+
+    def _get_purchase_orders(self):
+        return self._get_purchase_order_lines().mapped('order_id')
+
+    # =========================================================================
+    # SECCIÓN: LÓGICA DE STOCK Y MOVIMIENTOS
+    # =========================================================================
+
+    def _get_stock_move_domain(self, all_tasks, projects):
+        """Dominio de los movimientos de almacén del análisis; None si no hay vínculo posible."""
         # FIX 4 — Guardia defensiva
         if not all_tasks and not projects:
-            return self.env['stock.move']
+            return None
 
         final_domain = [('state', '=', 'done')]
 
@@ -792,22 +831,15 @@ class ProjectProfitabilityReport(models.TransientModel):
 
         # FIX 4 — Guardia: sin partes de vínculo → vacío
         if not link_parts:
-            return self.env['stock.move']
+            return None
 
         link_domain = expression.OR(link_parts)
         full_domain = expression.AND([final_domain, link_domain])
 
-        return self.env['stock.move'].sudo().search(full_domain)
+        return full_domain
 
-    # =========================================================================
-    # SECCIÓN: LÓGICA DE HOJAS DE HORAS (TIMESHEETS)
-    # =========================================================================
-
-    def _get_timesheets(self, all_tasks=None, projects=None):
-        """
-        Retorna las líneas analíticas (horas) asociadas al proyecto.
-        Acepta recordsets pre-calculados para evitar queries duplicadas.
-        """
+    def _get_stock_moves(self, all_tasks=None, projects=None):
+        """Retorna los Movimientos de Almacén específicos vinculados al proyecto."""
         self.ensure_one()
         if all_tasks is None:
             tasks = self._get_filtered_tasks()
@@ -815,10 +847,21 @@ class ProjectProfitabilityReport(models.TransientModel):
         if projects is None:
             projects = self._get_filtered_projects()
 
+        domain = self._get_stock_move_domain(all_tasks, projects)
+        if domain is None:
+            return self.env['stock.move']
+        return self.env['stock.move'].sudo().search(domain)
+
+    # =========================================================================
+    # SECCIÓN: LÓGICA DE HOJAS DE HORAS (TIMESHEETS)
+    # =========================================================================
+
+    def _get_timesheet_domain(self, all_tasks, projects):
+        """Dominio de las horas (líneas analíticas) del análisis; None si no hay proyectos."""
         # FIX 5 — Guardia defensiva: si no hay proyectos, retornar vacío
         # para evitar que un domain=[] devuelva TODOS los timesheets del sistema.
         if not projects:
-            return self.env['account.analytic.line']
+            return None
 
         domain = [('project_id', 'in', projects.ids)]
 
@@ -833,14 +876,13 @@ class ProjectProfitabilityReport(models.TransientModel):
             if self.date_to:
                 domain.append(('date', '<=', self.date_to))
 
-        return self.env['account.analytic.line'].sudo().search(domain)
-
-    # =========================================================================
-    # SECCIÓN: LÓGICA DE COMPENSACIONES
-    # =========================================================================
+        return domain
 
-    def _get_compensations(self, all_tasks=None, projects=None):
-        """Obtiene líneas de compensación (nómina/extras) en estado Aplicado."""
+    def _get_timesheets(self, all_tasks=None, projects=None):
+        """
+        Retorna las líneas analíticas (horas) asociadas al proyecto.
+        Acepta recordsets pre-calculados para evitar queries duplicadas.
+        """
         self.ensure_one()
         if all_tasks is None:
             tasks = self._get_filtered_tasks()
@@ -848,6 +890,17 @@ class ProjectProfitabilityReport(models.TransientModel):
         if projects is None:
             projects = self._get_filtered_projects()
 
+        domain = self._get_timesheet_domain(all_tasks, projects)
+        if domain is None:
+            return self.env['account.analytic.line']
+        return self.env['account.analytic.line'].sudo().search(domain)
+
+    # =========================================================================
+    # SECCIÓN: LÓGICA DE COMPENSACIONES
+    # =========================================================================
+
+    def _get_compensation_domain(self, all_tasks, projects):
+        """Dominio de las líneas de compensación aplicadas del análisis."""
         domain = [('compensation_id.state', '=', 'applied')]
 
         has_project = 'project_id' in self.env['compensation.line']._fields
@@ -872,7 +925,19 @@ class ProjectProfitabilityReport(models.TransientModel):
             if self.date_to:
                 domain.append((date_field, '<=', self.date_to))
 
-        return self.env['compensation.line'].search(domain)
+        return domain
+
+    def _get_compensations(self, all_tasks=None, projects=None):
+        """Obtiene líneas de compensación (nómina/extras) en estado Aplicado."""
+        self.ensure_one()
+        if all_tasks is None:
+            tasks = self._get_filtered_tasks()
+            all_tasks = tasks | tasks.mapped('child_ids')
+        if projects is None:
+            projects = self._get_filtered_projects()
+
+        return self.env['compensation.line'].search(
+            self._get_compensation_domain(all_tasks, projects))
 
     # =========================================================================
     # HELPERS DE CONVERSIÓN MASIVA (Anti N+1)
@@ -884,7 +949,6 @@ class ProjectProfitabilityReport(models.TransientModel):
         llamadas a la API de tipos de cambio (evita el problema N+1).
         """
         groups = defaultdict(float)
-        company = self.env.company
 
         for rec in records:
             amount = amount_getter(rec)
@@ -902,11 +966,12 @@ class ProjectProfitabilityReport(models.TransientModel):
             )
         }
 
+        self._get_rate_matrix().preload(list(groups) + [(target_currency, None)])
+
         total = 0.0
         for (cid, doc_date), amount in groups.items():
             src_curr = currencies.get(cid, target_currency)
-            total += amount if src_curr == target_currency else src_curr._convert(
-                amount, target_currency, company, doc_date)
+            total += self._convert_amount(amount, src_curr, target_currency, doc_date)
         return total
 
     def _get_stock_valuation_bulk(self, stock_moves):
@@ -924,6 +989,220 @@ class ProjectProfitabilityReport(models.TransientModel):
             result[layer.stock_move_id.id] += abs(layer.value)
         return result
 
+    # =========================================================================
+    # SECCIÓN: MOTOR SQL DE RENTABILIDAD
+    # Cada sección se resuelve con UNA query agrupada que devuelve tuplas
+    # (currency_id, fecha, monto); la conversión de moneda se hace por grupo.
+    # Los costos se leen del libro project.cost.ledger filtrado por los ids
+    # de cada fuente del análisis.
+    # Si algún campo necesario no está almacenado, o el parámetro
+    # project_modificaciones.profitability_sql_engine vale '0', se usa el
+    # cálculo con recordsets (_get_profitability_data).
+    # =========================================================================
+
+    def _use_profitability_sql_engine(self):
+        """True si el motor SQL está habilitado y los campos que lee están almacenados."""
+        param = self.env['ir.config_parameter'].sudo().get_param(
+            'project_modificaciones.profitability_sql_engine', '1')
+        if param == '0':
+            return False
+        if 'stock.valuation.layer' not in self.env:
+            return False
+        required = {
+            'sale.order.line': ['price_subtotal', 'price_unit', 'qty_to_invoice', 'currency_id'],
+            'purchase.order.line': ['price_subtotal', 'price_unit', 'qty_invoiced',
+                                    'qty_received', 'currency_id'],
+            'stock.move': ['purchase_line_id', 'price_unit', 'quantity'],
+            'stock.valuation.layer': ['account_move_id', 'value'],
+            'account.analytic.line': ['amount', 'currency_id'],
+            'hr.expense': ['currency_id'],
+        }
+        for model_name, fnames in required.items():
+            model_fields = self.env[model_name]._fields
+            if not all(f in model_fields and model_fields[f].store for f in fnames):
+                return False
+        amount_field = self._get_expense_amount_field()
+        return bool(amount_field and self.env['hr.expense']._fields[amount_field].store)
+
+    def _profitability_subquery(self, model_name, domain):
+        """Sub-select SQL con los ids que cumplen el dominio (sin cargar registros)."""
+        return self.env[model_name].sudo()._search(domain).subselect()
+
+    def _convert_currency_rows(self, rows, target_currency, missing_currency=None):
+        """
+        Convierte tuplas (currency_id, fecha, monto) a target_currency con una
+        conversión por par (moneda, fecha), igual que _convert_grouped_by_currency.
+        Sin moneda se asume missing_currency (por defecto la de la compañía).
+        """
+        missing_currency = missing_currency or self.env.company.currency_id
+        today = fields.Date.context_today(self)
+        groups = defaultdict(float)
+        for currency_id, doc_date, amount in rows:
+            if amount:
+                groups[(currency_id or missing_currency.id, doc_date or today)] += amount
+
+        currencies = {
+            c.id: c for c in self.env['res.currency'].browse(
+                list({cid for cid, _ in groups})
+            )
+        }
+        self._get_rate_matrix().preload(list(groups) + [(target_currency, None)])
+
+        total = 0.0
+        for (cid, doc_date), amount in groups.items():
+            src_curr = currencies.get(cid, target_currency)
+            total += self._convert_amount(amount, src_curr, target_currency, doc_date)
+        return total
+
+    def _get_income_data_sql(self, sol_sub, date_from, date_to, target_currency):
+        """Ingreso esperado, facturado y por facturar; devuelve una tupla de 3 montos."""
+        cr = self.env.cr
+        cr.execute(SQL("""
+            SELECT sol.currency_id, so.date_order::date,
+                   SUM(COALESCE(sol.price_subtotal, 0)),
+                   SUM(CASE WHEN sol.qty_to_invoice > 0
+                            THEN sol.qty_to_invoice * COALESCE(sol.price_unit, 0)
+                            ELSE 0 END)
+              FROM sale_order_line sol
+              JOIN sale_order so ON so.id = sol.order_id
+             WHERE sol.id IN %s
+          GROUP BY sol.currency_id, so.date_order::date
+        """, sol_sub))
+        rows = cr.fetchall()
+        expected = self._convert_currency_rows(
+            [(cid, d, amount) for cid, d, amount, _to_inv in rows], target_currency)
+        to_invoice = self._convert_currency_rows(
+            [(cid, d, to_inv) for cid, d, _amount, to_inv in rows], target_currency,
+            missing_currency=target_currency)
+
+        date_conditions = [SQL("am.state = 'posted'")]
+        if date_from:
+            date_conditions.append(SQL("am.invoice_date >= %s", date_from))
+        if date_to:
+            date_conditions.append(SQL("am.invoice_date <= %s", date_to))
+        cr.execute(SQL("""
+            SELECT aml.currency_id, am.invoice_date, SUM(COALESCE(aml.price_subtotal, 0))
+              FROM account_move_line aml
+              JOIN account_move am ON am.id = aml.move_id
+             WHERE aml.id IN (
+                       SELECT rel.invoice_line_id
+                         FROM sale_order_line_invoice_rel rel
+                        WHERE rel.order_line_id IN %s)
+               AND %s
+          GROUP BY aml.currency_id, am.invoice_date
+        """, sol_sub, SQL(" AND ").join(date_conditions)))
+        invoiced = self._convert_currency_rows(cr.fetchall(), target_currency)
+        return expected, invoiced, to_invoice
+
+    def _get_cost_sources(self, all_tasks, projects):
+        """{modelo fuente: sub-select de ids} de los costos del análisis."""
+        domains = {
+            'hr.expense': self._get_expense_domain(all_tasks, projects),
+            'purchase.order.line': self._get_purchase_order_line_domain(all_tasks, projects),
+            'stock.move': self._get_stock_move_domain(all_tasks, projects),
+            'account.analytic.line': self._get_timesheet_domain(all_tasks, projects),
+        }
+        return {
+            model_name: self._profitability_subquery(model_name, domain)
+            for model_name, domain in domains.items() if domain is not None
+        }
+
+    def _get_ledger_costs(self, sources, target_currency):
+        """
+        Costos por (fuente, estado) desde project.cost.ledger con UNA consulta
+        agrupada; cada grupo (moneda de la compañía, fecha) se convierte a
+        target_currency. Retorna un defaultdict(float).
+        """
+        grouped = defaultdict(list)
+        for source_model, bucket, currency_id, doc_date, amount in \
+                self.env['project.cost.ledger']._get_source_rows(sources):
+            grouped[(source_model, bucket)].append((currency_id, doc_date, amount))
+        costs = defaultdict(float)
+        for key, rows in grouped.items():
+            costs[key] = self._convert_currency_rows(rows, target_currency)
+        return costs
+
+    def _get_profitability_data_sql(self, projects, date_from, date_to, all_tasks):
+        """
+        Equivalente agregado de _get_profitability_data: mismas claves, sin
+        cargar recordsets. Retorna None si el motor SQL no aplica.
+        """
+        self.ensure_one()
+        if not self._use_profitability_sql_engine():
+            return None
+        if not projects:
+            return self._get_profitability_data(projects, date_from, date_to)
+
+        target_currency = self.currency_id
+        sol_domain = self._get_sale_order_line_domain(all_tasks, projects)
+
+        expected = invoiced = to_invoice = 0.0
+        if sol_domain is not None:
+            expected, invoiced, to_invoice = self._get_income_data_sql(
+                self._profitability_subquery('sale.order.line', sol_domain),
+                date_from, date_to, target_currency)
+
+        # Costos: una sola agregación sobre el libro de costos por tarea
+        costs = self._get_ledger_costs(
+            self._get_cost_sources(all_tasks, projects), target_currency)
+        exp_billed = costs[('hr.expense', 'billed')]
+        exp_to_bill = costs[('hr.expense', 'to_bill')]
+        p_billed = costs[('purchase.order.line', 'billed')]
+        p_to_bill = costs[('purchase.order.line', 'to_bill')]
+        total_purchases = p_billed + p_to_bill + costs[('purchase.order.line', 'committed')]
+        stock_billed = costs[('stock.move', 'billed')]
+        stock_to_bill = costs[('stock.move', 'to_bill')]
+        timesheet_cost = costs[('account.analytic.line', 'billed')]
+
+        return self._assemble_profitability_data(
+            expected, invoiced, to_invoice,
+            exp_billed, exp_to_bill,
+            p_billed, p_to_bill, total_purchases,
+            stock_billed, stock_to_bill, timesheet_cost,
+        )
+
+    def _get_financial_counts_sql(self, all_tasks, projects):
+        """KPIs de conteo del análisis con consultas agrupadas, sin cargar recordsets."""
+        self.ensure_one()
+        counts = {
+            'sale_order_count': 0, 'purchase_count': 0, 'expense_count': 0,
+            'stock_move_count': 0, 'timesheet_hours': 0.0, 'invoice_count': 0,
+        }
+        sol_domain = self._get_sale_order_line_domain(all_tasks, projects)
+        if sol_domain is not None:
+            SaleLine = self.env['sale.order.line'].sudo()
+            [(counts['sale_order_count'],)] = SaleLine._read_group(
+                sol_domain, [], ['order_id:count_distinct'])
+            self.env.cr.execute(SQL("""
+                SELECT COUNT(DISTINCT am.id)
+                  FROM sale_order_line_invoice_rel rel
+                  JOIN sale_order_line line ON line.id = rel.order_line_id
+                  JOIN account_move_line aml ON aml.id = rel.invoice_line_id
+                  JOIN account_move am ON am.id = aml.move_id
+                 WHERE am.move_type = 'out_invoice'
+                   AND line.order_id IN (SELECT order_id FROM sale_order_line WHERE id IN %s)
+            """, self._profitability_subquery('sale.order.line', sol_domain)))
+            counts['invoice_count'] = self.env.cr.fetchone()[0]
+
+        pol_domain = self._get_purchase_order_line_domain(all_tasks, projects)
+        if pol_domain is not None:
+            [(counts['purchase_count'],)] = self.env['purchase.order.line'].sudo()._read_group(
+                pol_domain, [], ['order_id:count_distinct'])
+
+        counts['expense_count'] = self.env['hr.expense'].sudo().search_count(
+            self._get_expense_domain(all_tasks, projects))
+
+        move_domain = self._get_stock_move_domain(all_tasks, projects)
+        if move_domain is not None:
+            counts['stock_move_count'] = self.env['stock.move'].sudo().search_count(move_domain)
+
+        timesheet_domain = self._get_timesheet_domain(all_tasks, projects)
+        if timesheet_domain is not None:
+            [(hours,)] = self.env['account.analytic.line'].sudo()._read_group(
+                timesheet_domain, [], ['unit_amount:sum'])
+            counts['timesheet_hours'] = hours or 0.0
+        return counts
+
     # =========================================================================
     # SECCIÓN: CÁLCULO DE RENTABILIDAD
     # =========================================================================
@@ -953,7 +1232,6 @@ class ProjectProfitabilityReport(models.TransientModel):
 
         target_currency = self.currency_id
         company_currency = self.env.company.currency_id
-        company = self.env.company
 
         def convert(amount, src_curr, date):
             return self._convert_amount(amount, src_curr, target_currency, date)
@@ -1005,8 +1283,7 @@ class ProjectProfitabilityReport(models.TransientModel):
         }
         for (cid, doc_date), amount in to_inv_groups.items():
             src_curr = currencies_cache.get(cid, target_currency)
-            to_invoice += amount if src_curr == target_currency else src_curr._convert(
-                amount, target_currency, company, doc_date)
+            to_invoice += self._convert_amount(amount, src_curr, target_currency, doc_date)
 
         # ── B. GASTOS ─────────────────────────────────────────────────────────
         if _expenses is not None:
@@ -1058,7 +1335,6 @@ class ProjectProfitabilityReport(models.TransientModel):
             exp_billed, _expense_amount, lambda e: e.date, target_currency)
         exp_to_bill_total = self._convert_grouped_by_currency(
             exp_to_bill, _expense_amount, lambda e: e.date, target_currency)
-        total_expenses = exp_billed_total + exp_to_bill_total
 
         # ── C. COMPRAS ────────────────────────────────────────────────────────
         purchase_lines = _purchase_lines if _purchase_lines is not None else self._get_purchase_order_lines()
@@ -1098,17 +1374,13 @@ class ProjectProfitabilityReport(models.TransientModel):
             total = 0.0
             for (cid, doc_date), amount in groups.items():
                 src = pur_currencies.get(cid, target_currency)
-                total += (amount if src == target_currency
-                          else src._convert(amount, target_currency, company, doc_date))
+                total += self._convert_amount(amount, src, target_currency, doc_date)
             return total
 
         p_billed = _conv_groups(p_billed_groups)
         p_to_bill_pur = _conv_groups(p_to_bill_groups)
         total_purchases = _conv_groups(p_total_groups)
 
-        p_incurred = p_billed + p_to_bill_pur
-        p_committed = total_purchases - p_incurred
-
         # ── D. STOCK ─────────────────────────────────────────────────────────
         stock_moves = _stock_moves if _stock_moves is not None else self._get_stock_moves()
         valid_moves = self._filter_non_purchase_moves(stock_moves)
@@ -1182,7 +1454,6 @@ class ProjectProfitabilityReport(models.TransientModel):
             - sum(convert(v, company_currency, d)
                   for d, v in stock_to_bill_in.items())
         )
-        stock_cost = stock_billed_val + stock_to_bill_val
 
         # ── E. MANO DE OBRA ──────────────────────────────────────────────────
         timesheets = _timesheets if _timesheets is not None else self._get_timesheets()
@@ -1193,6 +1464,26 @@ class ProjectProfitabilityReport(models.TransientModel):
             date_getter=lambda ts: ts.date,
             target_currency=target_currency,
         )
+
+        return self._assemble_profitability_data(
+            expected, invoiced, to_invoice,
+            exp_billed_total, exp_to_bill_total,
+            p_billed, p_to_bill_pur, total_purchases,
+            stock_billed_val, stock_to_bill_val, timesheet_cost,
+        )
+
+    def _assemble_profitability_data(self, expected, invoiced, to_invoice,
+                                     exp_billed_total, exp_to_bill_total,
+                                     p_billed, p_to_bill_pur, total_purchases,
+                                     stock_billed_val, stock_to_bill_val, timesheet_cost):
+        """
+        Arma el diccionario de rentabilidad a partir de los montos por sección.
+        Compartido por el cálculo con recordsets y por el motor SQL.
+        """
+        total_expenses = exp_billed_total + exp_to_bill_total
+        p_incurred = p_billed + p_to_bill_pur
+        p_committed = total_purchases - p_incurred
+        stock_cost = stock_billed_val + stock_to_bill_val
         ts_billed_cost = timesheet_cost
         ts_to_bill_cost = 0.0
 
@@ -1266,124 +1557,236 @@ class ProjectProfitabilityReport(models.TransientModel):
         'project_ids', 'filter_type', 'task_ids', 'task_state_filter',
         'date_filter_type', 'date_from', 'date_to', 'include_archived',
         'ubicacion_ids', 'partner_filter_ids',
-        'include_analytic_account',
+        'include_analytic_account', 'currency_id',
     )
     def _compute_financials(self):
         """
-        Ejecuta todas las queries financieras UNA sola vez y asigna los campos
-        monetarios, KPIs de conteo, avances físicos y requisiciones.
+        Asigna los campos monetarios, KPIs de conteo, avances físicos y
+        requisiciones desde el snapshot persistente de los filtros actuales.
+        Si no hay snapshot vigente (o se fuerza con el contexto
+        profitability_force_refresh) ejecuta las queries y lo guarda; en un
+        onchange (registro sin guardar) solo calcula, sin escribir snapshots.
         NO renderiza HTML ni prepara datos de tablas de detalle.
         Se dispara solo cuando cambian filtros de datos — nunca por chart_type
         ni show_detail_* (Fix Problema 2).
         """
+        Snapshot = self.env['project.profitability.snapshot']
+        force = self.env.context.get('profitability_force_refresh')
         for wizard in self:
             # — 1. Contexto base —
             tasks = wizard._get_filtered_tasks()
             all_tasks = tasks | tasks.mapped('child_ids')
             projects = wizard._get_filtered_projects()
 
-            # — 2. Recordsets UNA sola vez — cada getter ejecuta 1 query
-            sols = wizard._get_sale_order_lines(all_tasks, projects)
-            purchase_lines = wizard._get_purchase_order_lines(
-                all_tasks, projects)
-            stock_moves = wizard._get_stock_moves(all_tasks, projects)
-            timesheets = wizard._get_timesheets(all_tasks, projects)
-            comp_lines = wizard._get_compensations(all_tasks, projects)
-            exp_domain = wizard._get_expense_domain(all_tasks, projects)
-            expenses = wizard.env['hr.expense'].sudo().search(exp_domain)
-
-            # — 3. Rentabilidad — usa los recordsets ya obtenidos (0 queries nuevas)
-            data = wizard._get_profitability_data(
-                projects, wizard.date_from, wizard.date_to,
-                _sols=sols, _purchase_lines=purchase_lines,
-                _stock_moves=stock_moves, _timesheets=timesheets,
-                _expenses=expenses,
-            )
+            # — 2. Snapshot — clave de filtros + huella de las fuentes en alcance
+            key = Snapshot._make_key(
+                wizard._get_snapshot_filters(projects, all_tasks))
+            fingerprint = Snapshot._make_fingerprint(
+                wizard._get_snapshot_sources(all_tasks, projects))
+            snapshot = Snapshot if force else Snapshot._get_valid(key, fingerprint)
+            if not snapshot:
+                values = wizard._get_financials_values(tasks, all_tasks, projects)
+                if not isinstance(wizard.id, int):
+                    wizard.update(values)
+                    wizard.snapshot_date = False
+                    continue
+                snapshot = Snapshot._store(
+                    key, fingerprint, values, wizard.currency_id)
+
+            wizard.update(snapshot.values)
+            wizard.snapshot_date = snapshot.computed_at
+
+    def _get_snapshot_filters(self, projects, all_tasks):
+        """Filtros normalizados que identifican el snapshot de rentabilidad."""
+        self.ensure_one()
+        dated = self.date_filter_type != 'none'
+        return {
+            'company': self.env.company.id,
+            'currency': self.currency_id.id,
+            'projects': sorted(projects.ids),
+            'tasks': sorted(all_tasks.ids),
+            'filter_type': self.filter_type,
+            'task_state_filter': self.task_state_filter,
+            'include_archived': self.include_archived,
+            'include_analytic_account': self.include_analytic_account,
+            'date_from': self.date_from if dated else None,
+            'date_to': self.date_to if dated else None,
+        }
 
-            wizard.expected_income = data['expected_income']
-            wizard.invoiced_income = data['invoiced_income']
-            wizard.to_invoice_income = data['to_invoice_income']
-            wizard.total_expenses = data['total_expenses']
-            wizard.expenses_billed = data['expenses_billed']
-            wizard.expenses_to_bill = data['expenses_to_bill']
-            wizard.total_purchases = data['total_purchases']
-            wizard.purchases_billed = data['purchases_billed']
-            wizard.purchases_to_bill = data['purchases_to_bill']
-            wizard.purchase_cost_incurred = data['purchase_incurred']
-            wizard.purchase_committed = data['purchase_committed']
-            wizard.total_stock_moves = data['total_stock_moves']
-            wizard.stock_billed = data['stock_billed']
-            wizard.stock_to_bill = data['stock_to_bill']
-            wizard.timesheet_cost = data['timesheet_cost']
-            wizard.timesheet_billed = data['timesheet_billed']
-            wizard.timesheet_to_bill = data['timesheet_to_bill']
-            wizard.margin_total = data['margin_total']
-            wizard.profit_percentage = data['profit_percentage']
-            wizard.margin_billed = data['margin_billed']
-            wizard.margin_billed_pct = data['margin_billed_pct']
-            wizard.margin_to_bill = data['margin_to_bill']
-            wizard.margin_to_bill_pct = data['margin_to_bill_pct']
-
-            # — 4. Producción desde Avances Físicos —
-            # NOTA: sale_current es computed no-stored → se acumula en Python (1 query)
-            avance_domain = [
-                ('task_id', 'in', all_tasks.ids),
-                ('state', 'in', ['fact', 'no_fact']),
-            ]
-            if wizard.date_filter_type != 'none':
-                if wizard.date_from:
-                    avance_domain.append(('date', '>=', wizard.date_from))
-                if wizard.date_to:
-                    avance_domain.append(('date', '<=', wizard.date_to))
-
-            avances_prod = wizard.env['project.sub.update'].sudo().search(
-                avance_domain)
-            av_by_state = {'fact': 0.0, 'no_fact': 0.0}
-            for av in avances_prod:
-                av_by_state[av.state] = av_by_state.get(
-                    av.state, 0.0) + (av.sale_current or 0.0)
-            wizard.production_avances_billed = av_by_state['fact']
-            wizard.production_avances_to_bill = av_by_state['no_fact']
-            wizard.production_avances = (
-                wizard.production_avances_billed + wizard.production_avances_to_bill
-            )
+    def _get_snapshot_sources(self, all_tasks, projects):
+        """
+        Pares (modelo, dominio) cuyos registros alimentan el reporte.
+        Incluye las facturas, asientos y capas de valoración que cambian montos
+        almacenados (qty_invoiced, estado de hojas…) sin tocar la línea origen.
+        """
+        self.ensure_one()
+        sol_domain = self._get_sale_order_line_domain(all_tasks, projects)
+        pol_domain = self._get_purchase_order_line_domain(all_tasks, projects)
+        move_domain = self._get_stock_move_domain(all_tasks, projects)
+        expense_domain = self._get_expense_domain(all_tasks, projects)
+
+        def related(field_name, domain):
+            return None if domain is None else [(field_name, 'any', domain)]
+
+        sources = [
+            ('project.task', [('id', 'in', all_tasks.ids)]),
+            ('sale.order.line', sol_domain),
+            ('account.move.line', related('sale_line_ids', sol_domain)),
+            ('purchase.order.line', pol_domain),
+            ('account.move.line', related('purchase_line_id', pol_domain)),
+            ('hr.expense', expense_domain),
+            ('hr.expense.sheet', related('expense_line_ids', expense_domain)),
+            ('stock.move', move_domain),
+            ('account.analytic.line', self._get_timesheet_domain(all_tasks, projects)),
+            ('project.sub.update', [('task_id', 'in', all_tasks.ids)]),
+            ('compensation.line', self._get_compensation_domain(all_tasks, projects)),
+            ('requisition.order', self._get_requisition_line_domain()),
+        ]
+        if 'stock.valuation.layer' in self.env:
+            sources.append(
+                ('stock.valuation.layer', related('stock_move_id', move_domain)))
+        return sources
 
-            # — 5. KPIs de conteo (reutiliza recordsets ya obtenidos) —
-            wizard.task_count = len(tasks)
-            wizard.sale_order_count = len(sols.mapped('order_id'))
-            wizard.purchase_count = len(purchase_lines.mapped('order_id'))
-            wizard.expense_count = len(expenses)
-            wizard.stock_move_count = len(stock_moves)
-            wizard.timesheet_hours = sum(timesheets.mapped('unit_amount'))
-            wizard.compensation_count = len(
-                comp_lines.mapped('compensation_id'))
-            wizard.invoice_count = len(wizard._get_related_invoices_from(sols))
-
-            avance_count_domain = [('task_id', 'in', all_tasks.ids)]
-            if wizard.date_filter_type != 'none':
-                if wizard.date_from:
-                    avance_count_domain.append(
-                        ('date', '>=', wizard.date_from))
-                if wizard.date_to:
-                    avance_count_domain.append(('date', '<=', wizard.date_to))
-            wizard.avance_count = wizard.env['project.sub.update'].sudo(
-            ).search_count(avance_count_domain)
-
-            # — 6. Requisiciones —
-            req_date_field = wizard._requisition_date_field
-            req_line_domain = wizard._get_project_task_domain()
-            req_line_domain += [('requisition_product_id.state',
-                                 'not in', ['cancelled', 'new'])]
-            if wizard.date_filter_type != 'none':
-                if wizard.date_from:
-                    req_line_domain.append(
-                        ('requisition_product_id.' + req_date_field, '>=', wizard.date_from))
-                if wizard.date_to:
-                    req_line_domain.append(
-                        ('requisition_product_id.' + req_date_field, '<=', wizard.date_to))
-            req_lines = wizard.env['requisition.order'].search(req_line_domain)
-            wizard.requisition_count = len(
-                req_lines.mapped('requisition_product_id'))
+    def _get_financials_orm(self, all_tasks, projects):
+        """
+        Rentabilidad y KPIs de conteo con recordsets: respaldo del motor SQL.
+        Retorna (data, counts) con las mismas claves que
+        _get_profitability_data_sql y _get_financial_counts_sql.
+        """
+        self.ensure_one()
+        # Recordsets UNA sola vez — cada getter ejecuta 1 query
+        sols = self._get_sale_order_lines(all_tasks, projects)
+        purchase_lines = self._get_purchase_order_lines(
+            all_tasks, projects)
+        stock_moves = self._get_stock_moves(all_tasks, projects)
+        timesheets = self._get_timesheets(all_tasks, projects)
+        exp_domain = self._get_expense_domain(all_tasks, projects)
+        expenses = self.env['hr.expense'].sudo().search(exp_domain)
+
+        data = self._get_profitability_data(
+            projects, self.date_from, self.date_to,
+            _sols=sols, _purchase_lines=purchase_lines,
+            _stock_moves=stock_moves, _timesheets=timesheets,
+            _expenses=expenses,
+        )
+        counts = {
+            'sale_order_count': len(sols.mapped('order_id')),
+            'purchase_count': len(purchase_lines.mapped('order_id')),
+            'expense_count': len(expenses),
+            'stock_move_count': len(stock_moves),
+            'timesheet_hours': sum(timesheets.mapped('unit_amount')),
+            'invoice_count': len(self._get_related_invoices_from(sols)),
+        }
+        return data, counts
+
+    def _get_financials_values(self, tasks, all_tasks, projects):
+        """
+        Ejecuta todas las queries financieras UNA sola vez.
+        Retorna {campo: valor} con todo lo que asigna _compute_financials.
+        """
+        self.ensure_one()
+        comp_lines = self._get_compensations(all_tasks, projects)
+
+        # — Rentabilidad — motor SQL agregado; si no aplica, recordsets
+        data = self._get_profitability_data_sql(
+            projects, self.date_from, self.date_to, all_tasks)
+        if data is not None:
+            counts = self._get_financial_counts_sql(all_tasks, projects)
+        else:
+            data, counts = self._get_financials_orm(all_tasks, projects)
+
+        values = {
+            'expected_income': data['expected_income'],
+            'invoiced_income': data['invoiced_income'],
+            'to_invoice_income': data['to_invoice_income'],
+            'total_expenses': data['total_expenses'],
+            'expenses_billed': data['expenses_billed'],
+            'expenses_to_bill': data['expenses_to_bill'],
+            'total_purchases': data['total_purchases'],
+            'purchases_billed': data['purchases_billed'],
+            'purchases_to_bill': data['purchases_to_bill'],
+            'purchase_cost_incurred': data['purchase_incurred'],
+            'purchase_committed': data['purchase_committed'],
+            'total_stock_moves': data['total_stock_moves'],
+            'stock_billed': data['stock_billed'],
+            'stock_to_bill': data['stock_to_bill'],
+            'timesheet_cost': data['timesheet_cost'],
+            'timesheet_billed': data['timesheet_billed'],
+            'timesheet_to_bill': data['timesheet_to_bill'],
+            'margin_total': data['margin_total'],
+            'profit_percentage': data['profit_percentage'],
+            'margin_billed': data['margin_billed'],
+            'margin_billed_pct': data['margin_billed_pct'],
+            'margin_to_bill': data['margin_to_bill'],
+            'margin_to_bill_pct': data['margin_to_bill_pct'],
+        }
+
+        # — Producción desde Avances Físicos —
+        # NOTA: sale_current es computed no-stored → se acumula en Python (1 query)
+        avance_domain = [
+            ('task_id', 'in', all_tasks.ids),
+            ('state', 'in', ['fact', 'no_fact']),
+        ]
+        if self.date_filter_type != 'none':
+            if self.date_from:
+                avance_domain.append(('date', '>=', self.date_from))
+            if self.date_to:
+                avance_domain.append(('date', '<=', self.date_to))
+
+        avances_prod = self.env['project.sub.update'].sudo().search(
+            avance_domain)
+        av_by_state = {'fact': 0.0, 'no_fact': 0.0}
+        for av in avances_prod:
+            av_by_state[av.state] = av_by_state.get(
+                av.state, 0.0) + (av.sale_current or 0.0)
+        values['production_avances_billed'] = av_by_state['fact']
+        values['production_avances_to_bill'] = av_by_state['no_fact']
+        values['production_avances'] = av_by_state['fact'] + av_by_state['no_fact']
+
+        # — KPIs de conteo —
+        values.update({
+            'task_count': len(tasks),
+            'sale_order_count': counts['sale_order_count'],
+            'purchase_count': counts['purchase_count'],
+            'expense_count': counts['expense_count'],
+            'stock_move_count': counts['stock_move_count'],
+            'timesheet_hours': counts['timesheet_hours'],
+            'compensation_count': len(comp_lines.mapped('compensation_id')),
+            'invoice_count': counts['invoice_count'],
+        })
+
+        avance_count_domain = [('task_id', 'in', all_tasks.ids)]
+        if self.date_filter_type != 'none':
+            if self.date_from:
+                avance_count_domain.append(
+                    ('date', '>=', self.date_from))
+            if self.date_to:
+                avance_count_domain.append(('date', '<=', self.date_to))
+        values['avance_count'] = self.env['project.sub.update'].sudo(
+        ).search_count(avance_count_domain)
+
+        # — Requisiciones —
+        req_lines = self.env['requisition.order'].search(
+            self._get_requisition_line_domain())
+        values['requisition_count'] = len(
+            req_lines.mapped('requisition_product_id'))
+        return values
+
+    def _get_requisition_line_domain(self):
+        """Dominio de las líneas de requisición vigentes del análisis."""
+        self.ensure_one()
+        req_date_field = self._requisition_date_field
+        req_line_domain = self._get_project_task_domain()
+        req_line_domain += [('requisition_product_id.state',
+                             'not in', ['cancelled', 'new'])]
+        if self.date_filter_type != 'none':
+            if self.date_from:
+                req_line_domain.append(
+                    ('requisition_product_id.' + req_date_field, '>=', self.date_from))
+            if self.date_to:
+                req_line_domain.append(
+                    ('requisition_product_id.' + req_date_field, '<=', self.date_to))
+        return req_line_domain
 
     # =========================================================================
     # SECCIÓN: LÓGICA DE GASTOS (EXPENSES)
@@ -1437,72 +1840,35 @@ class ProjectProfitabilityReport(models.TransientModel):
 
     # =========================================================================
     # SECCIÓN: COMPUTE CONTENT — solo render HTML (Fix Problemas 1 y 2)
-    # @api.depends incluye chart_type y show_detail_* pero NO ejecuta queries
-    # financieras: lee los campos ya asignados por _compute_financials.
+    # @api.depends incluye chart_type pero NO ejecuta queries financieras:
+    # lee los campos ya asignados por _compute_financials.
     # Cuando chart_type != 'line', line_chart_svg = Markup('') sin queries extra
-    # (Fix Problema 1). Cuando show_detail_* = True, carga solo esa tabla
-    # sin re-ejecutar el cálculo financiero completo (Fix Problema 2).
+    # (Fix Problema 1). Las tablas de detalle no forman parte del HTML: el
+    # widget profitability_detail_tables las pide por página (get_detail_page).
     # =========================================================================
 
     @api.depends(
         'project_ids', 'filter_type', 'task_ids', 'task_state_filter',
         'date_filter_type', 'date_from', 'date_to', 'include_archived',
         'ubicacion_ids', 'partner_filter_ids',
-        'include_analytic_account', 'chart_type',
-        'show_detail_purchases', 'show_detail_expenses',
-        'show_detail_stock', 'show_detail_timesheets',
+        'include_analytic_account', 'chart_type', 'line_chart_granularity',
     )
     def _compute_content(self):
         """
         Solo renderiza el HTML del dashboard y genera el SVG si aplica.
         Lee los campos financieros ya calculados por _compute_financials — sin
         ejecutar las queries pesadas de nuevo.
-        Las tablas de detalle solo se cargan cuando el flag correspondiente está activo.
         """
         for wizard in self:
             tasks = wizard._get_filtered_tasks()
             all_tasks = tasks | tasks.mapped('child_ids')
             projects = wizard._get_filtered_projects()
 
-            # — Tablas de detalle: lazy loading real (Fix Problema 2) —
-            # Cada tabla solo carga sus datos cuando el flag está activo.
-            # Si el flag es False, la lista queda vacía y no se ejecutan queries.
-            purchases_list = []
-            if wizard.show_detail_purchases:
-                pl = wizard._get_purchase_order_lines(all_tasks, projects)
-                purchases_list = wizard._prepare_purchase_display_data(pl)
-
-            expenses_list = []
-            if wizard.show_detail_expenses:
-                exp_domain = wizard._get_expense_domain(all_tasks, projects)
-                exps = wizard.env['hr.expense'].sudo().search(exp_domain)
-                expenses_list = wizard._prepare_expense_display_data(
-                    all_tasks, expenses=exps)
-
-            stock_moves_list = []
-            if wizard.show_detail_stock:
-                sm = wizard._get_stock_moves(all_tasks, projects)
-                stock_moves_list = wizard._prepare_stock_display_data(sm)
-
-            timesheets_list = []
-            if wizard.show_detail_timesheets:
-                ts = wizard._get_timesheets(all_tasks, projects)
-                timesheets_list = wizard._prepare_timesheet_display_data(ts)
-
             # — SVG de línea: Fix Problema 1 —
             # Solo se generan las queries del SVG cuando chart_type == 'line'.
             # En cualquier otro tipo de gráfico, line_chart_svg = Markup('') sin queries.
             if wizard.chart_type == 'line':
-                _sols = wizard._get_sale_order_lines(all_tasks, projects)
-                _pur = wizard._get_purchase_order_lines(all_tasks, projects)
-                _stock = wizard._get_stock_moves(all_tasks, projects)
-                _ts = wizard._get_timesheets(all_tasks, projects)
-                _exp = wizard.env['hr.expense'].sudo().search(
-                    wizard._get_expense_domain(all_tasks, projects))
-                line_svg = wizard._generate_line_chart_svg(
-                    all_tasks, sols=_sols, timesheets=_ts,
-                    expenses=_exp, purchase_lines=_pur, stock_moves=_stock,
-                )
+                line_svg = wizard._generate_line_chart_svg(all_tasks, projects)
             else:
                 line_svg = Markup('')
 
@@ -1510,11 +1876,7 @@ class ProjectProfitabilityReport(models.TransientModel):
 
             # — Construir values leyendo campos financieros del wizard (0 queries pesadas) —
             values = {
-                'wizard':           wizard,
-                'purchases_list':   purchases_list,
-                'expenses_list':    expenses_list,
-                'stock_moves_list': stock_moves_list,
-                'timesheets_list':  timesheets_list,
+                'chart_type':       wizard.chart_type,
                 'chart_data':       wizard._prepare_pie_chart_data(),
                 'column_data':      wizard._prepare_waterfall_data(),
                 'line_chart_svg':   line_svg,
@@ -1591,8 +1953,8 @@ class ProjectProfitabilityReport(models.TransientModel):
                 'format_percentage': lambda v: f"{v:.2f}%",
             }
 
-            wizard.content = self.env['ir.qweb']._render(
-                'project_modificaciones.project_profitability_template', values)
+            wizard.content = self.env['ir.qweb']._render_fragment(
+                'project_modificaciones.project_profitability_template', values, wizard.currency_id)
 
     # — _compute_master: alias que llama a ambos en orden (compatibilidad) ────
 
@@ -1616,39 +1978,249 @@ class ProjectProfitabilityReport(models.TransientModel):
         return self._compute_master()
 
     # =========================================================================
-    # SECCIÓN: ACCIONES DE LAZY-LOAD
+    # SECCIÓN: TABLAS DE DETALLE PAGINADAS (JSON-RPC)
+    # El widget profitability_detail_tables pide cada página con
+    # get_detail_page; el HTML de "content" ya no incluye las tablas.
     # =========================================================================
 
-    def action_load_all_details(self):
-        """Activa todos los flags de detalle en un solo round-trip."""
-        self.ensure_one()
-        self.show_detail_purchases = True
-        self.show_detail_expenses = True
-        self.show_detail_stock = True
-        self.show_detail_timesheets = True
-
-    def action_load_detail_purchases(self):
-        self.ensure_one()
-        self.show_detail_purchases = True
+    _DETAIL_PAGE_LIMIT = 50
+    _DETAIL_PAGE_MAX_LIMIT = 500
 
-    def action_load_detail_expenses(self):
+    def _get_detail_section_specs(self, all_tasks, projects):
+        """
+        Configuración de cada tabla de detalle: modelo, dominio, columnas,
+        columnas ordenables (clave → campo), campos de búsqueda y serializador.
+        """
         self.ensure_one()
-        self.show_detail_expenses = True
+        expense_amount = self._get_expense_amount_field() or 'total_amount'
+        move_domain = self._get_stock_move_domain(all_tasks, projects)
+        if move_domain is not None:
+            # Mismo criterio que _filter_non_purchase_moves: fuera lo que viene de compras
+            move_domain = expression.AND([move_domain, [('purchase_line_id', '=', False)]])
+            if 'purchase_id' in self.env['stock.picking']._fields:
+                move_domain = expression.AND([move_domain, [
+                    ('picking_id', 'not any', [('move_ids.purchase_line_id', '!=', False)]),
+                ]])
+        return {
+            'purchases': {
+                'label': _('Detalle de Compras'),
+                'icon': 'fa-shopping-cart text-success',
+                'model': 'purchase.order.line',
+                'domain': self._get_purchase_order_line_domain(all_tasks, projects),
+                'total': self.total_purchases,
+                'search_fields': ['order_id.name', 'partner_id.name', 'product_id.name', 'task_id.name'],
+                'default_order': 'date desc',
+                'prepare': lambda records: self._prepare_purchase_display_data(
+                    records, keep_order=True),
+                'columns': [
+                    {'key': 'order_name', 'label': _('Pedido'), 'sort': 'order_id', 'url': lambda r: (
+                        f"/web#id={r['order_id']}&model=purchase.order&view_type=form")},
+                    {'key': 'date', 'label': _('Fecha'), 'type': 'date', 'sort': 'create_date'},
+                    {'key': 'partner', 'label': _('Proveedor'), 'sort': 'partner_id'},
+                    {'key': 'project_name', 'label': _('Proyecto')},
+                    {'key': 'task_name', 'label': _('Tarea')},
+                    {'key': 'product', 'label': _('Producto'), 'sort': 'product_id'},
+                    {'key': 'state', 'label': _('Estado'), 'type': 'badge',
+                     'ok': lambda r: r['state_raw'] in ('purchase', 'done')},
+                    {'key': 'qty', 'label': _('Cant.'), 'type': 'number', 'sort': 'product_qty'},
+                    {'key': 'total', 'label': _('Total'), 'type': 'monetary', 'sort': 'price_subtotal'},
+                ],
+            },
+            'timesheets': {
+                'label': _('Detalle de Mano de Obra'),
+                'icon': 'fa-clock-o text-warning',
+                'model': 'account.analytic.line',
+                'domain': self._get_timesheet_domain(all_tasks, projects),
+                'total': self.timesheet_cost,
+                'search_fields': ['name', 'employee_id.name', 'task_id.name'],
+                'default_order': 'date desc',
+                'prepare': lambda records: self._prepare_timesheet_display_data(
+                    records, keep_order=True),
+                'columns': [
+                    {'key': 'description', 'label': _('Descripción'), 'sort': 'name',
+                     'url': lambda r: r['ts_url']},
+                    {'key': 'employee', 'label': _('Empleado'), 'sort': 'employee_id'},
+                    {'key': 'project_name', 'label': _('Proyecto')},
+                    {'key': 'task', 'label': _('Tarea')},
+                    {'key': 'date', 'label': _('Fecha'), 'type': 'date', 'sort': 'date'},
+                    {'key': 'state_label', 'label': _('Estado'), 'type': 'badge',
+                     'ok': lambda r: r['state_raw'] in ('approve', 'applied')},
+                    # El costo mostrado es -amount: el orden se invierte
+                    {'key': 'total', 'label': _('Costo'), 'type': 'monetary', 'sort': 'amount',
+                     'reverse': True},
+                ],
+            },
+            'expenses': {
+                'label': _('Detalle de Gastos'),
+                'icon': 'fa-money text-warning',
+                'model': 'hr.expense',
+                'domain': self._get_expense_domain(all_tasks, projects),
+                'total': self.total_expenses,
+                'search_fields': ['name', 'employee_id.name', 'product_id.name', 'sheet_id.name'],
+                'default_order': 'date desc',
+                'prepare': lambda records: self._prepare_expense_display_data(
+                    expenses=records, keep_order=True),
+                'columns': [
+                    {'key': 'product', 'label': _('Descripción'), 'sort': 'product_id',
+                     'url': lambda r: r['exp_url']},
+                    {'key': 'employee', 'label': _('Empleado'), 'sort': 'employee_id'},
+                    {'key': 'project_name', 'label': _('Proyecto')},
+                    {'key': 'task_name', 'label': _('Tarea')},
+                    {'key': 'date', 'label': _('Fecha'), 'type': 'date', 'sort': 'date'},
+                    {'key': 'sheet_name', 'label': _('Informe'), 'sort': 'sheet_id'},
+                    {'key': 'state', 'label': _('Estado'), 'type': 'badge',
+                     'ok': lambda r: r['state_raw'] in ('done', 'post')},
+                    {'key': 'total', 'label': _('Total'), 'type': 'monetary', 'sort': expense_amount},
+                ],
+            },
+            'stock': {
+                'label': _('Detalle de Materiales Consolidados'),
+                'icon': 'fa-cubes text-primary',
+                'model': 'stock.move',
+                'domain': move_domain,
+                'total': self.total_stock_moves,
+                'search_fields': ['reference', 'product_id.name', 'picking_id.name', 'task_id.name'],
+                'default_order': 'date desc',
+                'prepare': lambda records: self._prepare_stock_display_data(
+                    records, keep_order=True),
+                'columns': [
+                    {'key': 'state_label', 'label': _('Estado'), 'type': 'badge',
+                     'ok': lambda r: r['state_raw'] == 'done'},
+                    {'key': 'project_name', 'label': _('Proyecto')},
+                    {'key': 'task_name', 'label': _('Tarea')},
+                    {'key': 'date', 'label': _('Fecha'), 'type': 'date', 'sort': 'date'},
+                    {'key': 'picking', 'label': _('Referencia'), 'sort': 'reference',
+                     'url': lambda r: r['picking_url']},
+                    {'key': 'product_name', 'label': _('Producto'), 'sort': 'product_id'},
+                    {'key': 'locations', 'label': _('Ubicaciones'),
+                     'value': lambda r: f"{r['location_id']} → {r['location_dest_id']}"},
+                    {'key': 'quantity', 'label': _('Cant.'), 'type': 'number', 'sort': 'quantity'},
+                    {'key': 'price_unit', 'label': _('Costo Unit.'), 'type': 'monetary'},
+                    {'key': 'total_cost', 'label': _('Total'), 'type': 'monetary'},
+                ],
+            },
+        }
 
-    def action_load_detail_stock(self):
+    def _get_detail_filtered_total(self, section, model_name, domain):
+        """Total de las filas filtradas en la moneda del reporte (libro de costos); None si no aplica."""
+        if not self._use_profitability_sql_engine():
+            return None
+        costs = self._get_ledger_costs(
+            {model_name: self._profitability_subquery(model_name, domain)}, self.currency_id)
+        return sum(costs.values())
+
+    def _format_detail_cell(self, column, row):
+        """Celda serializada {'text', 'url', 'ok'} para el widget."""
+        value = column['value'](row) if 'value' in column else row.get(column['key'])
+        col_type = column.get('type')
+        if col_type == 'monetary':
+            text = format_amount(self.env, value or 0.0, self.currency_id)
+        elif col_type == 'date':
+            text = format_date(self.env, value) if value else ''
+        elif col_type == 'number':
+            text = formatLang(self.env, value or 0.0)
+        else:
+            text = value or ''
+        cell = {'text': text}
+        if 'url' in column:
+            cell['url'] = column['url'](row)
+        if 'ok' in column:
+            cell['ok'] = column['ok'](row)
+        return cell
+
+    def get_detail_sections(self):
+        """Secciones de detalle con costo, sus columnas y el total de cada una."""
         self.ensure_one()
-        self.show_detail_stock = True
+        tasks = self._get_filtered_tasks()
+        all_tasks = tasks | tasks.mapped('child_ids')
+        specs = self._get_detail_section_specs(all_tasks, self._get_filtered_projects())
+        return [
+            {
+                'key': key,
+                'label': spec['label'],
+                'icon': spec['icon'],
+                'default_order': spec['default_order'],
+                'limit': self._DETAIL_PAGE_LIMIT,
+                'total_display': format_amount(self.env, spec['total'], self.currency_id),
+                'columns': [
+                    {
+                        'key': column['key'],
+                        'label': column['label'],
+                        'type': column.get('type', 'text'),
+                        'sortable': 'sort' in column,
+                    }
+                    for column in spec['columns']
+                ],
+            }
+            for key, spec in specs.items()
+            if spec['total'] and spec['domain'] is not None
+        ]
 
-    def action_load_detail_timesheets(self):
+    def get_detail_page(self, section, offset=0, limit=None, order=None, search=None):
+        """
+        Una página de la tabla de detalle `section` con orden y filtro de texto.
+        Retorna las filas visibles, el número de filas filtradas y su total.
+        """
         self.ensure_one()
-        self.show_detail_timesheets = True
+        tasks = self._get_filtered_tasks()
+        all_tasks = tasks | tasks.mapped('child_ids')
+        specs = self._get_detail_section_specs(all_tasks, self._get_filtered_projects())
+        if section not in specs:
+            raise UserError(_("Sección de detalle desconocida: %s", section))
+        spec = specs[section]
+        limit = min(int(limit or self._DETAIL_PAGE_LIMIT), self._DETAIL_PAGE_MAX_LIMIT)
+        offset = max(int(offset or 0), 0)
+
+        # Orden: solo columnas declaradas como ordenables
+        order = order or spec['default_order']
+        key, _sep, direction = order.partition(' ')
+        direction = 'asc' if direction.strip().lower() == 'asc' else 'desc'
+        column = next((c for c in spec['columns'] if c['key'] == key), None)
+        if not column or 'sort' not in column:
+            key, direction = spec['default_order'].split(' ')
+            column = next(c for c in spec['columns'] if c['key'] == key)
+        sort_field = column['sort']
+        sort_direction = direction
+        if column.get('reverse'):
+            sort_direction = 'asc' if direction == 'desc' else 'desc'
+
+        result = {
+            'rows': [], 'count': 0, 'offset': offset, 'limit': limit,
+            'order': f"{key} {direction}", 'total_display': '',
+        }
+        if spec['domain'] is None:
+            return result
+
+        domain = spec['domain']
+        search = (search or '').strip()
+        if search:
+            domain = expression.AND([domain, expression.OR(
+                [[(fname, 'ilike', search)] for fname in spec['search_fields']])])
+
+        Model = self.env[spec['model']].sudo()
+        records = Model.search(
+            domain, offset=offset, limit=limit, order=f"{sort_field} {sort_direction}, id desc")
+        rows = spec['prepare'](records)
+
+        total = spec['total'] if not search else self._get_detail_filtered_total(
+            section, spec['model'], domain)
+        result.update({
+            'rows': [[self._format_detail_cell(c, row) for c in spec['columns']] for row in rows],
+            'count': Model.search_count(domain),
+            'total_display': format_amount(self.env, total, self.currency_id) if total is not None else '—',
+        })
+        return result
 
     # ── Sub-métodos de preparación de datos para la vista ───────────────────
 
-    def _prepare_stock_display_data(self, stock_moves=None):
-        """Prepara la lista de movimientos de stock para la vista."""
-        moves = (stock_moves if stock_moves is not None
-                 else self._get_stock_moves()).sorted('date', reverse=True)
+    def _prepare_stock_display_data(self, stock_moves=None, keep_order=False):
+        """
+        Prepara la lista de movimientos de stock para la vista.
+        Con keep_order=True respeta el orden recibido (páginas del detalle).
+        """
+        moves = stock_moves if stock_moves is not None else self._get_stock_moves()
+        if not keep_order:
+            moves = moves.sorted('date', reverse=True)
         valid_moves = self._filter_non_purchase_moves(moves)
 
         valid_moves.mapped('location_id.usage')
@@ -1715,11 +2287,13 @@ class ProjectProfitabilityReport(models.TransientModel):
             })
         return result
 
-    def _prepare_purchase_display_data(self, purchase_lines=None):
+    def _prepare_purchase_display_data(self, purchase_lines=None, keep_order=False):
         """Prepara la lista de líneas de compra para la vista."""
         target_currency = self.currency_id
         lines = (purchase_lines if purchase_lines is not None
-                 else self._get_purchase_order_lines()).sorted('create_date', reverse=True)
+                 else self._get_purchase_order_lines())
+        if not keep_order:
+            lines = lines.sorted('create_date', reverse=True)
 
         # Prefetch masivo — 1 query por relación, evita N+1
         lines.mapped('order_id.name')
@@ -1758,7 +2332,7 @@ class ProjectProfitabilityReport(models.TransientModel):
             for line in lines
         ]
 
-    def _prepare_expense_display_data(self, all_tasks=None, expenses=None):
+    def _prepare_expense_display_data(self, all_tasks=None, expenses=None, keep_order=False):
         """Prepara la lista de gastos para la vista."""
         target_currency = self.currency_id
         if expenses is None:
@@ -1768,7 +2342,7 @@ class ProjectProfitabilityReport(models.TransientModel):
             exp_domain = self._get_expense_domain(all_tasks)
             expenses = self.env['hr.expense'].sudo().search(
                 exp_domain, order='date desc')
-        else:
+        elif not keep_order:
             expenses = expenses.sorted('date', reverse=True)
 
         # Prefetch masivo para gastos — evita N+1
@@ -1812,10 +2386,11 @@ class ProjectProfitabilityReport(models.TransientModel):
             for exp in expenses
         ]
 
-    def _prepare_timesheet_display_data(self, timesheets=None):
+    def _prepare_timesheet_display_data(self, timesheets=None, keep_order=False):
         """Prepara la lista de timesheets para la vista."""
-        ts = (timesheets if timesheets is not None
-              else self._get_timesheets()).sorted('date', reverse=True)
+        ts = timesheets if timesheets is not None else self._get_timesheets()
+        if not keep_order:
+            ts = ts.sorted('date', reverse=True)
         ts.mapped('employee_id.name')
         ts.mapped('project_id.name')
         ts.mapped('task_id.name')
@@ -2053,88 +2628,131 @@ class ProjectProfitabilityReport(models.TransientModel):
             'alert_low_margin': alert_low_margin,
         }
 
-    def _generate_line_chart_svg(self, all_tasks, sols=None, timesheets=None,
-                                 expenses=None, purchase_lines=None, stock_moves=None):
+    def _get_line_chart_buckets(self, all_tasks, projects, granularity):
+        """
+        Ingresos y costos por periodo (day/week/month) con una consulta agrupada
+        para las facturas y otra sobre el libro de costos, en la moneda del reporte.
+        Retorna {inicio_del_periodo: {'income': x, 'cost': y}}.
+        Cada grupo (periodo, moneda) se convierte con la tasa del inicio del periodo.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        target_currency = self.currency_id
+        company_currency = self.env.company.currency_id
+        buckets = defaultdict(lambda: {'income': 0.0, 'cost': 0.0})
+        rows = []   # (tipo, periodo, currency_id, monto)
+
+        def bucket(column):
+            return SQL("date_trunc(%s, %s)::date", granularity, column)
+
+        sol_domain = self._get_sale_order_line_domain(all_tasks, projects)
+        if sol_domain is not None:
+            date_conditions = [SQL("am.state = 'posted'"), SQL("am.invoice_date IS NOT NULL")]
+            if self.date_filter_type != 'none':
+                if self.date_from:
+                    date_conditions.append(SQL("am.invoice_date >= %s", self.date_from))
+                if self.date_to:
+                    date_conditions.append(SQL("am.invoice_date <= %s", self.date_to))
+            cr.execute(SQL("""
+                SELECT %s, aml.currency_id, SUM(COALESCE(aml.price_subtotal, 0))
+                  FROM account_move_line aml
+                  JOIN account_move am ON am.id = aml.move_id
+                 WHERE aml.id IN (
+                           SELECT rel.invoice_line_id
+                             FROM sale_order_line_invoice_rel rel
+                            WHERE rel.order_line_id IN %s)
+                   AND %s
+              GROUP BY 1, 2
+            """, bucket(SQL("am.invoice_date")),
+                self._profitability_subquery('sale.order.line', sol_domain),
+                SQL(" AND ").join(date_conditions)))
+            rows += [('income', *row) for row in cr.fetchall()]
+
+        # Costos: una consulta sobre el libro de costos, agrupada por periodo
+        rows += [
+            ('cost', period, currency_id, amount)
+            for _source, _bucket, currency_id, period, amount
+            in self.env['project.cost.ledger']._get_source_rows(
+                self._get_cost_sources(all_tasks, projects), granularity)
+            if period
+        ]
+
+        currencies = {
+            c.id: c for c in self.env['res.currency'].browse(
+                list({cid for _k, _p, cid, _v in rows if cid}))
+        }
+        self._get_rate_matrix().preload(
+            [(cid, period) for _k, period, cid, _v in rows if cid] + [(target_currency, None)])
+        for kind, period, currency_id, amount in rows:
+            if amount:
+                buckets[period][kind] += self._convert_amount(
+                    amount, currencies.get(currency_id, company_currency), target_currency, period)
+        return buckets
+
+    def _generate_line_chart_svg(self, all_tasks, projects=None):
         """
         Genera el SVG del gráfico de evolución temporal acumulada (S-Curve).
         Retorna Markup vacío si chart_type no es 'line' o no hay datos.
-        Acepta recordsets pre-calculados para evitar queries duplicadas (Fix Problema 1).
+        Los montos se agrupan en SQL por el periodo de line_chart_granularity y
+        la serie acumulada se reduce a lo sumo al parámetro
+        project_modificaciones.line_chart_max_points (LTTB) antes de dibujarla.
+        El avance planeado y real de las tareas se lee de project.progress.snapshot.
         """
         if self.chart_type != 'line':
             return Markup('')
 
-        target_currency = self.currency_id
-        company_currency = self.env.company.currency_id
-
-        # Usar los recordsets recibidos o calcularlos si no se pasaron
-        if sols is None:
-            sols = all_tasks.mapped('sale_line_id')
-        if timesheets is None:
-            timesheets = self._get_timesheets(all_tasks)
-        if expenses is None:
-            expense_domain = self._get_expense_domain(all_tasks)
-            expenses = self.env['hr.expense'].sudo().search(expense_domain)
-        if purchase_lines is None:
-            purchase_lines = self._get_purchase_order_lines(all_tasks)
-        moves = (stock_moves if stock_moves is not None
-                 else self._get_stock_moves(all_tasks)).sorted('date', reverse=True)
-
-        date_data = defaultdict(lambda: {'income': 0.0, 'cost': 0.0})
-
-        inv_domain_line = (
-            [('move_id.state', '=', 'posted'), ('sale_line_ids', 'in', sols.ids)]
-            + self._get_date_domain('move_id.invoice_date')
-        )
-        for line in self.env['account.move.line'].search(inv_domain_line):
-            if line.move_id.invoice_date:
-                date_data[line.move_id.invoice_date]['income'] += self._convert_amount(
-                    line.price_subtotal, line.currency_id, target_currency, line.move_id.invoice_date)
-
-        for exp in expenses:
-            if exp.date:
-                date_data[exp.date]['cost'] += self._convert_amount(
-                    exp.total_amount, exp.currency_id, target_currency, exp.date)
-
-        for line in purchase_lines:
-            d = line.date_order.date() if line.date_order else False
-            if d:
-                cost = line.product_qty * line.price_unit
-                date_data[d]['cost'] += self._convert_amount(
-                    cost, line.currency_id, target_currency, line.date_order)
-
-        for move in moves:
-            d = move.date.date() if move.date else False
-            if d:
-                qty = move.quantity if move.state == 'done' else move.product_uom_qty
-                cost_native = (
-                    move.price_unit or move.product_id.standard_price) * qty
-                date_data[d]['cost'] += self._convert_amount(
-                    cost_native, company_currency, target_currency, move.date)
-
-        for al in timesheets:
-            if al.date and self._check_date(al.date):
-                date_data[al.date]['cost'] += self._convert_amount(
-                    -al.amount, al.currency_id, target_currency, al.date)
+        if projects is None:
+            projects = self._get_filtered_projects()
+        granularity = self.line_chart_granularity or 'day'
+        date_data = self._get_line_chart_buckets(all_tasks, projects, granularity)
 
         if not date_data:
             return Markup(
                 '<div class="text-center p-5 text-muted">Sin datos para el rango seleccionado</div>')
 
         sorted_dates = sorted(date_data.keys())
-        points = []
+        if granularity == 'month':
+            date_format = '%m/%Y'
+        elif sorted_dates[0].year != sorted_dates[-1].year:
+            date_format = '%d/%m/%y'
+        else:
+            date_format = '%d/%m'
+
+        progress = self.env['project.progress.snapshot']._get_series(
+            'project.task', all_tasks.ids, granularity, date_from=sorted_dates[0])
+
+        series = []
         cum_income = cum_cost = 0.0
+        last_progress = None
         for d in sorted_dates:
             val = date_data[d]
             cum_income += val['income']
             cum_cost += val['cost']
             margin = cum_income - cum_cost
-            points.append({
-                'date_str': d.strftime('%d/%m'),
+            # Periodos sin snapshot conservan el último avance conocido
+            last_progress = progress.get(d, last_progress)
+            series.append({
+                'date_str': d.strftime(date_format),
                 'income': cum_income,
                 'cost': cum_cost,
                 'margin_pct': (margin / cum_income * 100.0) if cum_income else 0.0,
+                'planned_pct': last_progress['avance_planeado'] if last_progress else None,
+                'actual_pct': last_progress['avance_actual'] if last_progress else None,
             })
 
+        # Reducción de puntos: LTTB sobre ingresos y costos, conservando la posición original
+        max_points = int(self.env['ir.config_parameter'].sudo().get_param(
+            'project_modificaciones.line_chart_max_points', 120))
+        if len(series) > max_points:
+            half = max(3, max_points // 2)
+            selected = sorted(
+                set(_lttb_indices([p['income'] for p in series], half))
+                | set(_lttb_indices([p['cost'] for p in series], half)))
+        else:
+            selected = range(len(series))
+        points = [dict(series[pos], pos=pos) for pos in selected]
+        last_pos = len(series) - 1
+
         w, h, padding = 800, 380, 50
         max_val_chart = max(max(p['income'], p['cost'])
                             for p in points) * 1.1 or 1.0
@@ -2144,7 +2762,7 @@ class ProjectProfitabilityReport(models.TransientModel):
         margin_range = max_margin - min_margin or 1.0
 
         def get_x(i):
-            return padding + i * (w - 2 * padding) / (len(points) - 1 if len(points) > 1 else 1)
+            return padding + points[i]['pos'] * (w - 2 * padding) / (last_pos or 1)
 
         def get_y(val):
             return h - padding - (val / max_val_chart) * (h - 2 * padding)
@@ -2152,7 +2770,7 @@ class ProjectProfitabilityReport(models.TransientModel):
         def get_y_pct(pct):
             return h - padding - ((pct - min_margin) / margin_range) * (h - 2 * padding)
 
-        pi_cmds, pc_cmds, pm_cmds = [], [], []
+        pi_cmds, pc_cmds, pm_cmds, pp_cmds, pa_cmds = [], [], [], [], []
         income_pts = cost_pts = margin_pts = ''
 
         for i, p in enumerate(points):
@@ -2161,6 +2779,10 @@ class ProjectProfitabilityReport(models.TransientModel):
             pi_cmds.append(f"{cmd} {cx:.1f},{get_y(p['income']):.1f}")
             pc_cmds.append(f"{cmd} {cx:.1f},{get_y(p['cost']):.1f}")
             pm_cmds.append(f"{cmd} {cx:.1f},{get_y_pct(p['margin_pct']):.1f}")
+            if p['actual_pct'] is not None:
+                cmd = "L" if pa_cmds else "M"
+                pp_cmds.append(f"{cmd} {cx:.1f},{get_y_pct(p['planned_pct']):.1f}")
+                pa_cmds.append(f"{cmd} {cx:.1f},{get_y_pct(p['actual_pct']):.1f}")
 
             income_pts += (
                 f'<circle cx="{cx:.1f}" cy="{get_y(p["income"]):.1f}" r="4" '
@@ -2181,6 +2803,16 @@ class ProjectProfitabilityReport(models.TransientModel):
         pi_str = " ".join(pi_cmds)
         pc_str = " ".join(pc_cmds)
         pm_str = " ".join(pm_cmds)
+        progress_svg = progress_legend = ''
+        if pa_cmds:
+            progress_svg = (
+                f'<path d="{" ".join(pp_cmds)}" fill="none" stroke="#6c757d" stroke-width="2" stroke-dasharray="2,4"/>'
+                f'<path d="{" ".join(pa_cmds)}" fill="none" stroke="#0d6efd" stroke-width="2"/>')
+            progress_legend = (
+                '<circle cx="20" cy="39" r="4" fill="#6c757d"/>'
+                '<text x="30" y="43" font-size="11" fill="#333" font-weight="bold">Avance Plan %</text>'
+                '<circle cx="130" cy="39" r="4" fill="#0d6efd"/>'
+                '<text x="140" y="43" font-size="11" fill="#333" font-weight="bold">Avance Real %</text>')
         y_bot = h - padding
         pi_area = f"{pi_str} L {get_x(len(points)-1):.1f},{y_bot} L {get_x(0):.1f},{y_bot} Z"
         pc_area = f"{pc_str} L {get_x(len(points)-1):.1f},{y_bot} L {get_x(0):.1f},{y_bot} Z"
@@ -2232,16 +2864,18 @@ class ProjectProfitabilityReport(models.TransientModel):
             <path d="{pi_str}" fill="none" stroke="#28a745" stroke-width="2.5" filter="url(#shadow)"/>
             <path d="{pc_str}" fill="none" stroke="#dc3545" stroke-width="2.5" filter="url(#shadow)"/>
             <path d="{pm_str}" fill="none" stroke="#ffc107" stroke-width="2.5" stroke-dasharray="5,5" filter="url(#shadow)"/>
+            {progress_svg}
             <g>{income_pts}{cost_pts}{margin_pts}</g>
             {x_ticks_svg}
             <g transform="translate({w-280},20)">
-                <rect width="250" height="30" rx="5" fill="white" fill-opacity="0.8" stroke="#dee2e6"/>
+                <rect width="250" height="{54 if progress_legend else 30}" rx="5" fill="white" fill-opacity="0.8" stroke="#dee2e6"/>
                 <circle cx="20" cy="15" r="4" fill="#28a745"/>
                 <text x="30" y="19" font-size="11" fill="#333" font-weight="bold">Ingresos</text>
                 <circle cx="90" cy="15" r="4" fill="#dc3545"/>
                 <text x="100" y="19" font-size="11" fill="#333" font-weight="bold">Costos</text>
                 <circle cx="150" cy="15" r="4" fill="#ffc107"/>
                 <text x="160" y="19" font-size="11" fill="#333" font-weight="bold">Margen %</text>
+                {progress_legend}
             </g>
         </svg>""")
 
@@ -2299,16 +2933,18 @@ class ProjectProfitabilityReport(models.TransientModel):
         self._compute_content()
         return True
 
+    def action_force_refresh(self):
+        """Ignora el snapshot en caché y recalcula desde las fuentes."""
+        self.with_context(profitability_force_refresh=True)._compute_financials()
+        self._compute_content()
+        return True
+
     # ── Setters con recalculo automático ─────────────────────────────────────
     # Cada botón type="object" en la vista dispara un ciclo completo
     # save→recompute→reload, que actualiza el campo Html "content" en Odoo 17.
 
     def _set_and_recalculate(self):
-        """Reset flags lazy-load y recalcula todo."""
-        self.show_detail_purchases = False
-        self.show_detail_expenses = False
-        self.show_detail_stock = False
-        self.show_detail_timesheets = False
+        """Recalcula todo."""
         self._compute_financials()
         self._compute_content()
         return True
@@ -2326,6 +2962,10 @@ class ProjectProfitabilityReport(models.TransientModel):
         self.chart_type = self.env.context.get('_v', self.chart_type)
         return self._set_and_recalculate()
 
+    def action_set_line_chart_granularity(self):
+        self.line_chart_granularity = self.env.context.get('_v', self.line_chart_granularity)
+        return self._set_and_recalculate()
+
     def action_set_date_filter_type(self):
         new_type = self.env.context.get('_v', self.date_filter_type)
         self.date_filter_type = new_type
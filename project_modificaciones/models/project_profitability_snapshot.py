@@ -0,0 +1,94 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+
+class ProjectProfitabilitySnapshot(models.Model):
+    """Caché persistente de los montos y KPIs del reporte de rentabilidad.
+
+    Cada registro corresponde a una combinación de filtros (clave hash). La
+    huella guarda, por cada fuente de datos en alcance, el número de registros
+    y su último write_date; si cualquiera cambia, el snapshot deja de ser válido.
+    """
+    _name = 'project.profitability.snapshot'
+    _description = 'Snapshot de Rentabilidad de Proyecto'
+    _order = 'computed_at desc, id desc'
+
+    key = fields.Char(string="Clave", required=True, index=True, readonly=True)
+    company_id = fields.Many2one('res.company', string="Compañía", readonly=True)
+    currency_id = fields.Many2one('res.currency', string="Moneda", readonly=True)
+    fingerprint = fields.Char(string="Huella de Fuentes", readonly=True)
+    values = fields.Json(string="Valores", readonly=True)
+    computed_at = fields.Datetime(string="Calculado el", readonly=True)
+
+    _sql_constraints = [
+        ('key_uniq', 'unique(key)', 'Ya existe un snapshot para esta combinación de filtros.'),
+    ]
+
+    @api.model
+    def _make_key(self, filters):
+        """Hash estable de un dict de filtros ya normalizado."""
+        payload = json.dumps(filters, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    @api.model
+    def _make_fingerprint(self, sources):
+        """Huella de las fuentes: (registros, último write_date) por cada (modelo, dominio).
+
+        Los conteos detectan borrados, que no actualizan ningún write_date.
+        """
+        parts = []
+        for model_name, domain in sources:
+            if domain is None:
+                parts.append([model_name, 0, None])
+                continue
+            [(count, last_write)] = self.env[model_name].sudo()._read_group(
+                domain, [], ['__count', 'write_date:max'])
+            parts.append([model_name, count, last_write])
+        return self._make_key(parts)
+
+    @api.model
+    def _get_valid(self, key, fingerprint):
+        """Snapshot vigente para la clave, o un recordset vacío."""
+        snapshot = self.sudo().search([('key', '=', key)], limit=1)
+        if snapshot and snapshot.fingerprint == fingerprint:
+            return snapshot
+        return self.browse()
+
+    @api.model
+    def _store(self, key, fingerprint, values, currency):
+        """
+        Crea o reemplaza el snapshot de la clave con un solo INSERT ... ON
+        CONFLICT: dos usuarios que abren el mismo reporte a la vez no chocan
+        con la restricción única de key.
+        """
+        now = fields.Datetime.now()
+        uid = self.env.uid
+        self.env.cr.execute(SQL("""
+            INSERT INTO project_profitability_snapshot
+                   (key, fingerprint, "values", computed_at, currency_id, company_id,
+                    create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (key) DO UPDATE
+               SET fingerprint = EXCLUDED.fingerprint,
+                   "values" = EXCLUDED."values",
+                   computed_at = EXCLUDED.computed_at,
+                   currency_id = EXCLUDED.currency_id,
+                   company_id = EXCLUDED.company_id,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+         RETURNING id
+        """, key, fingerprint, json.dumps(values), now, currency.id,
+            self.env.company.id, uid, now, uid, now))
+        snapshot = self.sudo().browse(self.env.cr.fetchone()[0])
+        snapshot.invalidate_recordset()
+        return snapshot
+
+    @api.autovacuum
+    def _gc_old_snapshots(self):
+        """Elimina snapshots calculados hace más de 30 días."""
+        limit_date = fields.Datetime.now() - timedelta(days=30)
+        self.sudo().search([('computed_at', '<', limit_date)]).unlink()
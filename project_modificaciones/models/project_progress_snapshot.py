@@ -0,0 +1,374 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+
+class ProjectProgressSnapshot(models.Model):
+    """Historia diaria del avance planeado, real y facturado.
+
+    Una fila por origen (tarea, servicio pendiente u orden de venta) y día con
+    los porcentajes, cantidades y montos a esa fecha. La llena un cron nocturno
+    y se puede reconstruir hacia atrás con _backfill_snapshots; las curvas y
+    tendencias leen de aquí en lugar de volver a sumar los avances.
+    """
+    _name = 'project.progress.snapshot'
+    _description = 'Snapshot Diario de Avance'
+    _order = 'date desc, id desc'
+    _rec_name = 'origin_model'
+
+    date = fields.Date(string='Fecha', required=True, index=True, readonly=True)
+    origin_model = fields.Selection([
+        ('project.task', 'Tarea'),
+        ('pending.service', 'Servicio Pendiente'),
+        ('sale.order', 'Orden de Venta'),
+    ], string='Origen', required=True, readonly=True)
+    origin_id = fields.Many2oneReference(
+        string='Registro Origen', model_field='origin_model', required=True, readonly=True)
+    company_id = fields.Many2one('res.company', string='Compañía', readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Moneda', readonly=True)
+    avance_planeado = fields.Float(string='Avance Planeado (%)', digits=(5, 2), readonly=True)
+    avance_actual = fields.Float(string='Avance Físico Real (%)', digits=(5, 2), readonly=True)
+    avance_facturado = fields.Float(string='Avance Facturado (%)', digits=(5, 2), readonly=True)
+    qty_total = fields.Float(string='Cantidad Total', readonly=True)
+    qty_done = fields.Float(string='Cantidad Avanzada', readonly=True)
+    qty_invoiced = fields.Float(string='Cantidad Facturada', readonly=True)
+    amount_total = fields.Monetary(string='Monto Total', readonly=True)
+    amount_done = fields.Monetary(string='Monto Avanzado', readonly=True)
+    amount_invoiced = fields.Monetary(string='Monto Facturado', readonly=True)
+
+    _sql_constraints = [
+        ('origin_date_uniq', 'unique(origin_model, origin_id, date)',
+         'Ya existe un snapshot de este origen para la fecha.'),
+    ]
+
+    # -------------------------------------------------------------------------
+    # ORÍGENES
+    # -------------------------------------------------------------------------
+
+    def _get_origin_sql(self, origin_model):
+        """
+        Consultas de un origen: (origins, avances).
+
+        origins: origin_id, company_id, currency_id, start_date, end_date,
+        qty_total, amount_total, since (primer día con snapshot).
+        avances: origin_id, date, datefact, state, unit_progress, price_unit.
+        Las reglas son las de los cómputos de avance de cada modelo.
+        """
+        if origin_model == 'project.task':
+            origins = """
+                SELECT pt.id AS origin_id,
+                       pt.company_id,
+                       COALESCE(sol.currency_id, rc.currency_id) AS currency_id,
+                       pt.planned_date_begin::date AS start_date,
+                       pt.date_deadline::date AS end_date,
+                       CASE WHEN pt.sale_line_id IS NOT NULL
+                            THEN COALESCE(sol.product_uom_qty, 0.0)
+                            ELSE COALESCE(pt.piezas_pendientes, 0.0)
+                       END AS qty_total,
+                       CASE WHEN pt.sale_line_id IS NOT NULL
+                            THEN COALESCE(sol.price_subtotal, 0.0)
+                            ELSE COALESCE(psl.total, 0.0)
+                       END AS amount_total,
+                       pt.create_date::date AS since
+                  FROM project_task pt
+                  JOIN res_company rc ON rc.id = pt.company_id
+             LEFT JOIN sale_order_line sol ON sol.id = pt.sale_line_id
+             LEFT JOIN LATERAL (
+                       SELECT SUM(l.total) AS total
+                         FROM pending_service_line l
+                        WHERE l.task_id = pt.id
+                   ) psl ON TRUE
+                 WHERE pt.active
+                   AND pt.state != '1_canceled'
+                   AND (pt.sale_line_id IS NOT NULL OR pt.servicio_pendiente IS NOT NULL)
+            """
+            avances = """
+                SELECT s.task_id AS origin_id, s.date, s.datefact, s.state, s.unit_progress,
+                       COALESCE(sol.price_unit, psl.price_unit, 0.0) AS price_unit
+                  FROM project_sub_update s
+                  JOIN project_task pt ON pt.id = s.task_id
+             LEFT JOIN sale_order_line sol ON sol.id = pt.sale_line_id
+             LEFT JOIN pending_service_line psl ON psl.id = s.pending_service_line_id
+            """
+        elif origin_model == 'pending.service':
+            origins = """
+                SELECT p.id AS origin_id,
+                       p.company_id,
+                       rc.currency_id,
+                       p.date_start::date AS start_date,
+                       p.date_end_plan::date AS end_date,
+                       COALESCE(l.qty_total, 0.0) AS qty_total,
+                       COALESCE(l.amount_total, 0.0) AS amount_total,
+                       p.create_date::date AS since
+                  FROM pending_service p
+                  JOIN res_company rc ON rc.id = p.company_id
+             LEFT JOIN (
+                       SELECT service_id, SUM(quantity) AS qty_total, SUM(total) AS amount_total
+                         FROM pending_service_line
+                     GROUP BY service_id
+                   ) l ON l.service_id = p.id
+                 WHERE p.active
+                   AND p.state != 'canceled'
+            """
+            avances = """
+                SELECT psl.service_id AS origin_id, s.date, s.datefact, s.state, s.unit_progress,
+                       COALESCE(psl.price_unit, 0.0) AS price_unit
+                  FROM project_sub_update s
+                  JOIN pending_service_line psl ON psl.id = s.pending_service_line_id
+            """
+        elif origin_model == 'sale.order':
+            origins = """
+                SELECT so.id AS origin_id,
+                       so.company_id,
+                       so.currency_id,
+                       so.date_order::date AS start_date,
+                       so.commitment_date::date AS end_date,
+                       COALESCE(l.qty_total, 0.0) AS qty_total,
+                       COALESCE(so.amount_untaxed, 0.0) AS amount_total,
+                       so.create_date::date AS since
+                  FROM sale_order so
+             LEFT JOIN (
+                       SELECT order_id, SUM(product_uom_qty) AS qty_total
+                         FROM sale_order_line
+                        WHERE display_type IS NULL
+                     GROUP BY order_id
+                   ) l ON l.order_id = so.id
+                 WHERE so.state != 'cancel'
+            """
+            avances = """
+                SELECT sol.order_id AS origin_id, s.date, s.datefact, s.state, s.unit_progress,
+                       COALESCE(sol.price_unit, 0.0) AS price_unit
+                  FROM project_sub_update s
+                  JOIN project_task pt ON pt.id = s.task_id
+                  JOIN sale_order_line sol ON sol.id = pt.sale_line_id
+            """
+        else:
+            raise ValueError(f"Origen de avance no soportado: {origin_model}")
+        return origins, avances
+
+    # -------------------------------------------------------------------------
+    # CAPTURA Y RECONSTRUCCIÓN
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _capture_snapshots(self, date_from=None, date_to=None, origin_models=None):
+        """
+        Escribe (o reemplaza) los snapshots de date_from a date_to, un día por fila.
+
+        Por origen se hace un solo INSERT ... SELECT: los avances anteriores
+        al rango se acumulan en el primer día y una suma de ventana da el
+        acumulado de cada día. Lo avanzado cuenta por la fecha del avance y lo
+        facturado por su fecha de factura. Devuelve las filas escritas.
+        """
+        date_to = fields.Date.to_date(date_to) or fields.Date.context_today(self)
+        date_from = fields.Date.to_date(date_from) or date_to
+        if date_from > date_to:
+            return 0
+        self.env.flush_all()
+        cr = self.env.cr
+        rows = 0
+        for origin_model in origin_models or [key for key, _label in self._fields['origin_model'].selection]:
+            origins_sql, avances_sql = self._get_origin_sql(origin_model)
+            cr.execute(f"""
+                WITH origins AS ({origins_sql}),
+                avances AS ({avances_sql}),
+                movements AS (
+                    SELECT origin_id, GREATEST(date, %(date_from)s) AS day,
+                           COALESCE(unit_progress, 0.0) AS qty, 0.0 AS qty_invoiced,
+                           COALESCE(unit_progress, 0.0) * price_unit AS amount, 0.0 AS amount_invoiced
+                      FROM avances
+                     WHERE date <= %(date_to)s
+                     UNION ALL
+                    SELECT origin_id, GREATEST(COALESCE(datefact, date), %(date_from)s),
+                           0.0, COALESCE(unit_progress, 0.0), 0.0, COALESCE(unit_progress, 0.0) * price_unit
+                      FROM avances
+                     WHERE state = 'fact'
+                       AND COALESCE(datefact, date) <= %(date_to)s
+                ),
+                daily AS (
+                    SELECT origin_id, day,
+                           SUM(qty) AS qty, SUM(qty_invoiced) AS qty_invoiced,
+                           SUM(amount) AS amount, SUM(amount_invoiced) AS amount_invoiced
+                      FROM movements
+                  GROUP BY origin_id, day
+                ),
+                cumulative AS (
+                    SELECT o.*, g.day::date AS day,
+                           SUM(COALESCE(d.qty, 0.0)) OVER w AS qty_done,
+                           SUM(COALESCE(d.qty_invoiced, 0.0)) OVER w AS qty_invoiced,
+                           SUM(COALESCE(d.amount, 0.0)) OVER w AS amount_done,
+                           SUM(COALESCE(d.amount_invoiced, 0.0)) OVER w AS amount_invoiced
+                      FROM origins o
+                CROSS JOIN generate_series(%(date_from)s::date, %(date_to)s::date, interval '1 day') g(day)
+                 LEFT JOIN daily d ON d.origin_id = o.origin_id AND d.day = g.day::date
+                    WINDOW w AS (PARTITION BY o.origin_id ORDER BY g.day)
+                )
+                INSERT INTO {self._table} (
+                    date, origin_model, origin_id, company_id, currency_id,
+                    avance_planeado, avance_actual, avance_facturado,
+                    qty_total, qty_done, qty_invoiced,
+                    amount_total, amount_done, amount_invoiced,
+                    create_uid, create_date, write_uid, write_date)
+                SELECT day, %(origin_model)s, origin_id, company_id, currency_id,
+                       {self._planned_pct_sql()},
+                       CASE WHEN qty_total > 0
+                            THEN ROUND(LEAST(100.0, qty_done * 100.0 / qty_total)::numeric, 2)
+                            ELSE 0.0 END,
+                       CASE WHEN qty_done > 0
+                            THEN ROUND(LEAST(100.0, qty_invoiced * 100.0 / qty_done)::numeric, 2)
+                            ELSE 0.0 END,
+                       qty_total, qty_done, qty_invoiced,
+                       amount_total, amount_done, amount_invoiced,
+                       %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                  FROM cumulative
+                 WHERE since IS NULL OR day >= since
+                ON CONFLICT (origin_model, origin_id, date) DO UPDATE SET
+                    company_id = EXCLUDED.company_id,
+                    currency_id = EXCLUDED.currency_id,
+                    avance_planeado = EXCLUDED.avance_planeado,
+                    avance_actual = EXCLUDED.avance_actual,
+                    avance_facturado = EXCLUDED.avance_facturado,
+                    qty_total = EXCLUDED.qty_total,
+                    qty_done = EXCLUDED.qty_done,
+                    qty_invoiced = EXCLUDED.qty_invoiced,
+                    amount_total = EXCLUDED.amount_total,
+                    amount_done = EXCLUDED.amount_done,
+                    amount_invoiced = EXCLUDED.amount_invoiced,
+                    write_uid = EXCLUDED.write_uid,
+                    write_date = EXCLUDED.write_date
+            """, {
+                'date_from': date_from,
+                'date_to': date_to,
+                'origin_model': origin_model,
+                'uid': self.env.uid,
+            })
+            rows += cr.rowcount
+        self.invalidate_model()
+        return rows
+
+    def _planned_pct_sql(self):
+        """Avance planeado al día (misma regla que las tareas y el tablero)."""
+        return """
+            CASE
+                WHEN start_date IS NULL OR end_date IS NULL THEN 0.0
+                WHEN end_date <= start_date THEN
+                    CASE WHEN day >= end_date THEN 100.0 ELSE 0.0 END
+                WHEN day <= start_date THEN 0.0
+                WHEN day >= end_date THEN 100.0
+                ELSE ROUND(((day - start_date)::numeric / (end_date - start_date)) * 100.0, 2)
+            END
+        """
+
+    @api.model
+    def _backfill_snapshots(self, date_from, date_to=None, chunk_days=31, commit=True):
+        """
+        Reconstruye la historia de date_from a date_to en tramos de chunk_days,
+        con commit por tramo si commit es True. Devuelve las filas escritas.
+        """
+        date_to = fields.Date.to_date(date_to) or fields.Date.context_today(self)
+        start = fields.Date.to_date(date_from)
+        rows = 0
+        while start <= date_to:
+            end = min(start + timedelta(days=chunk_days - 1), date_to)
+            rows += self._capture_snapshots(start, end)
+            if commit and not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            _logger.info("Snapshots de avance: %s a %s", start, end)
+            start = end + timedelta(days=1)
+        return rows
+
+    @api.model
+    def _cron_capture_snapshots(self):
+        """Cron nocturno: snapshot del día."""
+        return self._capture_snapshots()
+
+    # -------------------------------------------------------------------------
+    # LECTURA
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _get_trends(self, origin_model, origin_ids, days=7):
+        """
+        Cambio en puntos del avance real y de la desviación (planeado − real)
+        entre el último snapshot y el de days días antes.
+        Retorna {origin_id: {'avance_actual': Δ, 'desviacion': Δ}}.
+        """
+        if not origin_ids:
+            return {}
+        self.flush_model()
+        cr = self.env.cr
+        cr.execute(SQL("""
+            SELECT MAX(date) FROM project_progress_snapshot
+             WHERE origin_model = %s AND origin_id = ANY(%s)
+        """, origin_model, list(origin_ids)))
+        [(last_date,)] = cr.fetchall()
+        if not last_date:
+            return {}
+        previous_date = last_date - timedelta(days=days)
+        cr.execute(SQL("""
+            SELECT origin_id, date, avance_planeado, avance_actual
+              FROM project_progress_snapshot
+             WHERE origin_model = %s AND origin_id = ANY(%s) AND date IN %s
+        """, origin_model, list(origin_ids), (last_date, previous_date)))
+        values = defaultdict(dict)
+        for origin_id, snapshot_date, planned, actual in cr.fetchall():
+            values[origin_id][snapshot_date] = (planned, actual)
+        trends = {}
+        for origin_id, by_date in values.items():
+            if last_date not in by_date or previous_date not in by_date:
+                continue
+            planned, actual = by_date[last_date]
+            old_planned, old_actual = by_date[previous_date]
+            trends[origin_id] = {
+                'avance_actual': actual - old_actual,
+                'desviacion': (planned - actual) - (old_planned - old_actual),
+            }
+        return trends
+
+    @api.model
+    def _get_series(self, origin_model, origin_ids, granularity='day', date_from=None, date_to=None):
+        """
+        Avance planeado, real y facturado por periodo (day/week/month), tomado
+        del último día con snapshot de cada periodo y ponderado por monto total
+        (promedio simple si no hay montos). Retorna {inicio_del_periodo: {...}}.
+        """
+        if not origin_ids:
+            return {}
+        self.flush_model()
+        conditions = [
+            SQL("origin_model = %s", origin_model),
+            SQL("origin_id = ANY(%s)", list(origin_ids)),
+        ]
+        if date_from:
+            conditions.append(SQL("date >= %s", date_from))
+        if date_to:
+            conditions.append(SQL("date <= %s", date_to))
+
+        def weighted(column):
+            return SQL("""
+                CASE WHEN SUM(GREATEST(amount_total, 0)) > 0
+                     THEN SUM(GREATEST(amount_total, 0) * %s) / SUM(GREATEST(amount_total, 0))
+                     ELSE AVG(%s) END
+            """, SQL.identifier(column), SQL.identifier(column))
+
+        self.env.cr.execute(SQL("""
+            SELECT DISTINCT ON (period) period, planned, actual, invoiced
+              FROM (
+                    SELECT date_trunc(%s, date)::date AS period, date,
+                           %s AS planned, %s AS actual, %s AS invoiced
+                      FROM project_progress_snapshot
+                     WHERE %s
+                  GROUP BY date
+                   ) daily
+          ORDER BY period, date DESC
+        """, granularity, weighted('avance_planeado'), weighted('avance_actual'),
+            weighted('avance_facturado'), SQL(" AND ").join(conditions)))
+        return {
+            period: {'avance_planeado': planned, 'avance_actual': actual, 'avance_facturado': invoiced}
+            for period, planned, actual, invoiced in self.env.cr.fetchall()
+        }
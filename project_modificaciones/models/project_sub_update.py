@@ -1,8 +1,12 @@
 from odoo import fields, models, api, _
-from datetime import datetime, date
+from datetime import datetime, date, time as dt_time
 from odoo.exceptions import ValidationError, UserError
+from odoo.osv import expression
 from markupsafe import Markup
 import logging
+import re
+import time
+import pytz
 
 _logger = logging.getLogger(__name__)
 
@@ -302,6 +306,7 @@ class ProjectSubUpdate(models.Model):
                 vals["name"] = f"{date_str}{i+1:02d}"
 
         records = super().create(vals_list)
+        records.update_id._mark_sale_ledger_dirty()
 
         # Llama a la lógica de creación de tareas después de crear los registros
         records._try_create_preliminary_task()
@@ -317,21 +322,41 @@ class ProjectSubUpdate(models.Model):
                 vals["name"] = f"{date_str}"  # vals["name"] = f"AV/{date_str}"
 
         records = super().create(vals_list)
+        records.update_id._mark_sale_ledger_dirty()
         # Llama a la lógica de creación de tareas después de crear los registros
         records._try_create_preliminary_task()
+        # Los avances mueven el avance real de las tareas que agrega el tablero
+        self.env["project.control.board"]._mark_board_dirty("project.task", records.task_id.ids)
 
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
         return records
 
     # Se ejecuta cada vez que se actualiza un registro.
     def write(self, vals):
+        running_floor = {}
+        if "unit_progress" in vals or "task_id" in vals:
+            running_floor = self._get_running_total_floor()
+<<<<<<< HEAD
+        ledger_updates = self._get_sale_ledger_updates(vals)
+        # Primero, ejecuta la escritura normal
+=======
+        ledger_updates = self._get_sale_ledger_updates(vals)
+        task_ids = self.task_id.ids
         # Primero, ejecuta la escritura normal
+>>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
         res = super().write(vals)
+        if running_floor:
+            self._mark_running_totals_dirty(self._merge_running_total_floor(
+                running_floor, self._get_running_total_floor()))
+        if ledger_updates is not None:
+            (ledger_updates | self.update_id)._mark_sale_ledger_dirty()
         # Después de guardar, intenta crear la tarea PEND por si se acaban de rellenar los campos 'producto' o 'ct'.
         self._try_create_preliminary_task()
 <<<<<<< HEAD
 
 =======
+        self.env["project.control.board"]._mark_board_dirty(
+            "project.task", task_ids + self.task_id.ids)
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
         return res
 
@@ -1282,8 +1307,16 @@ class ProjectSubUpdate(models.Model):
 
 <<<<<<< HEAD
     def write(self, vals):
+        running_floor = {}
+        if 'unit_progress' in vals or 'task_id' in vals:
+            running_floor = self._get_running_total_floor()
+        ledger_updates = self._get_sale_ledger_updates(vals)
         res = super(ProjectSubUpdate, self).write(vals)
+        if ledger_updates is not None:
+            (ledger_updates | self.update_id)._mark_sale_ledger_dirty()
         if 'unit_progress' in vals or 'task_id' in vals:
+            self._mark_running_totals_dirty(self._merge_running_total_floor(
+                running_floor, self._get_running_total_floor()))
             for record in self:
                 if record.task_id:
                     record.task_id._update_completion_state_side_effects()
@@ -1291,12 +1324,26 @@ class ProjectSubUpdate(models.Model):
 
     def unlink(self):
         tasks = self.mapped('task_id')
+        running_floor = self._get_running_total_floor()
+        updates = self.update_id
         res = super(ProjectSubUpdate, self).unlink()
+        self._mark_running_totals_dirty(running_floor)
+        updates._mark_sale_ledger_dirty()
         for task in tasks:
             task._update_completion_state_side_effects()
         return res
 
 =======
+    def unlink(self):
+        self.env["project.control.board"]._mark_board_dirty("project.task", self.task_id.ids)
+        running_floor = self._get_running_total_floor()
+        updates = self.update_id
+        res = super().unlink()
+        # Los avances posteriores de la misma tarea pierden este acumulado.
+        self._mark_running_totals_dirty(running_floor)
+        updates._mark_sale_ledger_dirty()
+        return res
+
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
     @api.model
     def _chosen_tasks(self):
@@ -1366,6 +1413,7 @@ class ProjectSubUpdate(models.Model):
 
     @api.depends("unit_progress", "task_id")
     def _virtual_quant_progress(self):
+        running_totals = self._get_running_unit_progress()
         for u in self:
             # Ensure we have valid integers for search to avoid NewId errors
             project_id = u.project_id.id if isinstance(
@@ -1394,18 +1442,7 @@ class ProjectSubUpdate(models.Model):
                     )
                     progress = sum(self_total) + u.unit_progress
             else:
-                self_total = (
-                    u.env["project.sub.update"]
-                    .search(
-                        [
-                            ("project_id", "=", project_id),
-                            ("task_id", "=", task_id),
-                            ("id", "<=", u.id),
-                        ]
-                    )
-                    .mapped("unit_progress")
-                )
-                progress = sum(self_total)
+                progress = running_totals.get(u.id, u.unit_progress)
             u.virtual_quant_progress = progress
 
     @api.depends("unit_progress", "quant_total", "virtual_quant_progress")
@@ -1423,6 +1460,85 @@ class ProjectSubUpdate(models.Model):
             u.missing_quant = u.quant_total - u.virtual_quant_progress
 
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
+    # ========== ACUMULADO DE UNIDADES POR TAREA ==========
+    def _get_running_unit_progress(self):
+        """Devuelve {avance_id: acumulado} para los avances guardados de self.
+
+        El acumulado es la suma de unit_progress de los avances de la misma
+        tarea con id <= al del avance, calculado para todo el recordset en una
+        sola consulta con SUM() OVER (PARTITION BY task_id ORDER BY id).
+        """
+        saved = self.filtered(
+            lambda u: isinstance(u.id, int) and isinstance(u.task_id.id, int) and u.task_id
+        )
+        if not saved:
+            return {}
+
+        self.flush_model(["unit_progress", "task_id"])
+        self.env.cr.execute(
+            """
+            SELECT acumulado.id, acumulado.running_total
+              FROM (
+                    SELECT s.id,
+                           SUM(COALESCE(s.unit_progress, 0.0)) OVER (
+                               PARTITION BY s.task_id ORDER BY s.id
+                           ) AS running_total
+                      FROM project_sub_update AS s
+                     WHERE s.task_id = ANY(%s)
+                   ) AS acumulado
+             WHERE acumulado.id = ANY(%s)
+            """,
+            [saved.task_id.ids, saved.ids],
+        )
+        return dict(self.env.cr.fetchall())
+
+    def _get_running_total_floor(self):
+        """Devuelve {task_id: id mínimo} de los avances de self.
+
+        Los avances de la misma tarea con id mayor dependen del acumulado de
+        estos registros.
+        """
+        floor = {}
+        for u in self:
+            if isinstance(u.id, int) and u.task_id and isinstance(u.task_id.id, int):
+                floor[u.task_id.id] = min(floor.get(u.task_id.id, u.id), u.id)
+        return floor
+
+    def _mark_running_totals_dirty(self, floor):
+        """Marca para recalcular solo el sufijo afectado de cada tarea.
+
+        Los avances de la tarea con id mayor al mínimo modificado recalculan
+        virtual_quant_progress (y sus dependientes) en un solo lote al hacer flush.
+        """
+        if not floor:
+            return
+        domain = expression.OR([
+            [("task_id", "=", task_id), ("id", ">", min_id)]
+            for task_id, min_id in floor.items()
+        ])
+        suffix = self.browse(self.sudo().search(domain).ids)
+        if suffix:
+            self.env.add_to_compute(self._fields["virtual_quant_progress"], suffix)
+            suffix.modified(["virtual_quant_progress"])
+
+    def _get_sale_ledger_updates(self, vals):
+        """Actualizaciones cuyo acumulado de venta se ve afectado por escribir vals.
+
+        Devuelve None si vals no toca el monto del avance ni su actualización.
+        """
+        if not {"unit_progress", "task_id", "update_id", "precio_unidad",
+                "pending_service_line_id"} & set(vals):
+            return None
+        return self.update_id
+
+    @staticmethod
+    def _merge_running_total_floor(*floors):
+        merged = {}
+        for floor in floors:
+            for task_id, min_id in floor.items():
+                merged[task_id] = min(merged.get(task_id, min_id), min_id)
+        return merged
+
     def _get_price_for_calculation(self):
         """Este metodo ayuda para obtener el valor unitario del producto en diferentes entornos"""
         self.ensure_one()
@@ -1437,7 +1553,8 @@ class ProjectSubUpdate(models.Model):
             return self.precio_unidad
         return 0.0
 
-    @api.depends("unit_progress", "task_id", "precio_unidad")
+    @api.depends("unit_progress", "task_id.price_unit", "precio_unidad",
+                 "pending_service_line_id.price_unit")
     def _sale_current(self):
         for u in self:
             price = u._get_price_for_calculation()
@@ -1575,29 +1692,34 @@ class ProjectSubUpdate(models.Model):
         domain = str(tasks)
         self.domain = domain
 
+    def _get_task_unit_totals(self):
+        """Unidades reportadas por tarea para las tareas de self.
+
+        Una consulta agrupada para todo el lote; como las validaciones corren
+        después de guardar, el total ya incluye los valores de self.
+        """
+        task_ids = self.task_id.ids
+        if not task_ids:
+            return {}
+        return {
+            task.id: units or 0.0
+            for task, units in self.env["project.sub.update"]._read_group(
+                [("task_id", "in", task_ids)], ["task_id"], ["unit_progress:sum"],
+            )
+        }
+
     # Este metodo de validación fue modificado.
 <<<<<<< HEAD
 =======
     @api.constrains("quant_progress", "task_id")
     def _update_units(self):
-        for u in self:
-            if u.task_id and u.task_id.total_pieces > 0:
-                other_sub_updates = self.env["project.sub.update"].search(
-                    [
-                        ("task_id", "=", u.task_id.id),
-                        (
-                            "id",
-                            "!=",
-                            u.id,
-                        ),  # Excluye el registro actual para no doble-contar su valor
-                    ]
-                )
-                sum_of_other_advances = sum(
-                    other_sub_updates.mapped("unit_progress"))
-                # Calcular el nuevo progreso total acumulado para la tarea
-                new_total_task_progress = sum_of_other_advances + u.unit_progress
+        # Progreso acumulado por tarea (ya incluye los avances de self)
+        unit_totals = self._get_task_unit_totals()
+        for task in self.task_id:
+            if task.total_pieces > 0:
+                new_total_task_progress = unit_totals.get(task.id, 0.0)
                 # Realizar la validación
-                if new_total_task_progress > u.task_id.total_pieces:
+                if new_total_task_progress > task.total_pieces:
                     raise ValidationError(
                         "El progreso acumulado de la tarea sobrepasa el número de unidades pedidas."
                     )
@@ -1627,16 +1749,397 @@ class ProjectSubUpdate(models.Model):
     """
 
     @api.model
-    def update_sale_totals(self):
-        sub_updates = self.search([])
-        for sub_update in sub_updates:
-            if sub_update.task_id:
-                sub_update.sale_total = (
-                    sub_update.task_id.total_pieces * sub_update.task_id.price_unit
-                )
-                sub_update.sale_current = (
-                    sub_update.unit_progress * sub_update.task_id.price_unit
-                )
+    def update_sale_totals(self, project_ids=None, date_from=None, date_to=None,
+                           chunk_size=5000, commit=True):
+        """Recalcula sale_total y sale_current de los avances desde su tarea.
+
+        Mismo cálculo de siempre (piezas y avance por el precio unitario de la
+        línea de venta de la tarea), pero con UPDATE ... FROM project_task por
+        rangos de id de chunk_size, escribiendo solo las filas que cambian. Se
+        puede limitar a project_ids y a un rango de fechas del avance.
+        Cada lote invalida la caché, marca los dependientes y hace commit salvo
+        en pruebas o con commit=False. Devuelve {'rows': n, 'elapsed': segundos}.
+        """
+        started = time.monotonic()
+        # Solo se persisten las columnas almacenadas; las demás se calculan en vivo
+        columns = {
+            "sale_total": "COALESCE(sol.product_uom_qty, 0) * COALESCE(sol.price_unit, 0)",
+            "sale_current": "COALESCE(psu.unit_progress, 0) * COALESCE(sol.price_unit, 0)",
+        }
+        columns = {
+            fname: expr for fname, expr in columns.items()
+            if self._fields[fname].store
+        }
+        if not columns:
+            return {"rows": 0, "elapsed": 0.0}
+
+        filters, params = ["psu.task_id IS NOT NULL"], []
+        if project_ids:
+            filters.append("psu.project_id = ANY(%s)")
+            params.append(list(project_ids))
+        if date_from:
+            filters.append("psu.date >= %s")
+            params.append(date_from)
+        if date_to:
+            filters.append("psu.date <= %s")
+            params.append(date_to)
+        where = " AND ".join(filters)
+
+        self.flush_model(["unit_progress", "task_id", "project_id", "date", *columns])
+        self.env["project.task"].flush_model(["sale_line_id"])
+        self.env["sale.order.line"].flush_model(["price_unit", "product_uom_qty"])
+
+        cr = self.env.cr
+        cr.execute(f"""
+            SELECT MIN(psu.id), MAX(psu.id)
+              FROM project_sub_update psu
+             WHERE {where}
+        """, params)
+        min_id, max_id = cr.fetchone()
+
+        set_clause = ", ".join(f"{fname} = {expr}" for fname, expr in columns.items())
+        changed = " OR ".join(
+            f"psu.{fname} IS DISTINCT FROM {expr}" for fname, expr in columns.items()
+        )
+        query = f"""
+            UPDATE project_sub_update psu
+               SET {set_clause}
+              FROM project_task pt
+         LEFT JOIN sale_order_line sol ON sol.id = pt.sale_line_id
+             WHERE pt.id = psu.task_id
+               AND psu.id >= %s
+               AND psu.id < %s
+               AND {where}
+               AND ({changed})
+         RETURNING psu.id
+        """
+        rows = 0
+        chunk_start = min_id
+        while chunk_start is not None and chunk_start <= max_id:
+            cr.execute(query, [chunk_start, chunk_start + chunk_size, *params])
+            changed_ids = [row[0] for row in cr.fetchall()]
+            chunk_start += chunk_size
+            if not changed_ids:
+                continue
+            rows += len(changed_ids)
+            self.invalidate_model(list(columns))
+            self.browse(changed_ids).modified(list(columns))
+            self.env.flush_all()
+            if commit and not self.env.registry.in_test_mode():
+                cr.commit()
+
+        elapsed = time.monotonic() - started
+        _logger.info(
+            "update_sale_totals: %s avances actualizados en %.2fs", rows, elapsed
+        )
+        return {"rows": rows, "elapsed": elapsed}
+
+    # ------------------------------------------------------------------
+    # IMPORTACIÓN MASIVA DE AVANCES
+    # ------------------------------------------------------------------
+    @api.model
+    def import_avances(self, rows, project_id, confirm=False, decimal_point=None):
+        """Crea en bloque los avances de una hoja de producción diaria.
+
+        rows es un iterable de dicts con las claves fecha, producto, cantidad y,
+        opcionalmente, tarea, ct, planta, supervisor_cliente, supervisor_interno,
+        licencia, hora_inicio, hora_termino, area_equipo y notas. Las referencias
+        se resuelven por nombre (producto también por referencia interna) con
+        mapas armados una sola vez; los errores de todas las filas se reportan
+        juntos y los avances se crean con un solo create. Con confirm=True se
+        exigen los campos de confirmación y los avances nacen confirmados.
+        Las cantidades de texto se leen con decimal_point (por defecto el del
+        idioma del usuario).
+        """
+        project = self.env["project.project"].browse(project_id).exists()
+        if not project:
+            raise UserError(_("Seleccione un proyecto válido para importar los avances."))
+        if not decimal_point:
+            decimal_point = self.env["res.lang"]._lang_get(self.env.lang or "en_US").decimal_point
+
+        rows = [
+            (line_no, row) for line_no, row in enumerate(rows, start=2)
+            if any(value not in (None, "") for value in row.values())
+        ]
+        if not rows:
+            raise UserError(_("El archivo no contiene avances para importar."))
+
+        lookups = self._get_import_lookups(project, [row for _line_no, row in rows])
+        errors = []
+        vals_list = []
+        for line_no, row in rows:
+            vals, row_errors = self._prepare_import_vals(row, lookups, confirm, decimal_point)
+            if row_errors:
+                errors.extend(_("Fila %s: %s") % (line_no, error) for error in row_errors)
+            else:
+                vals_list.append((line_no, vals))
+        errors.extend(self._check_import_unit_limits(vals_list))
+        if errors:
+            if len(errors) > 50:
+                errors = errors[:50] + [_("... y %s errores más.") % (len(errors) - 50)]
+            raise UserError(
+                _("No se importó ningún avance. Corrija el archivo:\n\n%s") % "\n".join(errors)
+            )
+
+        updates = self._get_import_updates(project, {vals["date"] for _line_no, vals in vals_list})
+        for _line_no, vals in vals_list:
+            vals["project_id"] = project.id
+            vals["update_id"] = updates[vals["date"]].id
+
+        records = self.with_context(
+            mail_create_nolog=True, mail_create_nosubscribe=True, mail_notrack=True,
+        ).create([vals for _line_no, vals in vals_list])
+        # El estado de las tareas y los acumulados se recalculan una sola vez al guardar
+        self.env.flush_all()
+        counts = {}
+        for record in records:
+            counts[record.update_id] = counts.get(record.update_id, 0) + 1
+        for update, count in counts.items():
+            update.message_post(body=_("Se importaron %s avances desde archivo.") % count)
+        _logger.info(
+            "import_avances: %s avances importados en el proyecto %s", len(records), project.id
+        )
+        return records
+
+    @api.model
+    def _get_import_lookups(self, project, rows):
+        """Mapas nombre -> registro para todas las referencias del archivo."""
+        def values_of(key):
+            return {str(row[key]).strip() for row in rows if row.get(key) not in (None, "")}
+
+        def name_map(model_name, names, domain=None):
+            if not names:
+                return {}
+            records = self.env[model_name].search([("name", "in", list(names))] + (domain or []))
+            return {record.name: record for record in records}
+
+        product_keys = values_of("producto")
+        products = self.env["product.product"].search([
+            "|", ("default_code", "in", list(product_keys)), ("name", "in", list(product_keys)),
+        ]) if product_keys else self.env["product.product"]
+        product_map = {product.name: product for product in products}
+        product_map.update({
+            product.default_code: product for product in products if product.default_code
+        })
+
+        # Tareas abiertas del proyecto por producto de su línea de venta
+        tasks_by_product = {}
+        for task in self.env["project.task"].search([
+            ("project_id", "=", project.id),
+            ("state", "not in", ["1_canceled", "1_done"]),
+            ("sale_line_id.product_id", "in", products.ids),
+        ], order="id"):
+            tasks_by_product.setdefault(task.sale_line_id.product_id.id, []).append(task)
+
+        return {
+            "producto": product_map,
+            "tasks_by_product": tasks_by_product,
+            "ct": name_map("control.centro.trabajo", values_of("ct")),
+            "planta": name_map("control.planta", values_of("planta")),
+            "supervisor_cliente": name_map("supervisor.area", values_of("supervisor_cliente")),
+            "supervisor_interno": name_map(
+                "hr.employee", values_of("supervisor_interno"), [("supervisa", "=", True)]),
+            "licencia": name_map("license.license", values_of("licencia")),
+        }
+
+    @api.model
+    def _prepare_import_vals(self, row, lookups, confirm, decimal_point="."):
+        """Valores de create de una fila y la lista de errores encontrados."""
+        errors = []
+        vals = {}
+
+        report_date = self._parse_import_date(row.get("fecha"))
+        if not report_date:
+            errors.append(_("Fecha vacía o inválida (%s).") % (row.get("fecha") or ""))
+        vals["date"] = report_date
+
+        quantity = self._parse_import_quantity(row.get("cantidad"), decimal_point)
+        if quantity is None:
+            errors.append(_("Cantidad inválida o ambigua con el separador decimal '%s' (%s).")
+                          % (decimal_point, row.get("cantidad")))
+            quantity = 0.0
+        elif quantity <= 0:
+            errors.append(_("La cantidad debe ser mayor a 0 (%s).") % (row.get("cantidad") or ""))
+        vals["unit_progress"] = quantity
+
+        product_key = str(row.get("producto") or "").strip()
+        product = lookups["producto"].get(product_key)
+        task = False
+        if not product:
+            errors.append(_("Producto no encontrado (%s).") % product_key)
+        else:
+            vals["producto"] = product.id
+            tasks = lookups["tasks_by_product"].get(product.id, [])
+            task_name = str(row.get("tarea") or "").strip()
+            if task_name:
+                tasks = [task for task in tasks if task.name == task_name]
+            if not tasks:
+                errors.append(_("No hay una tarea abierta del proyecto para el producto %s.")
+                              % product.display_name)
+            elif len(tasks) > 1:
+                errors.append(_("El producto %s tiene varias tareas en el proyecto; "
+                                "indique la columna Tarea.") % product.display_name)
+            else:
+                task = tasks[0]
+                vals["task_id"] = task.id
+
+        for key, fname in (("ct", "ct"), ("planta", "planta"),
+                           ("supervisor_cliente", "supervisorplanta"),
+                           ("supervisor_interno", "responsible_id"),
+                           ("licencia", "licencia")):
+            name = str(row.get(key) or "").strip()
+            if not name:
+                continue
+            record = lookups[key].get(name)
+            if record:
+                vals[fname] = record.id
+            else:
+                errors.append(_("%s no encontrado (%s).") % (self._fields[fname].string, name))
+
+        for key in ("hora_inicio", "hora_termino"):
+            if row.get(key) not in (None, ""):
+                value = self._parse_import_datetime(row[key], report_date)
+                if value:
+                    vals[key] = value
+                else:
+                    errors.append(_("%s inválida (%s).") % (self._fields[key].string, row[key]))
+        if vals.get("hora_inicio") and vals.get("hora_termino") \
+                and vals["hora_termino"] <= vals["hora_inicio"]:
+            errors.append(_("La hora de término debe ser posterior a la hora de inicio."))
+
+        for key in ("area_equipo", "notas"):
+            if row.get(key) not in (None, ""):
+                vals[key] = str(row[key]).strip()
+
+        vals["avances_state"] = "draft"
+        if confirm and not errors:
+            missing = [
+                self._fields[fname].string
+                for fname in ("producto", "date", "ct", "planta", "hora_inicio", "hora_termino",
+                              "supervisorplanta", "responsible_id", "licencia")
+                if not vals.get(fname)
+            ]
+            if missing:
+                errors.append(_("Faltan campos obligatorios para confirmar: %s.") % ", ".join(missing))
+            elif task.is_control_obra and task.approval_state != "approved":
+                errors.append(_("La tarea %s está pendiente de autorizar; no se puede confirmar "
+                                "el avance.") % task.name)
+            else:
+                vals["avances_state"] = "assigned" if task.sale_order_id else "confirmed"
+        return vals, errors
+
+    @api.model
+    def _check_import_unit_limits(self, vals_list):
+        """Valida en bloque que lo importado más lo ya reportado no exceda las piezas."""
+        units_by_task = {}
+        lines_by_task = {}
+        for line_no, vals in vals_list:
+            units_by_task[vals["task_id"]] = units_by_task.get(vals["task_id"], 0.0) + vals["unit_progress"]
+            lines_by_task.setdefault(vals["task_id"], []).append(str(line_no))
+        if not units_by_task:
+            return []
+
+        current_units = {
+            task.id: units or 0.0
+            for task, units in self._read_group(
+                [("task_id", "in", list(units_by_task))], ["task_id"], ["unit_progress:sum"],
+            )
+        }
+        errors = []
+        for task in self.env["project.task"].browse(list(units_by_task)):
+            new_total = current_units.get(task.id, 0.0) + units_by_task[task.id]
+            if task.total_pieces > 0 and new_total > task.total_pieces:
+                errors.append(_(
+                    "Filas %s: El progreso acumulado de la tarea %s sobrepasa el número de "
+                    "unidades pedidas (%.2f de %.2f)."
+                ) % (", ".join(lines_by_task[task.id]), task.name, new_total, task.total_pieces))
+        return errors
+
+    @api.model
+    def _get_import_updates(self, project, dates):
+        """Actualización del proyecto por fecha; crea en un solo paso las que falten."""
+        updates = {
+            update.date: update
+            for update in self.env["project.update"].search([
+                ("project_id", "=", project.id), ("date", "in", list(dates)),
+            ], order="id desc")
+        }
+        missing = sorted(set(dates) - set(updates))
+        if missing:
+            created = self.env["project.update"].create([{
+                "project_id": project.id,
+                "name": f"Avance {report_date.strftime('%d/%m/%Y')}",
+                "status": "on_track",
+                "date": report_date,
+            } for report_date in missing])
+            updates.update(zip(missing, created))
+        return updates
+
+    @api.model
+    def _parse_import_quantity(self, value, decimal_point="."):
+        """
+        Cantidad del archivo como float, o None si el texto no es un número con
+        decimal_point. El separador de miles es el otro signo y solo se acepta en
+        grupos de tres dígitos: con "." como decimal "1,250" es 1250 y "1,25" se
+        rechaza.
+        """
+        if value in (None, ""):
+            return 0.0
+        if isinstance(value, (int, float)):
+            return float(value)
+        text = str(value).strip().replace(" ", "").replace("\xa0", "")
+        thousands_sep = "," if decimal_point == "." else "."
+        pattern = r"[+-]?(\d{1,3}(%(sep)s\d{3})+|\d+)(%(dec)s\d+)?" % {
+            "sep": re.escape(thousands_sep), "dec": re.escape(decimal_point),
+        }
+        if not re.fullmatch(pattern, text):
+            return None
+        return float(text.replace(thousands_sep, "").replace(decimal_point, "."))
+
+    @api.model
+    def _parse_import_date(self, value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        value = str(value or "").strip()
+        for date_format in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+            try:
+                return datetime.strptime(value, date_format).date()
+            except ValueError:
+                continue
+        return False
+
+    @api.model
+    def _parse_import_datetime(self, value, report_date):
+        """Hora del archivo (hora local del usuario) como Datetime UTC de Odoo."""
+        if isinstance(value, datetime):
+            local_dt = value
+        elif isinstance(value, dt_time):
+            if not report_date:
+                return False
+            local_dt = datetime.combine(report_date, value)
+        else:
+            value = str(value).strip()
+            local_dt = False
+            for time_format in ("%H:%M", "%H:%M:%S"):
+                try:
+                    parsed = datetime.strptime(value, time_format).time()
+                except ValueError:
+                    continue
+                local_dt = report_date and datetime.combine(report_date, parsed)
+                break
+            if not local_dt:
+                for datetime_format in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M"):
+                    try:
+                        local_dt = datetime.strptime(value, datetime_format)
+                        break
+                    except ValueError:
+                        continue
+            if not local_dt:
+                return False
+        user_tz = pytz.timezone(self.env.user.tz or "UTC")
+        return user_tz.localize(local_dt).astimezone(pytz.utc).replace(tzinfo=None)
 
     # Pruebas
     def action_unlink_from_update(self):
@@ -1790,10 +2293,12 @@ class ProjectSubUpdate(models.Model):
     )
 
     # Avance acumulado virtual (incluyendo este registro, antes de guardar)
+    # Almacenado: para avances guardados se calcula con _get_running_unit_progress
+    # (sin leer task_id.quant_progress) y se mantiene en write/unlink.
     virtual_quant_progress = fields.Float(
         string="Unidades Entregadas (virtual)",
         compute="_virtual_quant_progress",
-        store=False,  # CRITICAL: Must be False to avoid infinite recursion
+        store=True,
         default=0.0,
     )
 
@@ -1863,6 +2368,7 @@ class ProjectSubUpdate(models.Model):
 
     @api.depends("unit_progress", "task_id")
     def _virtual_quant_progress(self):
+        running_totals = self._get_running_unit_progress()
         for u in self:
             # Ensure we have valid integers for search to avoid NewId errors
             project_id = u.project_id.id if isinstance(
@@ -1901,17 +2407,7 @@ class ProjectSubUpdate(models.Model):
                     )
                     progress = sum(self_total) + u.unit_progress
             else:
-                self_total = (
-                    u.env["project.sub.update"]
-                    .search(
-                        [
-                            ("task_id", "=", task_id),
-                            ("id", "<=", u.id),
-                        ]
-                    )
-                    .mapped("unit_progress")
-                )
-                progress = sum(self_total)
+                progress = running_totals.get(u.id, u.unit_progress)
             u.virtual_quant_progress = progress
 
     # @api.depends("unit_progress", "task_id")
@@ -1966,6 +2462,8 @@ class ProjectSubUpdate(models.Model):
 
     @api.constrains('unit_progress', 'task_id')
     def _check_weighted_limit(self):
+        # Total acumulado REAL por tarea, en una sola consulta para todo el lote
+        unit_totals = self._get_task_unit_totals()
         for record in self:
             # Solo si tiene tarea padre y esta usa progreso ponderado
             if not (record.task_id and record.task_id.parent_id and record.task_id.parent_id.use_weighted_progress):
@@ -1975,16 +2473,7 @@ class ProjectSubUpdate(models.Model):
             if record.quant_total <= 0:
                 continue
 
-            # Calcular el total acumulado REAL (buscando en BD para asegurar integridad)
-            # Excluimos el record actual para sumarlo explícitamente y usar su valor más reciente en cache
-            siblings = self.env['project.sub.update'].search([
-                ('task_id', '=', record.task_id.id),
-                ('id', '!=', record.id)
-            ])
-
-            # Sumar de manera segura
-            current_total = sum(siblings.mapped('unit_progress'))
-            new_total = current_total + record.unit_progress
+            new_total = unit_totals.get(record.task_id.id, 0.0)
 
             # EL LIMITE ES QUANT_TOTAL (UNIDADES), QUE AHORA ES EL TOTAL DE PIEZAS
             weight_limit = record.quant_total
@@ -2012,24 +2501,13 @@ class ProjectSubUpdate(models.Model):
 
     @api.constrains("quant_progress", "task_id")
     def _update_units(self):
-        for u in self:
-            if u.task_id and u.task_id.total_pieces > 0:
-                other_sub_updates = self.env["project.sub.update"].search(
-                    [
-                        ("task_id", "=", u.task_id.id),
-                        (
-                            "id",
-                            "!=",
-                            u.id,
-                        ),  # Excluye el registro actual para no doble-contar su valor
-                    ]
-                )
-                sum_of_other_advances = sum(
-                    other_sub_updates.mapped("unit_progress"))
-                # Calcular el nuevo progreso total acumulado para la tarea
-                new_total_task_progress = sum_of_other_advances + u.unit_progress
+        # Progreso acumulado por tarea (ya incluye los avances de self)
+        unit_totals = self._get_task_unit_totals()
+        for task in self.task_id:
+            if task.total_pieces > 0:
+                new_total_task_progress = unit_totals.get(task.id, 0.0)
                 # Realizar la validación
-                if new_total_task_progress > u.task_id.total_pieces:
+                if new_total_task_progress > task.total_pieces:
                     raise ValidationError(
                         "El progreso acumulado de la tarea sobrepasa el número de unidades pedidas."
                     )
@@ -195,30 +195,30 @@ class Task(models.Model):
         help="Líneas de servicio pendiente asociadas a esta tarea."
     )
 
-    expense_count = fields.Integer(string="Gastos", compute="_compute_counts")
+    expense_count = fields.Integer(string="Gastos", compute="_compute_cost_aggregates")
     purchase_count = fields.Integer(
-        string="Compras", compute="_compute_counts")
+        string="Compras", compute="_compute_cost_aggregates")
     requisition_count = fields.Integer(
-        string="Requisiciones", compute="_compute_counts")
+        string="Requisiciones", compute="_compute_cost_aggregates")
     stock_move_count = fields.Integer(
-        string="Movimientos de Almacén", compute="_compute_counts")
+        string="Movimientos de Almacén", compute="_compute_cost_aggregates")
 
 =======
     # Contadores rápidos
     expense_count = fields.Integer(
-        string="Cant. Gastos", compute="_compute_counts")
+        string="Cant. Gastos", compute="_compute_cost_aggregates")
     purchase_count = fields.Integer(
-        string="Cant. Compras", compute="_compute_counts")
+        string="Cant. Compras", compute="_compute_cost_aggregates")
     requisition_count = fields.Integer(
-        string="Cant. Requisiciones", compute="_compute_counts")
+        string="Cant. Requisiciones", compute="_compute_cost_aggregates")
     stock_move_count = fields.Integer(
-        string="Cant. Movimientos de Almacén", compute="_compute_counts")
+        string="Cant. Movimientos de Almacén", compute="_compute_cost_aggregates")
 
     # Total de gastos aprobados (aprobado/posteado)
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
     expense_total_approved = fields.Monetary(
         string="Total gastos (aprobados)",
-        compute="_compute_totals",
+        compute="_compute_cost_aggregates",
         currency_field="currency_id",
         store=False,
     )
@@ -228,7 +228,7 @@ class Task(models.Model):
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
     purchase_total_approved = fields.Monetary(
         string="Total compras (confirmadas)",
-        compute="_compute_totals",
+        compute="_compute_cost_aggregates",
         currency_field="currency_id",
         store=False,
     )
@@ -244,84 +244,93 @@ class Task(models.Model):
 
     stock_move_cost = fields.Monetary(
         string="Costo Mov. Almacén",
-        compute='_compute_stock_move_cost',
+        compute='_compute_cost_aggregates',
         currency_field='currency_id'
     )
 
-    @api.depends('stock_move_ids', 'stock_move_ids.state', 'purchase_line_ids', 'purchase_line_ids.state')
-    def _compute_stock_move_cost(self):
-<<<<<<< HEAD
-        # Prefetch purchase lines for all tasks in self
-        all_purchase_lines = self.env['purchase.order.line'].search([
-            ('task_id', 'in', self.ids),
-            ('order_id.state', 'in', ['purchase', 'done'])
-        ])
+    def _get_cost_aggregates(self):
+        """Contadores y totales de costos por tarea, calculados en lote.
 
-        # Group purchase lines by task_id and then by product_id
-        purchase_lines_by_task = {}
-        for line in all_purchase_lines:
-            task_id = line.task_id.id
-            if task_id not in purchase_lines_by_task:
-                purchase_lines_by_task[task_id] = {}
+        Una consulta agrupada por tarea para gastos, líneas de compra,
+        requisiciones y movimientos de salida hechos. El costo de almacén cobra
+        por producto solo lo movido que excede lo comprado confirmado, valuado
+        al costo estándar. Devuelve {task_id: {campo: valor}}; las tareas sin
+        guardar quedan en cero.
+        """
+        aggregates = {
+            task._origin.id: {
+                'expense_count': 0,
+                'purchase_count': 0,
+                'requisition_count': 0,
+                'stock_move_count': 0,
+                'expense_total_approved': 0.0,
+                'purchase_total_approved': 0.0,
+                'stock_move_cost': 0.0,
+            }
+            for task in self
+        }
+        task_ids = [task_id for task_id in aggregates if task_id]
+        if not task_ids:
+            return aggregates
+        task_domain = [('task_id', 'in', task_ids)]
+
+        Expense = self.env['hr.expense']
+        for task, count in Expense._read_group(task_domain, ['task_id'], ['__count']):
+            aggregates[task.id]['expense_count'] = count
+        for task, amount in Expense._read_group(
+            task_domain + [('sheet_id.state', 'in', ['post', 'done'])],
+            ['task_id'], ['total_amount:sum'],
+        ):
+            aggregates[task.id]['expense_total_approved'] = amount or 0.0
 
-            product_id = line.product_id.id
-            purchase_lines_by_task[task_id][product_id] = \
-                purchase_lines_by_task[task_id].get(
-                    product_id, 0.0) + line.product_qty
+        PurchaseLine = self.env['purchase.order.line']
+        for task, order_count in PurchaseLine._read_group(
+            task_domain, ['task_id'], ['order_id:count_distinct'],
+        ):
+            aggregates[task.id]['purchase_count'] = order_count
+        purchased_qty = {}
+        for task, product, subtotal, qty in PurchaseLine._read_group(
+            task_domain + [('order_id.state', 'in', ['purchase', 'done'])],
+            ['task_id', 'product_id'], ['price_subtotal:sum', 'product_qty:sum'],
+        ):
+            aggregates[task.id]['purchase_total_approved'] += subtotal or 0.0
+            purchased_qty[task.id, product.id] = qty or 0.0
 
-        for task in self:
-            cost = 0.0
-            moves = task.stock_move_ids.filtered(lambda m: m.state == 'done')
+        for task, count in self.env['employee.purchase.requisition']._read_group(
+            task_domain, ['task_id'], ['__count'],
+        ):
+            aggregates[task.id]['requisition_count'] = count
+
+        # Neto por producto: salidas hechas menos lo comprado confirmado
+        chargeable_qty = {}
+        for task, product, count, qty in self.env['stock.move']._read_group(
+            task_domain + [
+                ('state', '=', 'done'),
+                ('picking_type_id.code', '=', 'outgoing'),
+            ],
+            ['task_id', 'product_id'], ['__count', 'quantity:sum'],
+        ):
+            aggregates[task.id]['stock_move_count'] += count
+            net_qty = (qty or 0.0) - purchased_qty.get((task.id, product.id), 0.0)
+            if net_qty > 0:
+                chargeable_qty[task.id, product.id] = net_qty
+
+        products = self.env['product.product'].browse(
+            {product_id for _task_id, product_id in chargeable_qty})
+        unit_costs = {product.id: product.standard_price or 0.0 for product in products}
+        for (task_id, product_id), qty in chargeable_qty.items():
+            aggregates[task_id]['stock_move_cost'] += qty * unit_costs[product_id]
+        return aggregates
 
-=======
+    @api.depends('stock_move_ids', 'stock_move_ids.state', 'purchase_line_ids', 'purchase_line_ids.state')
+    def _compute_cost_aggregates(self):
+        aggregates = self._get_cost_aggregates()
         for task in self:
-            cost = 0.0
-
-            # 1. Obtener cantidades movidas por producto (Solo Salidas/Outgoing y Done)
-            moves = task.stock_move_ids.filtered(lambda m: m.state == 'done')
-
-            # Map Product -> Total Qty Moved
->>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
-            moved_qty_per_product = {}
-            for move in moves:
-                qty = move.quantity
-                moved_qty_per_product[move.product_id.id] = moved_qty_per_product.get(
-                    move.product_id.id, 0.0) + qty
-
+            task.update(aggregates[task._origin.id])
 <<<<<<< HEAD
-            purchased_qty_per_product = purchase_lines_by_task.get(task.id, {})
-
-            for product_id, moved_qty in moved_qty_per_product.items():
-                purchased_qty = purchased_qty_per_product.get(product_id, 0.0)
-                chargeable_qty = max(0.0, moved_qty - purchased_qty)
-
-                if chargeable_qty > 0:
-                    product = task.env['product.product'].browse(product_id)
-                    unit_cost = product.standard_price
-                    cost += chargeable_qty * unit_cost
-
-            task.stock_move_cost = cost
     # ========== FIN CAMPOS DE INTEGRACIÓN ALMACÉN ==========
 
 =======
-            # 2. Obtener cantidades compradas por producto (Solo Confirmadas)
-            purchased_qty_per_product = {}
-            purchase_lines = task.purchase_line_ids.filtered(
-                lambda line: line.order_id.state in ['purchase', 'done']
-            )
-            for line in purchase_lines:
-                purchased_qty_per_product[line.product_id.id] = purchased_qty_per_product.get(
-                    line.product_id.id, 0.0) + line.product_qty
-
-            # 3. Lógica de Cobro Neto
-            for product_id, moved_qty in moved_qty_per_product.items():
-                purchased_qty = purchased_qty_per_product.get(product_id, 0.0)
-                chargeable_qty = max(0.0, moved_qty - purchased_qty)
-                if chargeable_qty > 0:
-                    move_product = moves.filtered(lambda move: move.product_id.id == product_id)[:1].product_id
-                    cost += chargeable_qty * (move_product.standard_price or 0.0)
-
-            task.stock_move_cost = cost
 
     # ---------------------------------------------------------------------
     # Sync task progress with linked Sale Order Line
@@ -696,48 +705,137 @@ class Task(models.Model):
         "state"
     )
     def _units(self):
-        # Optimization: Fetch sum of unit_progress for all tasks at once
-        domain = [("task_id", "in", self.ids)]
-        data = self.env["project.sub.update"].read_group(
-            domain, ["task_id", "unit_progress"], ["task_id"]
-        )
-        progress_map = {item["task_id"][0]                        : item["unit_progress"] for item in data}
+        # Optimization: Fetch the whole task forest and compute it in one pass
+        tree = self._get_progress_tree()
 
         for u in self:
             if not u.id:
                 continue
+            u.quant_progress = tree[u.id]["quant_progress"] if u.id in tree else 0.0
 
-            # CASO 1: Tarea Padre Ponderada (Calcula en base a hijos)
-            if u.use_weighted_progress:
-                # ESTRATEGIA MIXTA:
-                # 1. Sumar contribución de subtareas
+    def _get_progress_tree(self):
+        """
+        Calcula quant_progress y progress para las tareas de self y todas sus
+        subtareas (activas) en una sola pasada de abajo hacia arriba.
+
+        Carga el bosque con un CTE recursivo sobre parent_id junto con la suma
+        de unit_progress de los avances de cada tarea. Replica exactamente la
+        lógica por registro de _units y _progress (tope de 99.9 y estado 1_done).
+        Devuelve {task_id: {"quant_progress": float, "progress": int}}.
+        """
+        root_ids = [task_id for task_id in self.ids if isinstance(task_id, int)]
+        if not root_ids:
+            return {}
+
+        self.flush_model([
+            "parent_id", "active", "total_pieces", "use_weighted_progress",
+            "subtask_weight", "state",
+        ])
+        self.env["project.sub.update"].flush_model(["task_id", "unit_progress"])
+        self.env.cr.execute(
+            """
+            WITH RECURSIVE arbol AS (
+                SELECT t.id
+                  FROM project_task AS t
+                 WHERE t.id = ANY(%s)
+                 UNION
+                SELECT c.id
+                  FROM project_task AS c
+                  JOIN arbol ON c.parent_id = arbol.id
+                 WHERE c.active
+            ), avances AS (
+                SELECT s.task_id, SUM(COALESCE(s.unit_progress, 0.0)) AS units
+                  FROM project_sub_update AS s
+                 WHERE s.task_id IN (SELECT id FROM arbol)
+                 GROUP BY s.task_id
+            )
+            SELECT t.id,
+                   t.parent_id,
+                   COALESCE(t.total_pieces, 0.0),
+                   COALESCE(t.use_weighted_progress, FALSE),
+                   COALESCE(t.subtask_weight, 0.0),
+                   t.state,
+                   COALESCE(p.total_pieces, 0.0),
+                   COALESCE(p.use_weighted_progress, FALSE),
+                   COALESCE(avances.units, 0.0),
+                   t.active
+              FROM arbol
+              JOIN project_task AS t ON t.id = arbol.id
+         LEFT JOIN project_task AS p ON p.id = t.parent_id
+         LEFT JOIN avances ON avances.task_id = t.id
+            """,
+            [root_ids],
+        )
+        nodes = {row[0]: row for row in self.env.cr.fetchall()}
+
+        # Solo las subtareas activas cuentan como child_ids del padre
+        children = {task_id: [] for task_id in nodes}
+        roots = []
+        for task_id, row in nodes.items():
+            if row[1] in nodes and row[9]:
+                children[row[1]].append(task_id)
+            else:
+                roots.append(task_id)
+
+        # Orden de abajo hacia arriba: hijos antes que sus padres
+        order = []
+        stack = list(roots)
+        while stack:
+            task_id = stack.pop()
+            order.append(task_id)
+            stack.extend(children[task_id])
+
+        tree = {}
+        for task_id in reversed(order):
+            (_id, parent_id, total_pieces, use_weighted, subtask_weight, state,
+             parent_total_pieces, parent_weighted, direct_units, _active) = nodes[task_id]
+
+            if use_weighted:
+                # quant_progress: contribución de subtareas usando su progress (entero)
                 weighted_pct = 0.0
-                for child in u.child_ids:
-                    current_sub_progress = child.progress or 0
+                # progress: contribución de subtareas usando su quant_progress
+                total_weighted_progress = 0.0
+                for child_id in children[task_id]:
+                    child = tree[child_id]
+                    child_row = nodes[child_id]
+                    child_total_pieces, child_weight = child_row[2], child_row[4]
+                    if child["progress"] > 0:
+                        weighted_pct += (child["progress"] / 100.0) * child_weight
+                    if child_total_pieces and child_total_pieces > 0:
+                        current_sub_progress = (
+                            child["quant_progress"] / child_total_pieces) * 100
+                    else:
+                        current_sub_progress = 0
                     if current_sub_progress > 0:
-                        weighted_pct += (current_sub_progress /
-                                         100.0) * child.subtask_weight
-
-                # 2. Sumar avance DIRECTO en la tarea padre
-                direct_progress_units = progress_map.get(u.id, 0.0)
+                        total_weighted_progress += (current_sub_progress /
+                                                    100.0) * child_weight
 
-                # Calcular cuánto representa ese avance directo del total de piezas
-                if u.total_pieces > 0:
-                    direct_contribution_pct = (
-                        direct_progress_units / u.total_pieces) * 100.0
-                    weighted_pct += direct_contribution_pct
+                if total_pieces > 0:
+                    direct_pct = (direct_units / total_pieces) * 100.0
+                    weighted_pct += direct_pct
+                    total_weighted_progress += direct_pct
 
-                # Capamos al 100%
                 weighted_pct = min(100.0, weighted_pct)
-                u.quant_progress = (weighted_pct / 100.0) * u.total_pieces
+                quant_progress = (weighted_pct / 100.0) * total_pieces
+                if state == '1_done':
+                    quant_progress = total_pieces
 
-                # Consistencia: Solo si el padre está Hecho, asumimos 100% global
-                if u.state == '1_done':
-                    u.quant_progress = u.total_pieces
+                progress = 100.0 if total_weighted_progress > 99.9 else total_weighted_progress
 
-            # CASO 2: Subtarea / Tarea Normal (Calcula sumando sus avances)
             else:
-                u.quant_progress = progress_map.get(u.id, 0.0)
+                quant_progress = direct_units
+                progress = 0.0
+                if parent_id and parent_weighted and subtask_weight > 0:
+                    if parent_total_pieces > 0:
+                        progress = (quant_progress / parent_total_pieces) * 100
+                elif total_pieces and total_pieces > 0:
+                    progress = (quant_progress / total_pieces) * 100
+
+            tree[task_id] = {
+                "quant_progress": quant_progress,
+                "progress": min(100, int(round(progress))),
+            }
+        return tree
 
     @api.depends(
         "sub_update_ids",
@@ -750,7 +848,13 @@ class Task(models.Model):
         "state",
     )
     def _progress(self):
+        tree = self._get_progress_tree()
         for u in self:
+            if u.id in tree:
+                u.progress = tree[u.id]["progress"]
+                continue
+
+            # Registros nuevos (sin guardar): cálculo por registro
             progress = 0.0
 
             if u.use_weighted_progress:
@@ -824,13 +928,15 @@ class Task(models.Model):
 
     @api.depends("sub_update_ids", "sub_update_ids.unit_progress", "progress", "quant_progress", "total_pieces", "use_weighted_progress")
     def _is_complete(self):
+        tree = self._get_progress_tree()
         for task in self:
-            task.is_complete = task._check_is_complete_value()
+            task.is_complete = task._check_is_complete_value(tree.get(task.id))
 
-    def _check_is_complete_value(self):
+    def _check_is_complete_value(self, progress_values=None):
         """
         Calcula si la tarea se considera completa basándose en el progreso.
         Retorna True/False sin modificar el estado.
+        progress_values: valores de _get_progress_tree para no releer quant_progress/progress.
         """
         self.ensure_one()
         if not self.is_control_obra:
@@ -845,11 +951,16 @@ class Task(models.Model):
         if self.parent_id and self.parent_id.use_weighted_progress and self.subtask_weight > 0:
             target_value = self.parent_id.total_pieces
 
-        current_value = self.quant_progress
+        if progress_values is None:
+            progress_values = {
+                "quant_progress": self.quant_progress,
+                "progress": self.progress,
+            }
+        current_value = progress_values["quant_progress"]
 
         if self.use_weighted_progress:
             target_value = 100.0
-            current_value = float(self.progress)
+            current_value = float(progress_values["progress"])
 
         if target_value == 0:
             return False  # Evitar completado automático en tareas sin meta
@@ -861,102 +972,140 @@ class Task(models.Model):
 
     def _update_completion_state_side_effects(self):
         """
-        Método explícito para actualizar estado y etapa cuando cambia el progreso.
-        Debe llamarse desde write() o create().
+        Encola las tareas para actualizar estado y etapa cuando cambia el progreso.
+        La evaluación real se hace una sola vez por transacción (precommit) en
+        _flush_completion_state_queue, incluyendo a las tareas padre. Quien lea
+        el estado o la etapa en la misma transacción debe llamarla antes.
         """
-        for task in self:
-            if not task.is_control_obra:
-                continue
+        task_ids = [task_id for task_id in self.ids if isinstance(task_id, int)]
+        if not task_ids:
+            return
+        data = self.env.cr.precommit.data
+        queue = data.get('project_modificaciones.completion_state_tasks')
+        if queue is None:
+            queue = data['project_modificaciones.completion_state_tasks'] = set()
+            self.env.cr.precommit.add(self.browse()._flush_completion_state_queue)
+        queue.update(task_ids)
+
+    def _flush_completion_state_queue(self):
+        """
+        Procesa las tareas encoladas y sus padres, de abajo hacia arriba por
+        profundidad de jerarquía, evaluando cada tarea exactamente una vez.
+        """
+        task_ids = self.env.cr.precommit.data.pop(
+            'project_modificaciones.completion_state_tasks', set())
+        tasks = self.browse(task_ids).exists()
+        if not tasks:
+            return
 
-            # Si la tarea NO debe procesarse (borradores, etc), saltar
-            if task.approval_state in ["draft", "to_approve", "rejected"]:
-                continue
+        # Agregar ancestros y calcular la profundidad de cada tarea.
+        # Como antes, solo las tareas de obra ya enviadas propagan a su padre.
+        depth = {}
+        pending = tasks
+        while pending:
+            for task in pending:
+                level, parent = 0, task.parent_id
+                while parent:
+                    level += 1
+                    parent = parent.parent_id
+                depth[task.id] = level
+            pending = pending.filtered(
+                lambda t: t.is_control_obra
+                and t.approval_state not in ["draft", "to_approve", "rejected"]
+            ).parent_id.filtered(lambda t: t.id not in depth)
+
+        stages = {
+            key: self.env.ref(
+                "project_modificaciones.project_task_type_obra_%s" % key, raise_if_not_found=False)
+            for key in ('pending', 'progress', 'done')
+        }
+        for task in self.browse(sorted(depth, key=lambda task_id: (-depth[task_id], task_id))):
+            task._apply_completion_state(stages)
+        self.env.flush_all()
+
+    def _apply_completion_state(self, stages):
+        """
+        Actualiza estado y etapa de una tarea según su progreso.
+        stages: {'pending'|'progress'|'done': project.task.type} resuelto una vez por lote.
+        """
+        self.ensure_one()
+        task = self
+        if not task.is_control_obra:
+            return
 
-            is_done = task._check_is_complete_value()
+        # Si la tarea NO debe procesarse (borradores, etc), saltar
+        if task.approval_state in ["draft", "to_approve", "rejected"]:
+            return
 
-            # Lógica de transición de estados
-            if is_done:
-                # Solo si no está ya en done
-                if task.state != '1_done':
-                    vals = {
-                        "state": "1_done",
-                        "is_complete": True
-                    }
-                    stage_done = self.env.ref(
-                        "project_modificaciones.project_task_type_obra_done", raise_if_not_found=False
-                    )
-                    if stage_done and task.stage_id != stage_done:
-                        vals["stage_id"] = stage_done.id
+        stage_pending = stages.get('pending')
+        stage_progress = stages.get('progress')
+        stage_done = stages.get('done')
+
+        is_done = task._check_is_complete_value()
+
+        # Lógica de transición de estados
+        if is_done:
+            # Solo si no está ya en done
+            if task.state != '1_done':
+                vals = {
+                    "state": "1_done",
+                    "is_complete": True
+                }
+                if stage_done and task.stage_id != stage_done:
+                    vals["stage_id"] = stage_done.id
+
+                task.write(vals)
+
+        else:
+            # Si NO está completa, pero estaba en done, o necesita moverse
+            current_value = task.quant_progress
+            if task.use_weighted_progress:
+                current_value = float(task.progress)
+
+            # Caso: En progreso
+            if current_value > 0:
+                if task.approval_state == "approved":
+                    # Verificar si necesitamos moverla a "En Progreso"
+                    needs_update = False
+                    vals = {}
+
+                    # Si está en Pendiente o Done, mover a Progress
+                    if task.stage_id in [stage_pending, stage_done] or not task.stage_id:
+                        if stage_progress:
+                            vals["stage_id"] = stage_progress.id
+                        vals["state"] = "01_in_progress"
+                        vals["is_complete"] = False
+                        needs_update = True
+
+                    # Si está manualmente marcada como done pero bajó el progreso
+                    elif task.state == '1_done':
+                        vals["state"] = "01_in_progress"
+                        vals["is_complete"] = False
+                        needs_update = True
 
-                    task.write(vals)
+                    if needs_update:
+                        task.write(vals)
 
+            # Caso: Sin progreso (o 0)
             else:
-                # Si NO está completa, pero estaba en done, o necesita moverse
-                current_value = task.quant_progress
-                if task.use_weighted_progress:
-                    current_value = float(task.progress)
-
-                # Caso: En progreso
-                if current_value > 0:
-                    if task.approval_state == "approved":
-                        # Verificar si necesitamos moverla a "En Progreso"
-                        needs_update = False
-                        vals = {}
-
-                        stage_pending = self.env.ref(
-                            "project_modificaciones.project_task_type_obra_pending", raise_if_not_found=False)
-                        stage_done = self.env.ref(
-                            "project_modificaciones.project_task_type_obra_done", raise_if_not_found=False)
-                        stage_progress = self.env.ref(
-                            "project_modificaciones.project_task_type_obra_progress", raise_if_not_found=False)
-
-                        # Si está en Pendiente o Done, mover a Progress
-                        if task.stage_id in [stage_pending, stage_done] or not task.stage_id:
-                            if stage_progress:
-                                vals["stage_id"] = stage_progress.id
-                            vals["state"] = "01_in_progress"
-                            vals["is_complete"] = False
-                            needs_update = True
-
-                        # Si está manualmente marcada como done pero bajó el progreso
-                        elif task.state == '1_done':
-                            vals["state"] = "01_in_progress"
-                            vals["is_complete"] = False
-                            needs_update = True
-
-                        if needs_update:
-                            task.write(vals)
-
-                # Caso: Sin progreso (o 0)
-                else:
-                    if task.approval_state == "approved":
-                        needs_update = False
-                        vals = {}
+                if task.approval_state == "approved":
+                    needs_update = False
+                    vals = {}
 
-                        stage_progress = self.env.ref(
-                            "project_modificaciones.project_task_type_obra_progress", raise_if_not_found=False)
-                        stage_done = self.env.ref(
-                            "project_modificaciones.project_task_type_obra_done", raise_if_not_found=False)
-                        stage_pending = self.env.ref(
-                            "project_modificaciones.project_task_type_obra_pending", raise_if_not_found=False)
-
-                        if task.stage_id in [stage_progress, stage_done]:
-                            if stage_pending:
-                                vals["stage_id"] = stage_pending.id
-                            vals["state"] = "04_waiting_normal"
-                            vals["is_complete"] = False
-                            needs_update = True
-
-                        elif task.state == '1_done':
-                            vals["state"] = "04_waiting_normal"
-                            vals["is_complete"] = False
-                            needs_update = True
-
-                        if needs_update:
-                            task.write(vals)
-            # Si es una subtarea, verificar si el padre debe actualizarse
-            if task.parent_id:
-                task.parent_id._update_completion_state_side_effects()
+                    if task.stage_id in [stage_progress, stage_done]:
+                        if stage_pending:
+                            vals["stage_id"] = stage_pending.id
+                        vals["state"] = "04_waiting_normal"
+                        vals["is_complete"] = False
+                        needs_update = True
+
+                    elif task.state == '1_done':
+                        vals["state"] = "04_waiting_normal"
+                        vals["is_complete"] = False
+                        needs_update = True
+
+                    if needs_update:
+                        task.write(vals)
 
     @api.model
     def update_task_status(self):
@@ -1760,6 +1909,11 @@ class Task(models.Model):
     # MÉTODO WRITE: Lógica principal de cambio de proyecto
     # -------------------------------------------------------------------------
     def write(self, vals):
+        board = self.env['project.control.board']
+        if {'sale_line_id', 'servicio_pendiente'} & set(vals):
+            # La tarjeta anterior deja de contar la tarea
+            board._mark_board_dirty(self._name, self.ids, resolve_now=True)
+
         # 1. Capturar estado previo
         old_state = {
             task.id: {
@@ -2288,8 +2442,13 @@ class Task(models.Model):
                                 sale_order.sudo().write(
                                     {'project_id': new_project.id})
 
+        board._mark_board_dirty(self._name, self.ids)
         return res
 
+    def unlink(self):
+        self.env['project.control.board']._mark_board_dirty(self._name, self.ids, resolve_now=True)
+        return super(Task, self).unlink()
+
     """
     def _clean_invalid_references(self):
         for task in self:
@@ -2363,47 +2522,9 @@ class Task(models.Model):
         }
 
 <<<<<<< HEAD
-    def _compute_counts(self):
-        for task in self:
-            task.expense_count = len(task.expense_ids)
 =======
     # ========== MÉTODOS DE ANALYTICS_EXTRA (mod_task.py) ==========
-    def _compute_counts(self):
-        for task in self:
-            task.expense_count = len(task.expense_ids)
-            # Contar las órdenes de compra únicas a través de las líneas
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
-            task.purchase_count = len(
-                task.purchase_line_ids.mapped("order_id"))
-            task.requisition_count = len(task.requisition_ids)
-            task.stock_move_count = len(task.stock_move_ids)
-
-    def _compute_totals(self):
-<<<<<<< HEAD
-        for task in self:
-=======
-        # Suma totales aprobados de gastos y sin impuestos de compras confirmadas
-        for task in self:
-            # Optimización: Usar los campos One2many en vez de consultas search para evitar consultas masivas en BD.
-
-            # Sumar gastos aprobados (post o done).
->>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
-            approved_expenses = task.expense_ids.filtered(
-                lambda e: e.sheet_id.state in ["post", "done"]
-            )
-            task.expense_total_approved = sum(
-                approved_expenses.mapped("total_amount"))
-
-<<<<<<< HEAD
-=======
-            # Sumar compras confirmadas (purchase o done).
->>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
-            confirmed_lines = task.purchase_line_ids.filtered(
-                lambda l: l.order_id.state in ["purchase", "done"]
-            )
-            task.purchase_total_approved = sum(
-                confirmed_lines.mapped("price_subtotal"))
-
     def action_view_expenses(self):
         self.ensure_one()
         return {
@@ -2723,6 +2844,10 @@ class Task(models.Model):
             if task.is_control_obra and stage_draft and task.stage_id != stage_draft:
                 task.sudo().write({"stage_id": stage_draft.id})
 
+<<<<<<< HEAD
+=======
+        self.env['project.control.board']._mark_board_dirty(self._name, tasks.ids)
+>>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
         return tasks
 
     def _create_approval_activity(self):
@@ -1,5 +1,6 @@
 from odoo import fields, models, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.osv import expression
 from datetime import datetime
 from markupsafe import Markup
 
@@ -72,34 +73,168 @@ class ProjectUpdate(models.Model):
                 update.sub_update_ids.mapped('total_progress_percentage'))
             update.progress_percentage = total_percentage
 
-    @api.depends('sub_update_ids', 'sub_update_ids.unit_progress', 'sub_update_ids.task_id')
+    @api.depends('sub_update_ids.sale_current')
     def _sale_current(self):
         for u in self:
             # Nota: Referencia actualizada a project.sub.update
-            sale = u.env['project.sub.update'].search(
-                [('update_id.id', '=', u._origin.id)]).mapped('sale_current')
-            u.sale_current = sum(sale)
+            u.sale_current = sum(u.sub_update_ids.mapped('sale_current'))
+        # Un cambio de precio llega por dependencia, sin pasar por el write
+        # del avance: el acumulado de las actualizaciones posteriores también cambia
+        self._mark_sale_ledger_dirty()
 
-    @api.depends('sub_update_ids', 'sub_update_ids.unit_progress', 'sub_update_ids.task_id')
+    @api.depends('sale_current', 'project_id')
     def _sale_actual(self):
+        ledger = self._get_sale_ledger()
         for u in self:
-            sale = u.env['project.update'].search(
-                [('project_id.id', '=', u.project_id.id), ('id', '<=', u._origin.id)]).mapped('sale_current')
-            u.sale_actual = sum(sale)
+            u.sale_actual = ledger.get(u._origin.id, 0.0)
 
     @api.depends('sub_update_ids', 'sub_update_ids.unit_progress', 'sub_update_ids.task_id')
     def _sale_total(self):
+        project_ids = self.project_id.ids
+        totals = dict.fromkeys(project_ids, 0.0)
+        if project_ids:
+            tasks = self.env['project.task'].search([('project_id', 'in', project_ids)])
+            for task in tasks:
+                totals[task.project_id.id] += task.price_subtotal
         for u in self:
-            sale = u.env['project.task'].search(
-                [('project_id.id', '=', u.project_id.id)]).mapped('price_subtotal')
-            u.sale_total = sum(sale)
+            u.sale_total = totals.get(u.project_id.id, 0.0)
 
-    @api.depends('sub_update_ids', 'sub_update_ids.unit_progress', 'sub_update_ids.task_id')
+    @api.depends('sale_total', 'sale_actual')
     def _sale_missing(self):
         for u in self:
             u.sale_missing = u.sale_total - u.sale_actual
 
-    @api.depends('sub_update_ids', 'sub_update_ids.unit_progress', 'sub_update_ids.task_id')
+    # -------------------------------------------------------------------------
+    # ACUMULADO DE VENTA POR PROYECTO (sale_actual)
+    # -------------------------------------------------------------------------
+
+    def _get_sale_ledger(self):
+        """Devuelve {update_id: acumulado de sale_current} para los registros de self.
+
+        El acumulado por proyecto (ordenado por id) solo se recorre desde el
+        primer registro de self en cada proyecto: la base es el sale_actual ya
+        almacenado del registro anterior, de modo que el costo es proporcional
+        al sufijo afectado y no a todo el historial del proyecto.
+        """
+        ids = [u._origin.id for u in self if isinstance(u._origin.id, int)]
+        if not ids:
+            return {}
+
+        self.flush_model(['sale_current', 'project_id'])
+        self.env.cr.execute(
+            """
+            WITH piso AS (
+                SELECT project_id, MIN(id) AS min_id
+                  FROM project_update
+                 WHERE id = ANY(%s)
+                   AND project_id IS NOT NULL
+                 GROUP BY project_id
+            ), base AS (
+                SELECT piso.project_id, MAX(p.id) AS base_id
+                  FROM piso
+                  JOIN project_update AS p
+                    ON p.project_id = piso.project_id
+                   AND p.id < piso.min_id
+                 GROUP BY piso.project_id
+            )
+            SELECT u.id,
+                   base.base_id,
+                   SUM(COALESCE(u.sale_current, 0.0)) OVER (
+                       PARTITION BY u.project_id ORDER BY u.id
+                   ) AS running_total
+              FROM project_update AS u
+              JOIN piso
+                ON piso.project_id = u.project_id
+               AND u.id >= piso.min_id
+         LEFT JOIN base
+                ON base.project_id = u.project_id
+            """,
+            [ids],
+        )
+        rows = self.env.cr.fetchall()
+
+        # La base se lee por ORM: si estuviera pendiente de recalcular, se calcula antes.
+        base_updates = self.browse({base_id for _id, base_id, _total in rows if base_id})
+        base_values = {base.id: base.sale_actual for base in base_updates}
+        return {
+            update_id: base_values.get(base_id, 0.0) + running_total
+            for update_id, base_id, running_total in rows
+        }
+
+    def _mark_sale_ledger_dirty(self):
+        """Marca para recalcular el sale_actual de las actualizaciones posteriores
+        (mismo proyecto, id mayor) a las de self."""
+        floor = {}
+        for update in self:
+            if isinstance(update.id, int) and update.project_id:
+                project_id = update.project_id.id
+                floor[project_id] = min(floor.get(project_id, update.id), update.id)
+        if not floor:
+            return
+        domain = expression.OR([
+            [('project_id', '=', project_id), ('id', '>', min_id)]
+            for project_id, min_id in floor.items()
+        ])
+        suffix = self.browse(self.sudo().search(domain).ids)
+        if suffix:
+            self.env.add_to_compute(self._fields['sale_actual'], suffix)
+            suffix.modified(['sale_actual'])
+
+    @api.model
+    def _rebuild_sale_ledger(self, project_ids=None):
+        """Reconstruye sale_actual y sale_missing con una sola ventana SQL.
+
+        Pensado para migraciones o correcciones masivas; devuelve el número de
+        actualizaciones reescritas.
+        """
+        self.flush_model(['sale_current', 'sale_total', 'project_id'])
+        where_project = "AND project_id = ANY(%(project_ids)s)" if project_ids else ""
+        self.env.cr.execute(
+            """
+            UPDATE project_update AS u
+               SET sale_actual = ledger.running_total,
+                   sale_missing = COALESCE(u.sale_total, 0.0) - ledger.running_total
+              FROM (
+                    SELECT id,
+                           SUM(COALESCE(sale_current, 0.0)) OVER (
+                               PARTITION BY project_id ORDER BY id
+                           ) AS running_total
+                      FROM project_update
+                     WHERE project_id IS NOT NULL
+                       %s
+                   ) AS ledger
+             WHERE u.id = ledger.id
+         RETURNING u.id
+            """ % where_project,
+            {'project_ids': list(project_ids or [])},
+        )
+        update_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_model(['sale_actual', 'sale_missing'])
+
+        # Los textos se recalculan desde los nuevos montos.
+        updates = self.browse(update_ids)
+        for fname in ('sale_actual_text', 'sale_missing_text'):
+            self.env.add_to_compute(self._fields[fname], updates)
+        updates.flush_recordset(['sale_actual_text', 'sale_missing_text'])
+        return len(update_ids)
+
+    def unlink(self):
+        # Las actualizaciones posteriores del proyecto pierden este monto acumulado.
+        updates = self.browse(self.sudo().search([
+            ('project_id', 'in', self.project_id.ids),
+            ('id', '>', min(self.ids or [0])),
+        ]).ids) - self
+        res = super().unlink()
+        if updates:
+            self.env.add_to_compute(self._fields['sale_actual'], updates)
+            updates.modified(['sale_actual'])
+        return res
+
+    def action_rebuild_sale_ledger(self):
+        self._rebuild_sale_ledger(self.project_id.ids or None)
+        return {"type": "ir.actions.client", "tag": "soft_reload"}
+
+    @api.depends('sale_current')
     def _sale_current_text(self):
         for u in self:
             sale = "%.2f" % u.sale_current
@@ -110,7 +245,7 @@ class ProjectUpdate(models.Model):
                         value_len-i) % 3 == 0 and value_len != i else sale
             u.sale_current_text = '$' + sale
 
-    @api.depends('sub_update_ids', 'sub_update_ids.unit_progress', 'sub_update_ids.task_id')
+    @api.depends('sale_actual')
     def _sale_actual_text(self):
         for u in self:
             sale = "%.2f" % u.sale_actual
@@ -121,7 +256,7 @@ class ProjectUpdate(models.Model):
                         value_len-i) % 3 == 0 and value_len != i else sale
             u.sale_actual_text = '$' + sale
 
-    @api.depends('sub_update_ids', 'sub_update_ids.unit_progress', 'sub_update_ids.task_id')
+    @api.depends('sale_total')
     def _sale_total_text(self):
         for u in self:
             sale = "% .2f" % u.sale_total
@@ -132,7 +267,7 @@ class ProjectUpdate(models.Model):
                         value_len-i) % 3 == 0 and value_len != i else sale
             u.sale_total_text = '$' + sale
 
-    @api.depends('sub_update_ids', 'sub_update_ids.unit_progress', 'sub_update_ids.task_id')
+    @api.depends('sale_missing')
     def _sale_missing_text(self):
         for u in self:
             sale = "% .2f" % u.sale_missing
@@ -122,6 +122,13 @@ class PurchaseOrder(models.Model):
             res['task_id'] = self.task_order_id.id
         return res
 
+    def write(self, vals):
+        res = super().write(vals)
+        # Estado, fecha o proyecto cambian las filas del libro de costos de sus líneas
+        if {'state', 'date_order', 'currency_id', 'project_id'} & set(vals):
+            self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return res
+
 
 class PurchaseOrderLine(models.Model):
     _inherit = 'purchase.order.line'
@@ -173,7 +180,18 @@ class PurchaseOrderLine(models.Model):
                         # OJO: Solo asignamos si la tarea del padre pertenece al mismo proyecto (por coherencia)
                         # o si decidimos confiar en el padre.
                         vals['task_id'] = order.task_order_id.id
-        return super().create(vals_list)
+        records = super().create(vals_list)
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, records.ids)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return res
+
+    def unlink(self):
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return super().unlink()
 
     # Evita que guarden datos incoherentes
     @api.constrains('project_id', 'task_id')
@@ -360,6 +378,13 @@ class PurchaseOrder(models.Model):
             res['task_id'] = self.task_order_id.id
         return res
 
+    def write(self, vals):
+        res = super().write(vals)
+        # Estado, fecha o proyecto cambian las filas del libro de costos de sus líneas
+        if {'state', 'date_order', 'currency_id', 'project_id'} & set(vals):
+            self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return res
+
 
 class PurchaseOrderLine(models.Model):
     _inherit = 'purchase.order.line'
@@ -409,7 +434,18 @@ class PurchaseOrderLine(models.Model):
                         # OJO: Solo asignamos si la tarea del padre pertenece al mismo proyecto (por coherencia)
                         # o si decidimos confiar en el padre.
                         vals['task_id'] = order.task_order_id.id
-        return super().create(vals_list)
+        records = super().create(vals_list)
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, records.ids)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return res
+
+    def unlink(self):
+        self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return super().unlink()
 
     # Evita que guarden datos incoherentes
     @api.constrains('project_id', 'task_id')
@@ -0,0 +1,46 @@
+import hashlib
+import json
+
+from odoo import models
+from odoo.tools.lru import LRU
+
+# Fragmentos HTML renderizados por base de datos; LRU con tope de entradas
+FRAGMENT_CACHE_SIZE = 256
+_fragment_caches = {}
+
+
+def _fragment_default(value):
+    """Serializa para la huella los valores que json no conoce."""
+    if callable(value):
+        # Los formateadores dependen solo del idioma y la moneda de la llave
+        return None
+    if isinstance(value, models.BaseModel):
+        # La plantilla podría leer campos relacionados que la huella no ve
+        raise TypeError("_render_fragment solo acepta valores planos, no %r" % value)
+    return str(value)
+
+
+class IrQweb(models.AbstractModel):
+    _inherit = 'ir.qweb'
+
+    def _render_fragment(self, template, values, currency=None):
+        """
+        _render con caché de fragmentos: la llave es (plantilla, huella de values,
+        idioma, moneda). Si los números no cambiaron se reutiliza el HTML sin pasar
+        por QWeb. values solo puede llevar datos planos (números, textos, fechas,
+        listas y dicts); las plantillas que recorren registros usan _render.
+        """
+        digest = hashlib.sha1(json.dumps(
+            values, sort_keys=True, default=_fragment_default).encode()).hexdigest()
+        # registry_sequence cambia al actualizar módulos; la secuencia de la caché
+        # 'templates' cambia cuando se edita una vista desde la interfaz
+        registry = self.env.registry
+        key = (registry.registry_sequence, registry.cache_sequences.get('templates'),
+               template, digest, self.env.lang, currency.id if currency else None)
+        cache = _fragment_caches.get(self.env.cr.dbname)
+        if cache is None:
+            cache = _fragment_caches.setdefault(self.env.cr.dbname, LRU(FRAGMENT_CACHE_SIZE))
+        html = cache.get(key)
+        if html is None:
+            html = cache[key] = self._render(template, values)
+        return html
@@ -0,0 +1,119 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+from odoo import api, fields, models
+
+# Clave de cr.cache con las matrices de tasas por (compañía, usuario)
+RATE_MATRIX_CACHE_KEY = 'project_modificaciones_rate_matrix'
+
+
+class CurrencyRateMatrix:
+    """Tipos de cambio precargados para convertir montos en memoria.
+
+    Reproduce res.currency._convert (tasa de la compañía antes que la global,
+    la última con fecha <= a la pedida o, si no hay, la primera registrada, y
+    redondeo a la moneda destino) sin una consulta por conversión. Las tasas
+    se cargan con una sola consulta por lote de monedas nuevas.
+    """
+
+    def __init__(self, env, company):
+        self.env = env
+        self.company = company
+        self.today = fields.Date.context_today(env['res.currency'])
+        # currency_id -> {'company': ([fechas], [tasas]), 'global': ([fechas], [tasas])}
+        self._rates = {}
+
+    def preload(self, pairs):
+        """Carga de una vez las tasas de todas las monedas de los pares (moneda, fecha)."""
+        currency_ids = {
+            (currency.id if hasattr(currency, 'id') else currency)
+            for currency, _date in pairs
+        }
+        self._load(currency_ids)
+
+    def _load(self, currency_ids):
+        missing = [cid for cid in currency_ids if cid and cid not in self._rates]
+        if not missing:
+            return
+        self.env['res.currency.rate'].flush_model(['rate', 'currency_id', 'company_id', 'name'])
+        self.env.cr.execute("""
+            SELECT currency_id, company_id IS NOT NULL, name, rate
+              FROM res_currency_rate
+             WHERE currency_id = ANY(%s)
+               AND (company_id IS NULL OR company_id = %s)
+          ORDER BY currency_id, name
+        """, [missing, self.company.root_id.id])
+        grouped = defaultdict(lambda: {'company': ([], []), 'global': ([], [])})
+        for currency_id, is_company, rate_date, rate in self.env.cr.fetchall():
+            dates, rates = grouped[currency_id]['company' if is_company else 'global']
+            dates.append(rate_date)
+            rates.append(rate)
+        for currency_id in missing:
+            self._rates[currency_id] = grouped[currency_id]
+
+    def get_rate(self, currency, rate_date):
+        """Tasa de la moneda respecto a la moneda base en la fecha dada."""
+        self._load([currency.id])
+        rate_date = rate_date or self.today
+        if hasattr(rate_date, 'date'):
+            rate_date = rate_date.date()
+        rates = self._rates[currency.id]
+        for scope in ('company', 'global'):
+            dates, values = rates[scope]
+            index = bisect_right(dates, rate_date)
+            if index:
+                return values[index - 1]
+        for scope in ('company', 'global'):
+            if rates[scope][1]:
+                return rates[scope][1][0]
+        return 1.0
+
+    def convert(self, amount, from_currency, to_currency, rate_date=None, round=True):
+        """Equivalente en memoria de from_currency._convert(amount, to_currency, company, date)."""
+        from_currency = from_currency or to_currency
+        to_currency = to_currency or from_currency
+        if not amount:
+            return 0.0
+        if from_currency == to_currency:
+            to_amount = amount
+        else:
+            to_amount = amount * (
+                self.get_rate(to_currency, rate_date) / self.get_rate(from_currency, rate_date))
+        return to_currency.round(to_amount) if round else to_amount
+
+
+class ResCurrency(models.Model):
+    _inherit = 'res.currency'
+
+    @api.model
+    def _get_rate_matrix(self, company=None):
+        """
+        Matriz de tasas de la compañía, compartida durante la transacción
+        para que todas las conversiones de un reporte usen las mismas tasas.
+        """
+        company = company or self.env.company
+        matrices = self.env.cr.cache.setdefault(RATE_MATRIX_CACHE_KEY, {})
+        key = (company.id, self.env.uid)
+        if key not in matrices:
+            matrices[key] = CurrencyRateMatrix(self.env, company)
+        return matrices[key]
+
+
+class ResCurrencyRate(models.Model):
+    _inherit = 'res.currency.rate'
+
+    # Las matrices de la transacción quedan viejas al cambiar una tasa
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.cr.cache.pop(RATE_MATRIX_CACHE_KEY, None)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.cr.cache.pop(RATE_MATRIX_CACHE_KEY, None)
+        return res
+
+    def unlink(self):
+        self.env.cr.cache.pop(RATE_MATRIX_CACHE_KEY, None)
+        return super().unlink()
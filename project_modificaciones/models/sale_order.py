@@ -453,21 +453,65 @@ class SaleOrder(models.Model):
     @api.depends('order_line.task_id', 'order_line.task_id.state')
     def _compute_sale_task_done_count(self):
         done_state = '1_done'
+        saved = self.filtered(lambda order: isinstance(order.id, int))
+        counts = {}
+        if saved:
+            counts = {
+                order.id: count
+                for order, count in self.env['sale.order.line']._read_group(
+                    [('order_id', 'in', saved.ids), ('task_id.state', '=', done_state)],
+                    ['order_id'], ['task_id:count_distinct'])
+            }
         for rec in self:
+            if rec in saved:
+                rec.task_done_count = counts.get(rec.id, 0)
+                continue
             tasks = rec.order_line.mapped('task_id')
             rec.task_done_count = len(tasks.filtered(
                 lambda t: t.state == done_state))
 
+    def _get_progress_totals(self):
+        """
+        Sumas por orden para las métricas de avance: cantidades de las líneas
+        (sin secciones ni notas) y unidades de los avances. Las órdenes guardadas
+        se agrupan con dos consultas; las nuevas se suman desde la caché.
+        Retorna {id: {'qty', 'invoiced', 'delivered', 'progress'}}.
+        """
+        saved = self.filtered(lambda order: isinstance(order.id, int))
+        totals = {
+            order.id: {'qty': 0.0, 'invoiced': 0.0, 'delivered': 0.0, 'progress': 0.0}
+            for order in self
+        }
+        if saved:
+            line_groups = self.env['sale.order.line']._read_group(
+                [('order_id', 'in', saved.ids), ('display_type', '=', False)], ['order_id'],
+                ['product_uom_qty:sum', 'qty_invoiced:sum', 'qty_delivered:sum'])
+            for order, qty, invoiced, delivered in line_groups:
+                totals[order.id].update(qty=qty, invoiced=invoiced, delivered=delivered)
+            update_groups = self.env['project.sub.update']._read_group(
+                [('sale_order_id', 'in', saved.ids)], ['sale_order_id'], ['unit_progress:sum'])
+            for order, progress in update_groups:
+                totals[order.id]['progress'] = progress
+        for order in self - saved:
+            lines = order.order_line.filtered(lambda l: not l.display_type)
+            totals[order.id] = {
+                'qty': sum(lines.mapped('product_uom_qty')),
+                'invoiced': sum(lines.mapped('qty_invoiced')),
+                'delivered': sum(lines.mapped('qty_delivered')),
+                'progress': sum(order.project_sub_updates.mapped('unit_progress')),
+            }
+        return totals
+
     def _get_progress_metrics_values(self):
         today = fields.Date.today()
         from datetime import datetime
 
         values_by_order = {}
+        totals_by_order = self._get_progress_totals()
         for order in self:
-            lines = order.order_line.filtered(lambda l: not l.display_type)
-            total_qty = sum(lines.mapped('product_uom_qty'))
-            updates = order.project_sub_updates
-            total_prog = sum(updates.mapped('unit_progress')) if updates else 0.0
+            totals = totals_by_order[order.id]
+            total_qty = totals['qty']
+            total_prog = totals['progress']
 
             if total_qty > 0:
                 valor_fisico = float(total_prog * 100) / float(total_qty)
@@ -501,8 +545,8 @@ class SaleOrder(models.Model):
                 avance_planeado = 0.0
 
             if total_qty > 0:
-                total_invoiced = sum(lines.mapped('qty_invoiced'))
-                total_entregado = sum(lines.mapped('qty_delivered'))
+                total_invoiced = totals['invoiced']
+                total_entregado = totals['delivered']
                 if total_entregado > 0:
                     fact_pct = float(total_invoiced * 100) / \
                         float(total_entregado)
@@ -558,6 +602,44 @@ class SaleOrder(models.Model):
             order.kanban_color_sale = values['kanban_color_sale']
 
             # Días de Retraso se calculan en _compute_sale_kanban_dates
+
+    # ---------------------------------------------------------------------------
+    # TABLERO DE PROYECTOS
+    # Las órdenes marcan su tarjeta como pendiente de refresco.
+    # ---------------------------------------------------------------------------
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['project.control.board']._mark_board_dirty(self._name, records.ids)
+        return records
+
+    def write(self, vals):
+        board = self.env['project.control.board']
+        if 'pending_service_id' in vals:
+            # El pendiente anterior puede volver a mostrarse en el tablero
+            board._mark_board_dirty(self._name, self.ids, resolve_now=True)
+        res = super().write(vals)
+        board._mark_board_dirty(self._name, self.ids)
+        return res
+
+    def unlink(self):
+        self.env['project.control.board']._mark_board_dirty(self._name, self.ids, resolve_now=True)
+        return super().unlink()
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    # Las facturas de la orden mueven el avance facturado de su tarjeta
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['project.control.board']._mark_board_dirty(self._name, self.ids)
+        return res
+
+    def unlink(self):
+        self.env['project.control.board']._mark_board_dirty(self._name, self.ids, resolve_now=True)
+        return super().unlink()
+
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
 
 class Origen(models.Model):
@@ -10,6 +10,12 @@ class StockPicking(models.Model):
     task_id = fields.Many2one(
         'project.task', string='Tarea', index=True, copy=False)
 
+    def write(self, vals):
+        res = super().write(vals)
+        if {'project_id', 'task_id'} & set(vals):
+            self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return res
+
 
 class StockMove(models.Model):
     _inherit = 'stock.move'
@@ -30,6 +36,28 @@ class StockMove(models.Model):
         for move in self:
             subtotal = move.product_qty * move.price_unit
             move.importe = subtotal
+
+    # La cantidad recibida de la línea de compra depende de sus movimientos
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        ledger = self.env['project.cost.ledger']
+        ledger._mark_ledger_dirty(self._name, records.ids)
+        ledger._mark_ledger_dirty('purchase.order.line', records.purchase_line_id.ids)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        ledger = self.env['project.cost.ledger']
+        ledger._mark_ledger_dirty(self._name, self.ids)
+        ledger._mark_ledger_dirty('purchase.order.line', self.purchase_line_id.ids)
+        return res
+
+    def unlink(self):
+        ledger = self.env['project.cost.ledger']
+        ledger._mark_ledger_dirty(self._name, self.ids)
+        ledger._mark_ledger_dirty('purchase.order.line', self.purchase_line_id.ids)
+        return super().unlink()
 =======
 from odoo import fields, models, api
 
@@ -42,6 +70,12 @@ class StockPicking(models.Model):
     task_id = fields.Many2one(
         'project.task', string='Tarea', index=True, copy=False)
 
+    def write(self, vals):
+        res = super().write(vals)
+        if {'project_id', 'task_id'} & set(vals):
+            self.env['project.cost.ledger']._mark_ledger_dirty(self._name, self.ids)
+        return res
+
 
 class StockMove(models.Model):
     _inherit = 'stock.move'
@@ -62,4 +96,26 @@ class StockMove(models.Model):
         for move in self:
             subtotal = move.product_qty * move.price_unit
             move.importe = subtotal
+
+    # La cantidad recibida de la línea de compra depende de sus movimientos
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        ledger = self.env['project.cost.ledger']
+        ledger._mark_ledger_dirty(self._name, records.ids)
+        ledger._mark_ledger_dirty('purchase.order.line', records.purchase_line_id.ids)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        ledger = self.env['project.cost.ledger']
+        ledger._mark_ledger_dirty(self._name, self.ids)
+        ledger._mark_ledger_dirty('purchase.order.line', self.purchase_line_id.ids)
+        return res
+
+    def unlink(self):
+        ledger = self.env['project.cost.ledger']
+        ledger._mark_ledger_dirty(self._name, self.ids)
+        ledger._mark_ledger_dirty('purchase.order.line', self.purchase_line_id.ids)
+        return super().unlink()
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
@@ -0,0 +1,96 @@
+/** @odoo-module **/
+import { onWillStart, onWillUnmount } from "@odoo/owl";
+import { registry } from "@web/core/registry";
+import { useService } from "@web/core/utils/hooks";
+import { kanbanView } from "@web/views/kanban/kanban_view";
+import { KanbanController } from "@web/views/kanban/kanban_controller";
+
+const CHANNEL = "project_control_board";
+const NOTIFICATION = "project_control_board/changed";
+
+// Kanban del tablero: escucha el bus y vuelve a leer solo las tarjetas cuyo
+// origen cambió; recarga todo solo si una tarjeta cambia de columna, se archiva,
+// aparece una nueva o el servidor reconstruyó el tablero completo.
+export class ProjectControlBoardKanbanController extends KanbanController {
+    setup() {
+        super.setup();
+        this.busService = useService("bus_service");
+        this.orm = useService("orm");
+        this.lastSync = null;
+        this.onBoardChanged = (payload) => this.applyChanges(payload.ids, payload.full);
+        this.onReconnect = () => this.syncChanges();
+
+        onWillStart(() => this.syncChanges());
+        this.busService.addChannel(CHANNEL);
+        this.busService.subscribe(NOTIFICATION, this.onBoardChanged);
+        this.busService.addEventListener("reconnect", this.onReconnect);
+        onWillUnmount(() => {
+            this.busService.unsubscribe(NOTIFICATION, this.onBoardChanged);
+            this.busService.removeEventListener("reconnect", this.onReconnect);
+            this.busService.deleteChannel(CHANNEL);
+        });
+    }
+
+    // Cambios perdidos mientras el bus estuvo desconectado
+    async syncChanges() {
+        const changes = await this.orm.call(this.props.resModel, "get_board_changes", [
+            this.lastSync,
+        ]);
+        const firstSync = !this.lastSync;
+        this.lastSync = changes.cursor;
+        if (!firstSync) {
+            await this.applyChanges(changes.ids, changes.full);
+        }
+    }
+
+    get loadedRecords() {
+        const root = this.model.root;
+        if (!root.isGrouped) {
+            return root.records.map((record) => [record, null]);
+        }
+        return root.groups.flatMap((group) =>
+            group.list.records.map((record) => [record, group])
+        );
+    }
+
+    async applyChanges(ids, full) {
+        if (full) {
+            return this.model.root.load();
+        }
+        const changedIds = new Set(ids || []);
+        if (!changedIds.size) {
+            return;
+        }
+        const affected = this.loadedRecords.filter(([record]) => changedIds.has(record.resId));
+        const missingIds = [...changedIds].filter(
+            (id) => !affected.some(([record]) => record.resId === id)
+        );
+        if (missingIds.length) {
+            // Solo recarga si alguna tarjeta no cargada entra ahora en el dominio
+            const count = await this.orm.searchCount(this.props.resModel, [
+                ...this.model.root.domain,
+                ["id", "in", missingIds],
+            ]);
+            if (count) {
+                return this.model.root.load();
+            }
+        }
+        await Promise.all(affected.map(([record]) => record.load()));
+        const moved = affected.some(
+            ([record, group]) =>
+                !record.data.active ||
+                (group && group.groupByField.name === "lifecycle_stage" &&
+                    record.data.lifecycle_stage !== group.value)
+        );
+        if (moved) {
+            return this.model.root.load();
+        }
+    }
+}
+
+export const projectControlBoardKanbanView = {
+    ...kanbanView,
+    Controller: ProjectControlBoardKanbanController,
+};
+
+registry.category("views").add("project_control_board_kanban", projectControlBoardKanbanView);
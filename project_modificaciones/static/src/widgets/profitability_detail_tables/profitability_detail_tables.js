@@ -0,0 +1,139 @@
+/** @odoo-module **/
+import { Component, useEffect, useState } from "@odoo/owl";
+import { registry } from "@web/core/registry";
+import { useService } from "@web/core/utils/hooks";
+import { useDebounced } from "@web/core/utils/timing";
+import { standardWidgetProps } from "@web/views/widgets/standard_widget_props";
+
+// Tablas de detalle del reporte de rentabilidad: cada sección pide al servidor
+// solo la página visible (get_detail_page) con orden y filtro de texto, en lugar
+// de renderizar todas las filas dentro del campo Html "content".
+export class ProfitabilityDetailTables extends Component {
+    static template = "project_modificaciones.ProfitabilityDetailTables";
+    static props = { ...standardWidgetProps };
+
+    setup() {
+        this.orm = useService("orm");
+        this.state = useState({ sections: [], loading: false });
+        this.debouncedSearch = useDebounced((section) => this.fetchPage(section, 0), 400);
+        // El contenido cambia cada vez que se recalcula con otros filtros
+        useEffect(
+            () => {
+                if (this.props.record.resId) {
+                    this.loadSections();
+                }
+            },
+            () => [this.props.record.resId, this.props.record.data.content]
+        );
+    }
+
+    get resModel() {
+        return this.props.record.resModel;
+    }
+
+    async loadSections() {
+        this.state.loading = true;
+        const sections = await this.orm.call(this.resModel, "get_detail_sections", [
+            [this.props.record.resId],
+        ]);
+        this.state.sections = sections.map((section) => ({
+            ...section,
+            open: false,
+            loaded: false,
+            loading: false,
+            rows: [],
+            count: 0,
+            offset: 0,
+            order: section.default_order,
+            search: "",
+            page_total_display: section.total_display,
+        }));
+        this.state.loading = false;
+    }
+
+    async onClickLoad() {
+        // El asistente aún no existe en base de datos: se guarda para poder paginar
+        await this.props.record.save();
+        await this.loadSections();
+    }
+
+    async fetchPage(section, offset) {
+        section.loading = true;
+        const result = await this.orm.call(
+            this.resModel,
+            "get_detail_page",
+            [[this.props.record.resId], section.key],
+            {
+                offset,
+                limit: section.limit,
+                order: section.order,
+                search: section.search,
+            }
+        );
+        Object.assign(section, {
+            rows: result.rows,
+            count: result.count,
+            offset: result.offset,
+            limit: result.limit,
+            order: result.order,
+            page_total_display: result.total_display,
+            loaded: true,
+            loading: false,
+        });
+    }
+
+    toggleSection(section) {
+        section.open = !section.open;
+        if (section.open && !section.loaded) {
+            this.fetchPage(section, 0);
+        }
+    }
+
+    sortBy(section, column) {
+        if (!column.sortable) {
+            return;
+        }
+        const [key, direction] = section.order.split(" ");
+        section.order = `${column.key} ${key === column.key && direction === "desc" ? "asc" : "desc"}`;
+        this.fetchPage(section, 0);
+    }
+
+    sortIcon(section, column) {
+        const [key, direction] = section.order.split(" ");
+        if (key !== column.key) {
+            return "";
+        }
+        return direction === "asc" ? "fa fa-sort-asc ms-1" : "fa fa-sort-desc ms-1";
+    }
+
+    onSearchInput(section, ev) {
+        section.search = ev.target.value;
+        this.debouncedSearch(section);
+    }
+
+    previousPage(section) {
+        this.fetchPage(section, Math.max(section.offset - section.limit, 0));
+    }
+
+    nextPage(section) {
+        this.fetchPage(section, section.offset + section.limit);
+    }
+
+    pagerLabel(section) {
+        if (!section.count) {
+            return "0";
+        }
+        const last = Math.min(section.offset + section.limit, section.count);
+        return `${section.offset + 1}-${last} / ${section.count}`;
+    }
+
+    cellClass(column) {
+        return ["number", "monetary"].includes(column.type) ? "text-end" : "";
+    }
+}
+
+export const profitabilityDetailTables = {
+    component: ProfitabilityDetailTables,
+};
+
+registry.category("view_widgets").add("profitability_detail_tables", profitabilityDetailTables);
@@ -0,0 +1,3 @@
+from . import test_dashboard_task
+from . import test_profitability_report
+from . import test_project_update
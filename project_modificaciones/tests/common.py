@@ -0,0 +1,227 @@
+from datetime import timedelta
+
+from odoo import Command, fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+class ProjectCostsCommon(AccountTestInvoicingCommon):
+    """
+    Proyecto de obra con una tarea y una subtarea que reciben costos de todas
+    las fuentes del reporte: ventas, compras, gastos, almacén y horas.
+    Compras, gastos y una venta van en la moneda secundaria (Gold) y cada
+    fuente tiene un registro fuera del rango de los últimos 30 días.
+    """
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.env.user.groups_id |= (
+            cls.env.ref('project.group_project_manager')
+            | cls.env.ref('sales_team.group_sale_manager')
+            | cls.env.ref('purchase.group_purchase_manager')
+            | cls.env.ref('hr_expense.group_hr_expense_manager')
+            | cls.env.ref('hr_timesheet.group_timesheet_manager')
+            | cls.env.ref('stock.group_stock_manager')
+        )
+        cls.today = fields.Date.context_today(cls.env.user)
+        cls.old_date = cls.today - timedelta(days=60)
+        cls.foreign_currency = cls.currency_data['currency']
+        company = cls.company_data['company']
+
+        cls.project = cls.env['project.project'].create({
+            'name': 'Obra de prueba',
+            'is_proyecto_obra': True,
+            'allow_timesheets': True,
+        })
+        cls.task = cls.env['project.task'].create({
+            'name': 'Tarea principal',
+            'project_id': cls.project.id,
+        })
+        cls.subtask = cls.env['project.task'].create({
+            'name': 'Subtarea',
+            'project_id': cls.project.id,
+            'parent_id': cls.task.id,
+        })
+        cls.employee = cls.env['hr.employee'].create({
+            'name': 'Empleado de obra',
+            'company_id': company.id,
+            'hourly_cost': 50.0,
+        })
+
+        cls.product_service = cls.env['product.product'].create({
+            'name': 'Servicio de obra',
+            'type': 'service',
+            'invoice_policy': 'order',
+            'purchase_method': 'purchase',
+            'list_price': 100.0,
+            'taxes_id': [Command.clear()],
+            'supplier_taxes_id': [Command.clear()],
+        })
+        cls.product_storable = cls.env['product.product'].create({
+            'name': 'Material de obra',
+            'type': 'product',
+            'standard_price': 20.0,
+        })
+        cls.product_expense = cls.env['product.product'].create({
+            'name': 'Viáticos',
+            'type': 'service',
+            'can_be_expensed': True,
+            'standard_price': 0.0,
+            'supplier_taxes_id': [Command.clear()],
+        })
+
+        cls._create_timesheets()
+        cls._create_expenses()
+        cls._create_purchases()
+        cls._create_stock_moves(cls.task | cls.subtask)
+        cls._create_sales()
+
+        cls.env.flush_all()
+        cls.env['project.cost.ledger']._flush_ledger_queue()
+
+    @classmethod
+    def _create_timesheets(cls):
+        cls.env['account.analytic.line'].create([{
+            'name': 'Horas en rango',
+            'project_id': cls.project.id,
+            'task_id': cls.task.id,
+            'employee_id': cls.employee.id,
+            'unit_amount': 5.0,
+            'date': cls.today,
+        }, {
+            'name': 'Horas de subtarea',
+            'project_id': cls.project.id,
+            'task_id': cls.subtask.id,
+            'employee_id': cls.employee.id,
+            'unit_amount': 2.0,
+            'date': cls.today,
+        }, {
+            'name': 'Horas fuera de rango',
+            'project_id': cls.project.id,
+            'task_id': cls.task.id,
+            'employee_id': cls.employee.id,
+            'unit_amount': 8.0,
+            'date': cls.old_date,
+        }])
+
+    @classmethod
+    def _create_expenses(cls):
+        expenses = cls.env['hr.expense'].create([{
+            'name': 'Gasto en rango',
+            'employee_id': cls.employee.id,
+            'product_id': cls.product_expense.id,
+            'total_amount_currency': 300.0,
+            'currency_id': cls.foreign_currency.id,
+            'date': cls.today,
+            'project_id': cls.project.id,
+            'task_id': cls.task.id,
+        }, {
+            'name': 'Gasto fuera de rango',
+            'employee_id': cls.employee.id,
+            'product_id': cls.product_expense.id,
+            'total_amount_currency': 150.0,
+            'currency_id': cls.foreign_currency.id,
+            'date': cls.old_date,
+            'project_id': cls.project.id,
+            'task_id': cls.task.id,
+        }])
+        sheet = cls.env['hr.expense.sheet'].create({
+            'name': 'Viáticos de obra',
+            'employee_id': cls.employee.id,
+            'expense_line_ids': [Command.set(expenses.ids)],
+        })
+        sheet.action_submit_sheet()
+        sheet.action_approve_expense_sheets()
+
+    @classmethod
+    def _create_purchases(cls):
+        cls.purchase_order = cls.env['purchase.order'].create({
+            'partner_id': cls.partner_a.id,
+            'currency_id': cls.foreign_currency.id,
+            'project_id': cls.project.id,
+            'order_line': [Command.create({
+                'product_id': cls.product_service.id,
+                'task_id': cls.task.id,
+                'product_qty': 4.0,
+                'price_unit': 50.0,
+                'taxes_id': [Command.clear()],
+            }), Command.create({
+                'product_id': cls.product_storable.id,
+                'task_id': cls.subtask.id,
+                'product_qty': 1.0,
+                'price_unit': 20.0,
+                'taxes_id': [Command.clear()],
+            })],
+        })
+        cls.purchase_order.button_confirm()
+        # Recibido 3 de 4 y facturado 2: quedan montos facturado, por facturar y comprometido
+        service_line = cls.purchase_order.order_line.filtered(
+            lambda line: line.product_id == cls.product_service)
+        service_line.qty_received = 3.0
+        cls.purchase_order.action_create_invoice()
+        bill = cls.purchase_order.invoice_ids
+        bill.invoice_line_ids.filtered(
+            lambda line: line.purchase_line_id == service_line).quantity = 2.0
+        bill.invoice_date = cls.today
+        bill.action_post()
+
+    @classmethod
+    def _create_stock_moves(cls, tasks):
+        warehouse = cls.env['stock.warehouse'].search(
+            [('company_id', '=', cls.company_data['company'].id)], limit=1)
+        moves = cls.env['stock.move'].create([{
+            'name': 'Salida a obra',
+            'product_id': cls.product_storable.id,
+            'product_uom_qty': 3.0,
+            'product_uom': cls.product_storable.uom_id.id,
+            'location_id': warehouse.lot_stock_id.id,
+            'location_dest_id': cls.env.ref('stock.stock_location_customers').id,
+            'picking_type_id': warehouse.out_type_id.id,
+            'project_id': task.project_id.id,
+            'task_id': task.id,
+        } for task in tasks])
+        moves._action_confirm()
+        for move in moves:
+            move.quantity = move.product_uom_qty
+        moves.picked = True
+        moves._action_done()
+        return moves
+
+    @classmethod
+    def _create_sales(cls):
+        origen = cls.env['sale.order.origen'].create({'name': 'Origen de prueba'})
+        destino = cls.env['sale.order.destino'].create({'name': 'Destino de prueba'})
+        foreign_pricelist = cls.env['product.pricelist'].create({
+            'name': 'Lista Gold',
+            'currency_id': cls.foreign_currency.id,
+        })
+        cls.sale_orders = orders = cls.env['sale.order'].create([{
+            'name': 'OV moneda compañía',
+            'partner_id': cls.partner_a.id,
+            'origen_id': origen.id,
+            'dest_id': destino.id,
+            'project_id': cls.project.id,
+            'order_line': [Command.create({
+                'product_id': cls.product_service.id,
+                'product_uom_qty': 2.0,
+                'price_unit': 100.0,
+                'tax_id': [Command.clear()],
+            })],
+        }, {
+            'name': 'OV moneda secundaria',
+            'partner_id': cls.partner_a.id,
+            'origen_id': origen.id,
+            'dest_id': destino.id,
+            'project_id': cls.project.id,
+            'pricelist_id': foreign_pricelist.id,
+            'order_line': [Command.create({
+                'product_id': cls.product_service.id,
+                'product_uom_qty': 3.0,
+                'price_unit': 80.0,
+                'tax_id': [Command.clear()],
+            })],
+        }])
+        orders.action_confirm()
+        invoice = orders[0]._create_invoices()
+        invoice.invoice_date = cls.today
+        invoice.action_post()
@@ -0,0 +1,103 @@
+from odoo import Command
+from odoo.tests import tagged
+
+from .common import ProjectCostsCommon
+
+# Consultas para abrir el tablero de una tarea con subtareas, sin importar
+# cuántos movimientos, compras o gastos tenga cada una. Conteo por pasos del
+# cargador con ormcache caliente: alcance, libro, movimientos y sus lecturas
+# (7), compras, gastos, horas y avances (5), ventas y facturas (4),
+# contadores de la tarea (3), lectura del wizard y moneda (2) y detalle de
+# movimientos: productos, costo estándar, albaranes, lotes, requisiciones,
+# unidades y ubicaciones (10). Son 31 consultas más un margen de 4.
+DASHBOARD_QUERY_BUDGET = 35
+
+
+@tagged('post_install', '-at_install')
+class TestDashboardTask(ProjectCostsCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.task.sale_line_id = cls.sale_orders[0].order_line
+        cls.subtask.sale_line_id = cls.sale_orders[1].order_line
+
+    def _open_dashboard(self, task):
+        """Tablero de la tarea con su subárbol y sin nada en caché."""
+        wizard = self.env['task.update'].create({
+            'task_id': task.id,
+            'include_subtasks': True,
+        })
+        self.env.flush_all()
+        self.env.invalidate_all()
+        self.env.cr.cache.pop('project_modificaciones_task_dashboard', None)
+        return wizard
+
+    def _count_dashboard_queries(self, task):
+        wizard = self._open_dashboard(task)
+        start = self.cr.sql_log_count
+        self._compute_dashboard(wizard)
+        return self.cr.sql_log_count - start
+
+    def _compute_dashboard(self, wizard):
+        wizard.content
+        wizard.purchase_count
+        wizard.total_costs
+
+    def _add_subtask_costs(self, count):
+        """Subtareas nuevas con un movimiento, una compra y un gasto cada una."""
+        subtasks = self.env['project.task'].create([{
+            'name': f'Subtarea {index}',
+            'project_id': self.project.id,
+            'parent_id': self.subtask.id,
+        } for index in range(count)])
+        self._create_stock_moves(subtasks)
+        purchase = self.env['purchase.order'].create({
+            'partner_id': self.partner_a.id,
+            'project_id': self.project.id,
+            'order_line': [Command.create({
+                'product_id': self.product_service.id,
+                'task_id': subtask.id,
+                'product_qty': 1.0,
+                'price_unit': 10.0,
+            }) for subtask in subtasks],
+        })
+        purchase.button_confirm()
+        expenses = self.env['hr.expense'].create([{
+            'name': f'Gasto {subtask.name}',
+            'employee_id': self.employee.id,
+            'product_id': self.product_expense.id,
+            'total_amount_currency': 25.0,
+            'project_id': self.project.id,
+            'task_id': subtask.id,
+        } for subtask in subtasks])
+        sheet = self.env['hr.expense.sheet'].create({
+            'name': 'Gastos de subtareas',
+            'employee_id': self.employee.id,
+            'expense_line_ids': [Command.set(expenses.ids)],
+        })
+        sheet.action_submit_sheet()
+        sheet.action_approve_expense_sheets()
+        self.env['project.cost.ledger']._flush_ledger_queue()
+
+    def test_dashboard_query_budget(self):
+        # Primera pasada para llenar los ormcache (plantilla, parámetros)
+        self._count_dashboard_queries(self.task)
+        wizard = self._open_dashboard(self.task)
+        with self.assertQueryCount(DASHBOARD_QUERY_BUDGET):
+            self._compute_dashboard(wizard)
+
+    def test_dashboard_queries_do_not_grow_with_subtasks(self):
+        self._count_dashboard_queries(self.task)
+        queries = self._count_dashboard_queries(self.task)
+        self._add_subtask_costs(5)
+        self._count_dashboard_queries(self.task)
+        self.assertEqual(self._count_dashboard_queries(self.task), queries)
+
+        # Subárbol: la subtarea base y las 5 nuevas. Compras: las 2 líneas
+        # confirmadas del escenario y 5 nuevas. Gastos: los 2 aprobados de la
+        # tarea principal y 5 nuevos.
+        wizard = self._open_dashboard(self.task)
+        self.assertEqual(wizard.subtask_count, 1 + 5)
+        self.assertEqual(wizard.purchase_count, 2 + 5)
+        self.assertEqual(wizard.expense_count, 2 + 5)
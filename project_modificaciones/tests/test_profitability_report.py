@@ -0,0 +1,174 @@
+from datetime import timedelta
+
+from odoo import Command
+from odoo.tests import tagged
+
+from .common import ProjectCostsCommon
+
+
+# Claves de cada sección del reporte; la primera es la que cambia en su prueba
+SECTION_KEYS = {
+    'income': ('invoiced_income', 'expected_income', 'to_invoice_income'),
+    'purchases': ('total_purchases', 'purchases_billed', 'purchases_to_bill',
+                  'purchase_incurred', 'purchase_committed'),
+    'expenses': ('total_expenses', 'expenses_billed', 'expenses_to_bill'),
+    'stock': ('total_stock_moves', 'stock_billed', 'stock_to_bill'),
+    'timesheets': ('timesheet_cost', 'timesheet_billed', 'timesheet_to_bill'),
+}
+
+
+@tagged('post_install', '-at_install')
+class TestProfitabilityReport(ProjectCostsCommon):
+
+    def _create_report(self, **vals):
+        report = self.env['project.profitability.report'].create({
+            'project_ids': [Command.set(self.project.ids)],
+            'currency_id': self.company_data['currency'].id,
+            **vals,
+        })
+        if not report._use_profitability_sql_engine():
+            self.skipTest("El motor SQL requiere stock_account")
+        return report
+
+    def _flush_ledger(self):
+        """
+        El motor SQL lee los costos de project.cost.ledger, que se llena en el
+        precommit; en pruebas no hay commit y la cola se vacía a mano.
+        """
+        self.env.flush_all()
+        self.env['project.cost.ledger']._flush_ledger_queue()
+
+    def _get_engine_results(self, report):
+        """(sql_data, sql_counts, orm_data, orm_counts) del reporte."""
+        self._flush_ledger()
+        tasks = report._get_filtered_tasks()
+        all_tasks = tasks | tasks.mapped('child_ids')
+        projects = report._get_filtered_projects()
+
+        sql_data = report._get_profitability_data_sql(
+            projects, report.date_from, report.date_to, all_tasks)
+        sql_counts = report._get_financial_counts_sql(all_tasks, projects)
+        orm_data, orm_counts = report._get_financials_orm(all_tasks, projects)
+        return sql_data, sql_counts, orm_data, orm_counts
+
+    def _section_total(self, report, section):
+        _sql_data, _sql_counts, orm_data, _orm_counts = self._get_engine_results(report)
+        return orm_data[SECTION_KEYS[section][0]]
+
+    def _assert_section_matches(self, report, section, before):
+        """
+        Tras agregar un registro de la sección, ambos motores deben reflejarlo
+        y coincidir en sus claves. before es la primera clave antes del cambio.
+        """
+        sql_data, _sql_counts, orm_data, _orm_counts = self._get_engine_results(report)
+        keys = SECTION_KEYS[section]
+        for key in keys:
+            self.assertAlmostEqual(sql_data[key], orm_data[key], places=2, msg=key)
+        self.assertNotAlmostEqual(orm_data[keys[0]], before, places=2, msg=keys[0])
+        return orm_data
+
+    def _assert_engines_match(self, report):
+        """El motor SQL y el cálculo con recordsets deben dar lo mismo."""
+        sql_data, sql_counts, orm_data, orm_counts = self._get_engine_results(report)
+
+        self.assertEqual(set(sql_data), set(orm_data))
+        for key, value in orm_data.items():
+            self.assertAlmostEqual(sql_data[key], value, places=2, msg=key)
+        self.assertEqual(sql_counts, orm_counts)
+        return orm_data, orm_counts
+
+    def test_sql_engine_matches_recordsets(self):
+        report = self._create_report(
+            task_state_filter='all', date_filter_type='none')
+
+        data, counts = self._assert_engines_match(report)
+        # El escenario debe ejercer todas las fuentes, no comparar ceros
+        for key in ('expected_income', 'invoiced_income', 'to_invoice_income',
+                    'total_expenses', 'total_purchases', 'total_stock_moves',
+                    'timesheet_cost'):
+            self.assertTrue(data[key], key)
+        self.assertEqual(counts['sale_order_count'], 2)
+        self.assertEqual(counts['invoice_count'], 1)
+        self.assertEqual(counts['expense_count'], 2)
+        self.assertEqual(counts['stock_move_count'], 2)
+        self.assertEqual(counts['timesheet_hours'], 15.0)
+
+    def test_sql_engine_matches_recordsets_with_date_filter(self):
+        report = self._create_report(
+            filter_type='filter',
+            task_ids=[Command.set(self.task.ids)],
+            date_filter_type='custom',
+            date_from=self.today - timedelta(days=30),
+            date_to=self.today,
+        )
+
+        _data, counts = self._assert_engines_match(report)
+        # Las horas y el gasto de hace 60 días quedan fuera del rango
+        self.assertEqual(counts['expense_count'], 1)
+        self.assertEqual(counts['timesheet_hours'], 7.0)
+
+    def test_income_parity(self):
+        report = self._create_report(task_state_filter='all', date_filter_type='none')
+        before = self._section_total(report, 'income')
+        # Ahora también hay ingreso facturado en la moneda secundaria
+        invoice = self.sale_orders[1]._create_invoices()
+        invoice.invoice_date = self.today
+        invoice.action_post()
+        self._assert_section_matches(report, 'income', before)
+
+    def test_purchases_parity(self):
+        report = self._create_report(task_state_filter='all', date_filter_type='none')
+        before = self._section_total(report, 'purchases')
+        self.env['purchase.order'].create({
+            'partner_id': self.partner_a.id,
+            'project_id': self.project.id,
+            'order_line': [Command.create({
+                'product_id': self.product_service.id,
+                'task_id': self.subtask.id,
+                'product_qty': 2.0,
+                'price_unit': 35.0,
+                'taxes_id': [Command.clear()],
+            })],
+        }).button_confirm()
+        data = self._assert_section_matches(report, 'purchases', before)
+        self.assertTrue(data['purchase_committed'])
+
+    def test_expenses_parity(self):
+        report = self._create_report(task_state_filter='all', date_filter_type='none')
+        before = self._section_total(report, 'expenses')
+        expense = self.env['hr.expense'].create({
+            'name': 'Gasto de subtarea',
+            'employee_id': self.employee.id,
+            'product_id': self.product_expense.id,
+            'total_amount_currency': 120.0,
+            'date': self.today,
+            'project_id': self.project.id,
+            'task_id': self.subtask.id,
+        })
+        sheet = self.env['hr.expense.sheet'].create({
+            'name': 'Gasto de subtarea',
+            'employee_id': self.employee.id,
+            'expense_line_ids': [Command.set(expense.ids)],
+        })
+        sheet.action_submit_sheet()
+        sheet.action_approve_expense_sheets()
+        self._assert_section_matches(report, 'expenses', before)
+
+    def test_stock_parity(self):
+        report = self._create_report(task_state_filter='all', date_filter_type='none')
+        before = self._section_total(report, 'stock')
+        self._create_stock_moves(self.subtask)
+        self._assert_section_matches(report, 'stock', before)
+
+    def test_timesheets_parity(self):
+        report = self._create_report(task_state_filter='all', date_filter_type='none')
+        before = self._section_total(report, 'timesheets')
+        self.env['account.analytic.line'].create({
+            'name': 'Horas adicionales',
+            'project_id': self.project.id,
+            'task_id': self.subtask.id,
+            'employee_id': self.employee.id,
+            'unit_amount': 3.0,
+            'date': self.today,
+        })
+        self._assert_section_matches(report, 'timesheets', before)
@@ -0,0 +1,83 @@
+from odoo import Command
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestProjectUpdateSaleLedger(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.project = cls.env['project.project'].create({'name': 'Obra acumulado'})
+        product = cls.env['product.product'].create({
+            'name': 'Servicio por pieza',
+            'type': 'service',
+            'list_price': 100.0,
+            'taxes_id': [Command.clear()],
+        })
+        order = cls.env['sale.order'].create({
+            'name': 'OV acumulado',
+            'partner_id': cls.env['res.partner'].create({'name': 'Cliente obra'}).id,
+            'origen_id': cls.env['sale.order.origen'].create({'name': 'Origen acumulado'}).id,
+            'dest_id': cls.env['sale.order.destino'].create({'name': 'Destino acumulado'}).id,
+            'order_line': [Command.create({
+                'product_id': product.id,
+                'product_uom_qty': 10.0,
+                'price_unit': 100.0,
+            })],
+        })
+        order.action_confirm()
+        cls.sale_line = order.order_line
+        cls.task = cls.env['project.task'].create({
+            'name': 'Tarea con venta',
+            'project_id': cls.project.id,
+            'sale_line_id': cls.sale_line.id,
+        })
+        cls.task_without_sale = cls.env['project.task'].create({
+            'name': 'Tarea sin venta',
+            'project_id': cls.project.id,
+        })
+
+        cls.first_update, cls.second_update = cls.env['project.update'].create([{
+            'name': 'Semana 1',
+            'project_id': cls.project.id,
+        }, {
+            'name': 'Semana 2',
+            'project_id': cls.project.id,
+        }])
+        cls.env['project.sub.update'].create([{
+            'update_id': cls.first_update.id,
+            'project_id': cls.project.id,
+            'task_id': cls.task.id,
+            'unit_progress': 2.0,
+        }, {
+            'update_id': cls.second_update.id,
+            'project_id': cls.project.id,
+            'task_id': cls.task.id,
+            'unit_progress': 1.0,
+        }])
+        cls.avance_without_sale = cls.env['project.sub.update'].create({
+            'update_id': cls.second_update.id,
+            'project_id': cls.project.id,
+            'task_id': cls.task_without_sale.id,
+            'unit_progress': 3.0,
+            'precio_unidad': 10.0,
+        })
+        cls.env.flush_all()
+
+    def test_sale_line_price_updates_ledger(self):
+        self.assertEqual(self.first_update.sale_current, 200.0)
+        self.assertEqual(self.second_update.sale_actual, 330.0)
+
+        self.sale_line.price_unit = 120.0
+        self.env.flush_all()
+        self.assertEqual(self.first_update.sale_current, 240.0)
+        self.assertEqual(self.first_update.sale_actual, 240.0)
+        self.assertEqual(self.second_update.sale_current, 150.0)
+        self.assertEqual(self.second_update.sale_actual, 390.0)
+
+    def test_avance_price_updates_ledger(self):
+        self.avance_without_sale.precio_unidad = 15.0
+        self.env.flush_all()
+        self.assertEqual(self.second_update.sale_current, 145.0)
+        self.assertEqual(self.second_update.sale_actual, 345.0)
@@ -7,3 +7,5 @@ from . import project_sub_update_reclassify_wizard
 from . import fusion_servicios_pendientes_linea
 from . import fusion_servicios_pendientes
 >>>>>>> 9d09621 (Vista Unificada Gestion de Proyectos y Fusion de servicios pendientes.)
+from . import project_sub_update_import_wizard
+from . import project_control_board_stage_wizard
@@ -0,0 +1,28 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+
+class ProjectControlBoardStageWizard(models.TransientModel):
+    _name = 'project.control.board.stage.wizard'
+    _description = 'Cambio Masivo de Etapa del Tablero'
+
+    lifecycle_stage = fields.Selection(
+        selection=lambda self: self.env['project.control.board']._fields['lifecycle_stage'].selection,
+        string='Nueva Etapa',
+        required=True,
+    )
+    board_count = fields.Integer(string='Registros', compute='_compute_board_count')
+
+    @api.depends_context('active_ids')
+    def _compute_board_count(self):
+        for wizard in self:
+            wizard.board_count = len(self.env.context.get('active_ids') or [])
+
+    def action_apply(self):
+        """Mueve todas las tarjetas seleccionadas con un solo write del tablero."""
+        self.ensure_one()
+        boards = self.env['project.control.board'].browse(self.env.context.get('active_ids') or [])
+        if not boards:
+            raise UserError(_("Selecciona al menos un registro del tablero."))
+        boards.write({'lifecycle_stage': self.lifecycle_stage})
+        return {'type': 'ir.actions.act_window_close'}
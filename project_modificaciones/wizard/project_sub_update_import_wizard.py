@@ -0,0 +1,120 @@
+import base64
+import csv
+import io
+import logging
+import unicodedata
+
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+
+class ProjectSubUpdateImportWizard(models.TransientModel):
+    _name = 'project.sub.update.import.wizard'
+    _description = 'Asistente de Importación de Avances'
+
+    # Encabezado normalizado -> clave que espera project.sub.update.import_avances
+    _COLUMN_ALIASES = {
+        'fecha': 'fecha',
+        'producto': 'producto',
+        'codigo': 'producto',
+        'referencia': 'producto',
+        'cantidad': 'cantidad',
+        'unidades': 'cantidad',
+        'avance': 'cantidad',
+        'tarea': 'tarea',
+        'ct': 'ct',
+        'centro_de_trabajo': 'ct',
+        'planta': 'planta',
+        'supervisor_cliente': 'supervisor_cliente',
+        'supervisor_interno': 'supervisor_interno',
+        'licencia': 'licencia',
+        'licencia/om': 'licencia',
+        'hora_inicio': 'hora_inicio',
+        'hora_de_inicio': 'hora_inicio',
+        'hora_termino': 'hora_termino',
+        'hora_de_termino': 'hora_termino',
+        'area': 'area_equipo',
+        'area_equipo': 'area_equipo',
+        'notas': 'notas',
+    }
+
+    project_id = fields.Many2one(
+        'project.project', string='Proyecto', required=True,
+        domain="[('is_proyecto_obra', '=', True)]",
+        help="Proyecto al que se asignarán los avances importados.")
+    file = fields.Binary(string='Archivo', required=True, attachment=False)
+    filename = fields.Char(string='Nombre del Archivo')
+    confirm = fields.Boolean(
+        string='Confirmar Avances',
+        help="Si se marca, se exigen los campos obligatorios de confirmación y los "
+             "avances se crean confirmados en lugar de borrador.")
+    decimal_point = fields.Selection(
+        [('.', 'Punto (1,250.5)'), (',', 'Coma (1.250,5)')],
+        string='Separador Decimal', required=True,
+        default=lambda self: self._default_decimal_point(),
+        help="Separador decimal de las cantidades de texto del archivo; el otro "
+             "signo se toma como separador de miles.")
+
+    def _default_decimal_point(self):
+        decimal_point = self.env['res.lang']._lang_get(self.env.lang or 'en_US').decimal_point
+        return ',' if decimal_point == ',' else '.'
+
+    def action_import(self):
+        self.ensure_one()
+        records = self.env['project.sub.update'].import_avances(
+            self._read_rows(), self.project_id.id, confirm=self.confirm,
+            decimal_point=self.decimal_point)
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Avances Importados'),
+            'res_model': 'project.sub.update',
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', records.ids)],
+            'target': 'current',
+        }
+
+    def _read_rows(self):
+        """Genera las filas del archivo como dicts con las claves normalizadas."""
+        content = base64.b64decode(self.file)
+        if (self.filename or '').lower().endswith('.xlsx'):
+            raw_rows = self._read_xlsx(content)
+        else:
+            raw_rows = self._read_csv(content)
+
+        header = next(raw_rows, None)
+        if not header:
+            raise UserError(_("El archivo está vacío."))
+        keys = [self._COLUMN_ALIASES.get(self._normalize_header(cell)) for cell in header]
+        if not {'fecha', 'producto', 'cantidad'}.issubset(keys):
+            raise UserError(_("El archivo debe tener al menos las columnas Fecha, Producto y Cantidad."))
+
+        for raw in raw_rows:
+            yield {key: value for key, value in zip(keys, raw) if key}
+
+    def _read_csv(self, content):
+        try:
+            text = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            text = content.decode('latin-1')
+        first_line = text.split('\n', 1)[0]
+        delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+        return csv.reader(io.StringIO(text), delimiter=delimiter)
+
+    def _read_xlsx(self, content):
+        if load_workbook is None:
+            raise UserError(_("Para importar archivos XLSX se requiere la librería openpyxl."))
+        workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        return workbook.active.iter_rows(values_only=True)
+
+    @staticmethod
+    def _normalize_header(cell):
+        text = unicodedata.normalize('NFKD', str(cell or '').strip().lower())
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+        return text.replace(' ', '_')